@@ -1,17 +1,92 @@
 #!/usr/bin/env python3
 """
-MindMap CLI - Command-line interface for managing mind maps (interactive only)
+MindMap CLI - Command-line interface for managing mind maps (interactive or scripted)
 """
 
+import argparse
+import os
+import shlex
+import sys
+
 # Import the CLI class that handles the interactive logic
 from mindmap.cli import MindMapCLI
+from mindmap import batch, client, server
+from mindmap.history import HISTORY_LIMIT
 
 def main():
+    # Parse the startup options
+    parser = argparse.ArgumentParser(description="MindMap CLI")
+    parser.add_argument("--data-dir", default="data", help="directory where mind maps are stored")
+    parser.add_argument("--compact", action="store_true",
+                        help="keep maps in the array-backed compact representation")
+    parser.add_argument("--journal", action="store_true",
+                        help="append changes to a journal next to the map; save only syncs it")
+    parser.add_argument("--autosave", action="store_true",
+                        help="save changed maps automatically in the background")
+    parser.add_argument("--compress", choices=["gzip", "xz"],
+                        help="save new maps as compressed JSON (.json.gz or .json.xz)")
+    parser.add_argument("--history-limit", type=int, metavar="MB", default=HISTORY_LIMIT // (1024 * 1024),
+                        help="memory kept alive by the undo history of each map (default: %(default)s)")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="write command and storage metrics to FILE as JSON on exit")
+    parser.add_argument("--script", metavar="FILE",
+                        help="run the commands of FILE ('-' for stdin) without prompts, then exit")
+    subcommands = parser.add_subparsers(dest="command")
+    batch_parser = subcommands.add_parser("batch", help="run one operation over every map of the data directory")
+    batch_parser.add_argument("operation", choices=batch.OPERATIONS)
+    batch_parser.add_argument("format", nargs="?", help="target format of convert (json, json.gz, json.xz or mmb)")
+    batch_parser.add_argument("--workers", type=int, help="worker processes (default: CPU count)")
+    batch_parser.add_argument("--chunk-size", type=int, help="files handed to a worker at a time")
+    batch_parser.add_argument("--verbose", action="store_true", help="print the result of every file")
+    serve_parser = subcommands.add_parser("serve", help="keep maps resident and serve clients over a Unix socket")
+    serve_parser.add_argument("--socket", help=f"socket path (default: <data-dir>/{server.SOCKET_NAME})")
+    client_parser = subcommands.add_parser("client", help="send commands to a running server")
+    client_parser.add_argument("--socket", help=f"socket path (default: <data-dir>/{server.SOCKET_NAME})")
+    client_parser.add_argument("--map", help="map file the commands apply to")
+    client_parser.add_argument("words", nargs=argparse.REMAINDER,
+                               help="one command (e.g. add root 'New idea'); read from stdin if omitted")
+    options = parser.parse_args()
+
+    if options.command == "serve":
+        # Daemon mode: maps stay loaded between client requests
+        server.serve(options.data_dir, options.socket, compact=options.compact, journaled=options.journal,
+                     compression=options.compress)
+        return
+    if options.command == "client":
+        socket_path = options.socket or os.path.join(options.data_dir, server.SOCKET_NAME)
+        if options.words:
+            errors = client.run_commands(socket_path, [shlex.join(options.words)], options.map)
+        else:
+            errors = client.run_commands(socket_path, sys.stdin, options.map)
+        sys.exit(1 if errors else 0)
+
+    if options.command == "batch":
+        # Parallel sweep over the data directory, without the REPL
+        try:
+            report = batch.run_batch(options.data_dir, options.operation, options.format,
+                                     workers=options.workers, chunk_size=options.chunk_size,
+                                     compact=options.compact, progress=batch.print_progress)
+        except ValueError as e:
+            parser.error(str(e))
+        batch.print_report(report, options.verbose)
+        sys.exit(1 if report['failed'] else 0)
+
     # Create an instance of the CLI
-    cli = MindMapCLI()
+    cli = MindMapCLI(options.data_dir, compact=options.compact, journaled=options.journal,
+                     metrics_path=options.metrics, autosave=options.autosave,
+                     history_limit=options.history_limit * 1024 * 1024, compression=options.compress)
+    if options.script:
+        # Run the script non-interactively and exit with a failure status on errors
+        if options.script == "-":
+            errors = cli.run_script(sys.stdin)
+        else:
+            with open(options.script, "r", encoding="utf-8") as f:
+                errors = cli.run_script(f)
+        sys.exit(1 if errors else 0)
+    
     # Start the CLI interaction loop
     cli.run()
 
 # Entry point for the script when executed directly
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,3 @@
+"""
+MindMap benchmarks - Performance and memory measurements for the mindmap package
+"""
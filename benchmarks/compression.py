@@ -0,0 +1,78 @@
+"""
+Compression benchmark - Compare plain JSON maps with gzip and xz compressed ones
+
+Usage: python -m benchmarks.compression [--sizes 10k,100k,1m] [--depth 3] [--bandwidth 20]
+
+For every JSON flavour the map is saved and loaded through Storage (the fastest
+of --repeat runs is kept). With --bandwidth, the time to read the file over a
+link of that many MB/s (e.g. a network share) is added to the load time.
+"""
+
+import argparse
+import io
+import os
+import tempfile
+from contextlib import redirect_stdout
+
+from mindmap.storage import JSON_BACKENDS, Storage
+from mindmap.compact import CompactMindMap
+from mindmap.models import MindMap
+
+from .generator import generate_map
+from .suite import parse_size, timed
+
+
+def measure(node_count, options):
+    """Return (extension, file bytes, save seconds, load seconds) for every JSON flavour"""
+    map_class = CompactMindMap if options.compact else MindMap
+    mindmap = generate_map(node_count, options.fanout, options.depth, options.title_length, options.seed,
+                           map_class)
+    rows = []
+    with tempfile.TemporaryDirectory() as data_dir:
+        storage = Storage(data_dir, map_class)
+        # Every save writes the whole map, and nothing else
+        storage.incremental = False
+        storage.update_catalog = False
+        storage.update_index = False
+        for backend in JSON_BACKENDS:
+            name = f"benchmark{backend.extension}"
+            # Storage prints its errors; keep the table readable
+            with redirect_stdout(io.StringIO()):
+                save_seconds = timed(lambda: storage.save(mindmap, name), options.repeat)
+                load_seconds = timed(lambda: storage.load(name), options.repeat)
+            size = os.path.getsize(os.path.join(data_dir, name))
+            rows.append((backend.extension, size, save_seconds, load_seconds))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the size and load time of plain and compressed JSON maps")
+    parser.add_argument("--sizes", default="10k,100k", help="comma-separated map sizes (e.g. 10k,100k,1m)")
+    parser.add_argument("--fanout", type=int, default=10, help="maximum children per node below the root")
+    parser.add_argument("--depth", type=int, default=3, help="levels below the root")
+    parser.add_argument("--title-length", type=int, default=16, help="approximate title length")
+    parser.add_argument("--seed", type=int, default=0, help="generator seed")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement (the fastest is kept)")
+    parser.add_argument("--compact", action="store_true", help="load into the CompactMindMap representation")
+    parser.add_argument("--bandwidth", type=float, metavar="MBPS",
+                        help="add the time to read each file at this many MB/s to its load time")
+    options = parser.parse_args()
+
+    for size in options.sizes.split(","):
+        node_count = parse_size(size)
+        print(f"{node_count} nodes (depth {options.depth}, fan-out {options.fanout}):")
+        rows = measure(node_count, options)
+        plain_size = rows[0][1]
+        plain_load = None
+        for extension, file_size, save_seconds, load_seconds in rows:
+            if options.bandwidth:
+                load_seconds += file_size / (options.bandwidth * 1e6)
+            if plain_load is None:
+                plain_load = load_seconds
+            print(f"  {extension:<10} {file_size / 2**20:9.2f} MiB {file_size / plain_size:7.1%}"
+                  f"  save {save_seconds * 1000:9.1f} ms  load {load_seconds * 1000:9.1f} ms"
+                  f" ({load_seconds / plain_load:5.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
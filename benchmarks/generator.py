@@ -0,0 +1,82 @@
+"""
+Map generator - Seeded synthetic mind maps for benchmarks
+
+The same arguments always produce the same map, so timings of different
+runs (or different commits) are measured on identical data.
+"""
+
+import random
+import string
+
+from mindmap.models import MindMap
+
+
+def make_title(rng, number, title_length):
+    """Random lowercase title of about title_length characters, made unique by its number"""
+    suffix = f" {number}"
+    letters = max(1, title_length - len(suffix))
+    return "".join(rng.choice(string.ascii_lowercase) for _ in range(letters)) + suffix
+
+
+def generate_map(node_count, fanout=10, depth=2, title_length=16, seed=0, map_class=MindMap):
+    """
+    Build a map of exactly node_count nodes (root included) and at most depth
+    levels below the root, filled breadth-first. Nodes below the root get between
+    fanout // 2 and fanout children; the root gets as many as needed to hold
+    node_count even at the smallest fan-out, so the last branches may stay leaves.
+    Titles are unique, so every node can be found by search.
+    """
+    if node_count < 1:
+        raise ValueError("node_count must be at least 1")
+    if depth < 1 and node_count > 1:
+        raise ValueError("depth must be at least 1 for more than one node")
+    rng = random.Random(seed)
+    low = max(1, fanout // 2)
+    mindmap = map_class(f"Generated {node_count}", make_title(rng, 0, title_length))
+    created = 1
+
+    # Nodes one root child can hold with the smallest fan-out (itself included)
+    subtree = 1
+    level_size = 1
+    for _ in range(depth - 1):
+        level_size *= low
+        subtree += level_size
+    root_children = -(-(node_count - 1) // subtree)
+
+    level = [mindmap.root]
+    for current_depth in range(depth):
+        next_level = []
+        for node in level:
+            count = root_children if current_depth == 0 else rng.randint(low, max(low, fanout))
+            for _ in range(min(count, node_count - created)):
+                next_level.append(node.add_child(make_title(rng, created, title_length)))
+                created += 1
+            if created >= node_count:
+                break
+        level = next_level
+    return mindmap
+
+
+def _iter_level(root, depth):
+    """Return the nodes at a given depth, left to right"""
+    level = [root]
+    for _ in range(depth):
+        level = [child for node in level for child in node.children]
+    return level
+
+
+def sample_titles(mindmap, count, seed=0, depth=None):
+    """Return count node titles picked at random (optionally only at one depth)"""
+    rng = random.Random(seed)
+    if depth is None:
+        titles = []
+        stack = [mindmap.root]
+        while stack:
+            node = stack.pop()
+            titles.append(node.title)
+            stack.extend(node.children)
+    else:
+        titles = [node.title for node in _iter_level(mindmap.root, depth)]
+    if not titles:
+        return []
+    return [rng.choice(titles) for _ in range(count)]
@@ -0,0 +1,63 @@
+"""
+Memory benchmark - Compare the object graph (MindMap) with the array store (CompactMindMap)
+
+Usage: python -m benchmarks.memory [--nodes 1000000] [--fanout 1000]
+"""
+
+import argparse
+import gc
+import time
+import tracemalloc
+
+from mindmap.models import MindMap
+from mindmap.compact import CompactMindMap
+
+
+def build_map(map_class, node_count, fanout):
+    """Build a 3-level map (root, branches, leaves) with the requested number of nodes"""
+    mindmap = map_class("Benchmark")
+    root = mindmap.root
+    created = 1
+    branch_number = 0
+    while created < node_count:
+        branch = root.add_child(f"Branch {branch_number}")
+        created += 1
+        for leaf_number in range(min(fanout, node_count - created)):
+            branch.add_child(f"Leaf {branch_number}.{leaf_number}")
+            created += 1
+        branch_number += 1
+    return mindmap
+
+
+def measure(map_class, node_count, fanout):
+    """Return (bytes allocated, seconds) to build a map with the given class"""
+    # Timed without tracing: tracemalloc slows every allocation down, and not evenly across classes
+    gc.collect()
+    start = time.perf_counter()
+    mindmap = build_map(map_class, node_count, fanout)
+    elapsed = time.perf_counter() - start
+    del mindmap
+    gc.collect()
+    tracemalloc.start()
+    mindmap = build_map(map_class, node_count, fanout)
+    allocated, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del mindmap
+    return allocated, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare MindMap and CompactMindMap memory usage")
+    parser.add_argument("--nodes", type=int, default=1_000_000, help="number of nodes to build")
+    parser.add_argument("--fanout", type=int, default=1000, help="leaves per branch")
+    options = parser.parse_args()
+
+    print(f"Building {options.nodes} nodes (fan-out {options.fanout})")
+    for map_class in (MindMap, CompactMindMap):
+        allocated, elapsed = measure(map_class, options.nodes, options.fanout)
+        print(f"{map_class.__name__:<16} {allocated / 2**20:9.1f} MiB"
+              f"  {allocated / options.nodes:7.1f} B/node  {elapsed:6.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Concurrency stress test - Several processes saving and loading the same map file
+
+Usage: python -m benchmarks.stress [--writers 4] [--readers 2] [--iterations 50] [--nodes 10000]
+
+Each writer process keeps the map open in its own MindMapManager and, in a
+loop, adds a node under its own branch and saves; saves that find the file
+changed by another writer merge their change into it. Without --merge-off
+every node must be in the final file. With --merge-off the writers use the
+storage directly and reload after a conflict, so the conflicts are counted
+instead. Reader processes load the file in a loop meanwhile: every load must
+succeed, and as readers take no lock, their slowest load only reflects the
+CPU and disk the writers share with them.
+The full-text index is left to the next find, so only the map file is contended.
+"""
+
+import argparse
+import io
+import multiprocessing
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+from mindmap.manager import MindMapManager
+from mindmap.storage import Storage
+
+from .generator import generate_map
+
+
+def writer(data_dir, filename, number, iterations, merge, results):
+    """Add iterations nodes under this writer's branch, saving after each one"""
+    branch = f"writer {number}"
+    saves = merges = conflicts = 0
+    # Save conflicts are printed; keep the report readable
+    with redirect_stdout(io.StringIO()):
+        if merge:
+            manager = MindMapManager(data_dir)
+            manager.storage.update_index = False
+            manager.load_map(filename)
+            for iteration in range(iterations):
+                manager.add_node(branch, f"{branch} node {iteration}")
+                success, message = manager.save_map()
+                if not success:
+                    conflicts += 1
+                    continue
+                saves += 1
+                merges += "merged" in message
+        else:
+            storage = Storage(data_dir)
+            storage.update_index = False
+            mindmap = storage.load(filename)
+            for iteration in range(iterations):
+                # Fail fast: on a conflict, reload the newer file and try again
+                while True:
+                    if mindmap.search_node(f"{branch} node {iteration}") is None:
+                        mindmap.search_node(branch).add_child(f"{branch} node {iteration}")
+                    if storage.save(mindmap, filename):
+                        saves += 1
+                        break
+                    conflicts += 1
+                    mindmap = storage.load(filename)
+    results.put(('writer', number, saves, merges, conflicts))
+
+
+def reader(data_dir, filename, stop, results):
+    """Load the map until told to stop, timing each load"""
+    storage = Storage(data_dir)
+    loads = errors = 0
+    slowest = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        with redirect_stdout(io.StringIO()):
+            mindmap = storage.load(filename, track=False)
+        slowest = max(slowest, time.perf_counter() - start)
+        if mindmap is None:
+            errors += 1
+        loads += 1
+    results.put(('reader', loads, errors, slowest))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Save and load one map from several processes at once")
+    parser.add_argument("--writers", type=int, default=4, help="writer processes")
+    parser.add_argument("--readers", type=int, default=2, help="reader processes")
+    parser.add_argument("--iterations", type=int, default=50, help="nodes added (and saves) per writer")
+    parser.add_argument("--nodes", type=int, default=10000, help="size of the map, to make saves take time")
+    parser.add_argument("--format", default="json", help="file format: json, json.gz, json.xz or mmb")
+    parser.add_argument("--merge-off", action="store_true",
+                        help="writers reload and retry after a conflict instead of merging")
+    options = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        filename = f"stress.{options.format}"
+        mindmap = generate_map(options.nodes)
+        for number in range(options.writers):
+            mindmap.root.add_child(f"writer {number}")
+        storage = Storage(data_dir)
+        storage.update_index = False
+        storage.save(mindmap, filename)
+        start = time.perf_counter()
+        storage.load(filename, track=False)
+        alone = time.perf_counter() - start
+
+        results = multiprocessing.Queue()
+        stop = multiprocessing.Event()
+        writers = [multiprocessing.Process(target=writer, args=(data_dir, filename, number, options.iterations,
+                                                                 not options.merge_off, results))
+                   for number in range(options.writers)]
+        readers = [multiprocessing.Process(target=reader, args=(data_dir, filename, stop, results))
+                   for _ in range(options.readers)]
+        start = time.perf_counter()
+        for process in readers + writers:
+            process.start()
+        reports = [results.get() for _ in writers]
+        for process in writers:
+            process.join()
+        elapsed = time.perf_counter() - start
+        stop.set()
+        reports += [results.get() for _ in readers]
+        for process in readers:
+            process.join()
+
+        final = storage.load(filename, track=False)
+        missing = sum(final.search_node(f"writer {number} node {iteration}") is None
+                      for number in range(options.writers) for iteration in range(options.iterations))
+
+    saves = sum(report[2] for report in reports if report[0] == 'writer')
+    merges = sum(report[3] for report in reports if report[0] == 'writer')
+    conflicts = sum(report[4] for report in reports if report[0] == 'writer')
+    loads = sum(report[1] for report in reports if report[0] == 'reader')
+    errors = sum(report[2] for report in reports if report[0] == 'reader')
+    slowest = max((report[3] for report in reports if report[0] == 'reader'), default=0.0)
+    print(f"{options.writers} writers x {options.iterations} saves of a {options.nodes}-node {options.format} map "
+          f"in {elapsed:.2f} s")
+    print(f"  saves {saves}, merged {merges}, conflicts {conflicts}")
+    print(f"  loads {loads}, failed {errors}, slowest {slowest * 1000:.1f} ms (alone {alone * 1000:.1f} ms)")
+    print(f"  nodes missing from the final file: {missing}")
+    sys.exit(1 if missing or errors else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""
+Benchmark suite - Timed MindMapManager operations and storage round-trips
+
+Every scenario runs on seeded generated maps, so two runs only differ by the
+code being measured. Results are written as JSON and can be compared with a
+saved baseline; slowdowns above the threshold make the run exit with status 1.
+
+Usage:
+    python -m benchmarks.suite [--sizes 1k,100k,1m] [--output results.json]
+    python -m benchmarks.suite --sizes 1k,100k --baseline baseline.json [--threshold 0.2]
+    python -m benchmarks.suite --results new.json --baseline baseline.json
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from itertools import cycle
+
+from mindmap.manager import MindMapManager
+
+from .generator import generate_map, sample_titles
+
+# Default map sizes and the number of operations timed per scenario
+DEFAULT_SIZES = "1k,100k,1m"
+OPERATIONS = 1000
+# Relative slowdown (per operation) flagged by the compare mode
+DEFAULT_THRESHOLD = 0.2
+
+
+def parse_size(text):
+    """Parse a size such as 1000, 100k or 1m"""
+    text = text.strip().lower()
+    multiplier = {'k': 1000, 'm': 1000000}.get(text[-1:], 1)
+    if multiplier != 1:
+        text = text[:-1]
+    return int(float(text) * multiplier)
+
+
+def timed(function, repeat):
+    """Run function repeat times and return the fastest duration in seconds"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def run_size(node_count, options):
+    """Run every scenario on one generated map and return their result records"""
+    records = []
+
+    def record(scenario, ops, seconds):
+        records.append({'scenario': scenario, 'nodes': node_count, 'ops': ops,
+                        'seconds': seconds, 'per_op': seconds / ops})
+        print(f"  {scenario:<20} {ops:>6} ops  {seconds * 1000:10.2f} ms  "
+              f"{seconds / ops * 1e6:10.2f} us/op", file=sys.stderr)
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        manager = MindMapManager(data_dir, compact=options.compact)
+        start = time.perf_counter()
+        manager.current_map = generate_map(node_count, options.fanout, options.depth,
+                                           options.title_length, options.seed, manager.map_class)
+        record("generate", 1, time.perf_counter() - start)
+
+        ops = min(OPERATIONS, node_count)
+        titles = sample_titles(manager.current_map, ops, options.seed)
+        record("search_node", ops, timed(lambda: [manager.search_node(t) for t in titles], options.repeat))
+
+        # Built on first use; time it separately from the queries
+        start = time.perf_counter()
+        manager.current_map.title_search_index()
+        record("build_search_index", 1, time.perf_counter() - start)
+
+        queries = [title[:4] for title in titles[:100]]
+        record("search_prefix", len(queries),
+               timed(lambda: [manager.search_nodes(q, "prefix") for q in queries], options.repeat))
+        queries = [title[1:9] for title in titles[:100]]
+        record("search_fuzzy", len(queries),
+               timed(lambda: [manager.search_nodes(q, "fuzzy") for q in queries], options.repeat))
+
+        # Adds go under nodes one level down, deletes remove them again
+        parents = sample_titles(manager.current_map, ops, options.seed, depth=1) or ["root"]
+        new_titles = [f"benchmark node {number}" for number in range(ops)]
+
+        def add_all():
+            for parent, title in zip(cycle(parents), new_titles):
+                manager.add_node(parent, title)
+
+        def delete_all():
+            for title in new_titles:
+                manager.delete_node(title)
+
+        # Each add must be undone before the next repetition, so time one pass of each
+        record("add_node", ops, timed(add_all, 1))
+        record("delete_node", ops, timed(delete_all, 1))
+
+        # Deleting the largest top-level branch, then undoing it: the undo re-links the kept subtree
+        branch = max(manager.current_map.root.children, key=lambda node: node.subtree_size).title
+        record("delete_branch", 1, timed(lambda: manager.delete_node(branch), 1))
+        record("undo_delete_branch", 1, timed(manager.undo, 1))
+
+        record("display_map", 1, timed(manager.display_map, options.repeat))
+        record("get_map_info", ops, timed(lambda: [manager.get_map_info() for _ in range(ops)], options.repeat))
+
+        # Storage round-trips through every backend, always writing the whole map
+        storage = manager.storage
+        storage.incremental = False
+        # Indexing is timed on its own below
+        storage.update_index = False
+        for backend in storage.BACKENDS:
+            name = f"roundtrip{backend.extension}"
+            fmt = backend.extension.lstrip('.')
+            # Storage prints its errors; keep the timings readable
+            with redirect_stdout(io.StringIO()):
+                record(f"save_{fmt}", 1, timed(lambda: storage.save(manager.current_map, name), options.repeat))
+                record(f"load_{fmt}", 1, timed(lambda: storage.load(name), options.repeat))
+            size = os.path.getsize(os.path.join(data_dir, name))
+            print(f"  {'':<20} file size {size / 2**20:.1f} MiB", file=sys.stderr)
+
+        # Incremental saves: the second save of a file hashes the map, later ones skip
+        # unchanged maps; the first changed save after that caches the subtree texts
+        # and the next ones copy the unchanged subtrees
+        storage.incremental = True
+        with redirect_stdout(io.StringIO()):
+            record("save_json_first", 1, timed(lambda: storage.save(manager.current_map, "incremental"), 1))
+            record("save_json_second", 1, timed(lambda: storage.save(manager.current_map, "incremental"), 1))
+            record("save_json_unchanged", 1,
+                   timed(lambda: storage.save(manager.current_map, "incremental"), options.repeat))
+            manager.add_node(parents[0], "benchmark resave")
+            record("save_json_one_change", 1, timed(lambda: storage.save(manager.current_map, "incremental"), 1))
+            manager.delete_node("benchmark resave")
+            record("save_json_cached", 1, timed(lambda: storage.save(manager.current_map, "incremental"), 1))
+
+        # Full-text index of the saved map: the first update writes every node, later
+        # ones skip the top-level branches whose content hash did not change
+        with redirect_stdout(io.StringIO()):
+            record("index_first", 1, timed(lambda: storage.index_map("incremental.json", manager.current_map), 1))
+            record("index_unchanged", 1,
+                   timed(lambda: storage.index_map("incremental.json", manager.current_map), options.repeat))
+            manager.add_node(parents[0], "benchmark reindex")
+            record("index_one_change", 1,
+                   timed(lambda: storage.index_map("incremental.json", manager.current_map), 1))
+            manager.delete_node("benchmark reindex")
+        queries = [[title.split()[0]] for title in titles[:100] if title.split()]
+        record("find", len(queries), timed(lambda: [storage.text_index.search(q, 20) for q in queries],
+                                           options.repeat))
+    return records
+
+
+def compare(results, baseline, threshold):
+    """
+    Print the per-operation time of every scenario next to its baseline and
+    return the (scenario, nodes, ratio) of those slower by more than threshold
+    """
+    base = {(r['scenario'], r['nodes']): r for r in baseline['results']}
+    slowdowns = []
+    print(f"{'scenario':<20} {'nodes':>8} {'baseline':>12} {'current':>12} {'change':>8}")
+    for result in results['results']:
+        key = (result['scenario'], result['nodes'])
+        if key not in base:
+            continue
+        ratio = result['per_op'] / base[key]['per_op'] if base[key]['per_op'] else 1.0
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  SLOWER"
+            slowdowns.append((result['scenario'], result['nodes'], ratio))
+        print(f"{result['scenario']:<20} {result['nodes']:>8} {base[key]['per_op'] * 1e6:10.2f}us "
+              f"{result['per_op'] * 1e6:10.2f}us {(ratio - 1) * 100:+7.1f}%{flag}")
+    return slowdowns
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time MindMapManager operations and storage round-trips")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="comma-separated map sizes (e.g. 1k,100k,1m)")
+    parser.add_argument("--fanout", type=int, default=10, help="maximum children per node below the root")
+    parser.add_argument("--depth", type=int, default=2, help="levels below the root")
+    parser.add_argument("--title-length", type=int, default=16, help="approximate title length")
+    parser.add_argument("--seed", type=int, default=0, help="generator seed")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per scenario (the fastest is kept)")
+    parser.add_argument("--compact", action="store_true", help="benchmark the CompactMindMap representation")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare the results with this JSON file")
+    parser.add_argument("--results", help="compare this results file instead of running the benchmarks")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="flag scenarios slower than the baseline by more than this fraction")
+    options = parser.parse_args()
+
+    if options.results:
+        with open(options.results, 'r', encoding='utf-8') as f:
+            results = json.load(f)
+    else:
+        results = {
+            'meta': {
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'representation': "compact" if options.compact else "objects",
+                'fanout': options.fanout,
+                'depth': options.depth,
+                'title_length': options.title_length,
+                'seed': options.seed,
+                'repeat': options.repeat,
+                'date': time.strftime("%Y-%m-%dT%H:%M:%S"),
+            },
+            'results': [],
+        }
+        for size in options.sizes.split(","):
+            node_count = parse_size(size)
+            print(f"{node_count} nodes:", file=sys.stderr)
+            results['results'].extend(run_size(node_count, options))
+
+    if options.output:
+        with open(options.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    elif not options.baseline:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+    if options.baseline:
+        with open(options.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        slowdowns = compare(results, baseline, options.threshold)
+        if slowdowns:
+            print(f"\n{len(slowdowns)} scenario(s) slower than the baseline by more than "
+                  f"{options.threshold:.0%}")
+            sys.exit(1)
+        print("\nNo slowdown above the threshold")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+MindMap Autosave - Background saves of copy-on-write snapshots
+
+A snapshot costs O(1) for object maps: instead of copying the tree, the map
+remembers the snapshot and each node copies its children container the first
+time it is changed while the save is running (see Node._writable_children).
+The writer reads the containers as they were when the snapshot was taken.
+Compact maps are copied outright, which is a handful of memcpy-speed array
+copies. The file is written next to the target and swapped in with os.replace,
+so a crash mid-save never leaves a truncated map behind.
+"""
+
+import threading
+
+from .metrics import METRICS
+from .storage import Storage
+
+
+class MapSnapshot:
+    """
+    Frozen view of a MindMap, valid until release() is called
+    """
+    def __init__(self, mindmap):
+        self.title = mindmap.title
+        self.node_count = mindmap.node_count
+        self.max_depth = mindmap.max_depth
+        # Node -> children container as it was when the snapshot was taken
+        self.saved = {}
+        self.root = _SnapshotNode(self, mindmap.root)
+        self._mindmap = mindmap
+        mindmap._snapshot = self
+
+    def children_of(self, node):
+        """Children of a node as they were when the snapshot was taken"""
+        # Read the live container before the saved one: a node copies its
+        # container into saved before replacing it, never after
+        children = node.children
+        return self.saved.get(node, children)
+
+    def release(self):
+        """Stop copying containers on change"""
+        if self._mindmap._snapshot is self:
+            self._mindmap._snapshot = None
+        self.saved = {}
+
+
+class _SnapshotNode:
+    """
+    Node-like view used by the storage writers while walking a snapshot
+    """
+    __slots__ = ('snapshot', 'node')
+
+    def __init__(self, snapshot, node):
+        self.snapshot = snapshot
+        self.node = node
+
+    @property
+    def title(self):
+        return self.node.title
+
+    @property
+    def children(self):
+        return [_SnapshotNode(self.snapshot, child) for child in list(self.snapshot.children_of(self.node))]
+
+
+def take_snapshot(mindmap):
+    """
+    Return (map to write, snapshot to release afterwards), or None if the map
+    cannot be saved in the background (maps read lazily from a binary file)
+    """
+    if hasattr(mindmap, '_source'):
+        return None
+    if hasattr(mindmap, 'snapshot'):
+        # CompactMindMap: an independent copy of the arrays
+        return mindmap.snapshot(), None
+    snapshot = MapSnapshot(mindmap)
+    return snapshot, snapshot
+
+
+class Autosaver:
+    """
+    Writes snapshots of a map on a daemon thread, one save at a time
+    """
+    def __init__(self, storage):
+        # Own Storage, so the catalog cache is not shared with the main thread; the
+        # file versions are, so saves from either thread check against the latest one
+        self.storage = Storage(storage.data_dir, storage.map_class, storage.default_backend.compression)
+        self.storage._versions = storage._versions
+        self._thread = None
+        # (mindmap, filename, change counter, success) of the last finished save
+        self.result = None
+
+    @property
+    def busy(self):
+        """True while a save is being written"""
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, mindmap, filename, changes):
+        """
+        Snapshot a map and start writing it to filename in the background.
+        Returns False if a save is still running or the map needs a
+        synchronous save.
+        """
+        if self.busy:
+            METRICS.increment('autosave.skipped')
+            return False
+        with METRICS.timer('autosave.snapshot'):
+            taken = take_snapshot(mindmap)
+        if taken is None:
+            return False
+        target, snapshot = taken
+        self._thread = threading.Thread(target=self._write, args=(mindmap, target, snapshot, filename, changes),
+                                        name="mindmap-autosave", daemon=True)
+        self._thread.start()
+        METRICS.increment('autosave.started')
+        return True
+
+    def _write(self, mindmap, target, snapshot, filename, changes):
+        """Thread body: save the snapshot, then stop copy-on-write"""
+        try:
+            with METRICS.timer('autosave.write'):
+                success = self.storage.save(target, filename)
+        except Exception as e:
+            print(f"Autosave error: {e}")
+            success = False
+        finally:
+            if snapshot is not None:
+                snapshot.release()
+        METRICS.increment('autosave.saved' if success else 'autosave.failed')
+        self.result = (mindmap, filename, changes, success)
+
+    def wait(self):
+        """Block until the running save (if any) has finished"""
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def collect(self):
+        """Return and forget the result of the last finished save (None if there is none)"""
+        if self.busy:
+            return None
+        result, self.result = self.result, None
+        return result
@@ -0,0 +1,192 @@
+"""
+MindMap Batch - Run one operation over every map of a data directory in parallel
+
+Files are split into chunks that are handed to a process pool; each worker
+opens its own Storage and reports one result per file, so a failing map
+never stops the sweep. Operations:
+    validate   load the map and check its counters, depth limit and titles
+    resave     load the map and write it back (folding in its journal)
+    stats      report node count, depth and file size
+    convert    rewrite the map in another format (json, json.gz, json.xz or mmb)
+"""
+
+import io
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import redirect_stdout
+
+from .models import MindMap
+from .compact import CompactMindMap
+from .storage import Storage
+from .manager import MAX_LEVEL
+
+OPERATIONS = ('validate', 'resave', 'stats', 'convert')
+
+
+def _validate(mindmap):
+    """Return a list of problems found in a loaded map"""
+    problems = []
+    count = 0
+    seen = set()
+    stack = [(mindmap.root, 0)]
+    while stack:
+        node, level = stack.pop()
+        count += 1
+        key = node.title.casefold()
+        if key in seen:
+            problems.append(f"duplicate title '{node.title}'")
+        seen.add(key)
+        if level > MAX_LEVEL:
+            problems.append(f"'{node.title}' is deeper than {MAX_LEVEL + 1} levels")
+        stack.extend((child, level + 1) for child in node.children)
+    if count != mindmap.node_count:
+        problems.append(f"node counter says {mindmap.node_count}, tree has {count}")
+    return problems
+
+
+def _process_file(storage, operation, extension, filename):
+    """Apply the operation to one file and return its result dictionary"""
+    result = {'file': filename, 'ok': False, 'error': None, 'nodes': None, 'max_depth': None, 'size': None,
+              'catalog': None}
+    start = time.perf_counter()
+    # Storage reports failures by printing them; keep the message for the result
+    output = io.StringIO()
+    try:
+        with redirect_stdout(output):
+            if operation == 'convert':
+                new_name = storage.convert(filename, extension)
+                if new_name is None:
+                    raise ValueError(output.getvalue().strip() or "conversion failed")
+                result['file'] = f"{filename} -> {new_name}"
+                result['ok'] = True
+                return result
+
+            mindmap = storage.load(filename)
+            if mindmap is None:
+                raise ValueError(output.getvalue().strip() or "could not load map")
+            result['nodes'] = mindmap.node_count
+            result['max_depth'] = mindmap.max_depth
+            if operation == 'validate':
+                problems = _validate(mindmap)
+                if problems:
+                    raise ValueError("; ".join(problems[:5]))
+            elif operation == 'resave':
+                if not storage.save(mindmap, filename):
+                    raise ValueError(output.getvalue().strip() or "save failed")
+            # Fresh catalog entry, merged by the parent process in a single write
+            name = os.path.basename(storage._get_full_path(filename))
+            result['catalog'] = (name, storage._make_catalog_entry(mindmap, storage._get_file_signature(name)))
+            result['size'] = result['catalog'][1]['size']
+        result['ok'] = True
+    except Exception as e:
+        result['error'] = str(e)
+    finally:
+        result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def process_chunk(data_dir, compact, operation, extension, filenames):
+    """Worker entry point: apply the operation to a chunk of files"""
+    storage = Storage(data_dir, CompactMindMap if compact else MindMap)
+    # Concurrent catalog rewrites would race; results carry the entries instead
+    storage.update_catalog = False
+    # Converted maps are indexed by the next find
+    storage.update_index = False
+    # Each map is saved once, so hashing it for later saves would be wasted
+    storage.incremental = False
+    return [_process_file(storage, operation, extension, filename) for filename in filenames]
+
+
+def run_batch(data_dir, operation, target_format=None, workers=None, chunk_size=None,
+              compact=False, progress=None):
+    """
+    Run an operation over every map in data_dir and return a report dictionary
+    with the per-file results, the failures and aggregate counts. progress, if
+    given, is called with (files done, total files) as chunks complete.
+    """
+    if operation not in OPERATIONS:
+        raise ValueError(f"Unknown operation '{operation}' (expected one of: {', '.join(OPERATIONS)})")
+    storage = Storage(data_dir)
+    extension = None
+    if operation == 'convert':
+        extensions = {backend.extension.lstrip('.'): backend.extension for backend in storage.BACKENDS}
+        if target_format not in extensions:
+            raise ValueError(f"Unknown format '{target_format}' (expected one of: {', '.join(extensions)})")
+        extension = extensions[target_format]
+
+    files = sorted(storage.list_files())
+    if operation == 'convert':
+        # Files already in the target format have nothing to do
+        files = [f for f in files if storage._get_backend(storage._get_full_path(f)).extension != extension]
+    workers = workers or os.cpu_count() or 1
+    if not chunk_size:
+        # About four chunks per worker balances the load without much scheduling overhead
+        chunk_size = max(1, min(256, len(files) // (workers * 4)))
+    chunks = [files[i:i + chunk_size] for i in range(0, len(files), chunk_size)]
+
+    start = time.perf_counter()
+    results = []
+    if chunks:
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as executor:
+            futures = {executor.submit(process_chunk, data_dir, compact, operation, extension, chunk): chunk
+                       for chunk in chunks}
+            for future in as_completed(futures):
+                try:
+                    results.extend(future.result())
+                except Exception as e:
+                    # A worker died: every file of its chunk is reported as failed
+                    results.extend({'file': filename, 'ok': False, 'error': f"worker failed: {e}",
+                                    'nodes': None, 'max_depth': None, 'size': None, 'catalog': None,
+                                    'seconds': 0.0}
+                                   for filename in futures[future])
+                if progress is not None:
+                    progress(len(results), len(files))
+
+    # Refresh the catalog with everything the workers measured
+    entries = dict(result['catalog'] for result in results if result['catalog'] is not None)
+    if entries:
+        storage.merge_catalog(entries)
+
+    results.sort(key=lambda result: result['file'])
+    succeeded = [result for result in results if result['ok']]
+    return {
+        'operation': operation,
+        'files': len(results),
+        'succeeded': len(succeeded),
+        'failed': [result for result in results if not result['ok']],
+        'nodes': sum(result['nodes'] or 0 for result in succeeded),
+        'max_depth': max((result['max_depth'] or 0 for result in succeeded), default=0),
+        'bytes': sum(result['size'] or 0 for result in succeeded),
+        'workers': min(workers, len(chunks)),
+        'chunks': len(chunks),
+        'seconds': time.perf_counter() - start,
+        'results': results,
+    }
+
+
+def print_progress(done, total):
+    """Progress callback that rewrites one status line on stderr"""
+    sys.stderr.write(f"\r{done}/{total} files")
+    if done == total:
+        sys.stderr.write("\n")
+    sys.stderr.flush()
+
+
+def print_report(report, verbose=False):
+    """Print the summary of a batch run (and every file's result if verbose)"""
+    if verbose:
+        for result in report['results']:
+            if result['ok']:
+                details = f"{result['nodes']} nodes" if result['nodes'] is not None else "ok"
+                print(f"  ok    {result['file']} ({details})")
+    for result in report['failed']:
+        print(f"  FAIL  {result['file']}: {result['error']}")
+
+    print(f"\n{report['operation']}: {report['succeeded']}/{report['files']} files succeeded "
+          f"in {report['seconds']:.2f}s ({report['workers']} workers, {report['chunks']} chunks)")
+    if report['operation'] != 'convert' and report['succeeded']:
+        print(f"Nodes: {report['nodes']}  Maximum depth: {report['max_depth']}")
+    if report['operation'] in ('resave', 'stats') and report['succeeded']:
+        print(f"Total size: {report['bytes']} bytes")
@@ -0,0 +1,392 @@
+"""
+Binary Map - Compact memory-mapped file format with lazy subtree loading
+
+File layout (little-endian):
+    header          magic, format version, map version, counts and section offsets
+    map title       UTF-8
+    depth counts    one uint64 per depth level (node count histogram)
+    node records    one fixed-size record per node, in preorder
+    hash table      open-addressing table of node ids keyed by casefolded title
+    titles          UTF-8 titles, referenced by offset from the records
+
+Nodes are numbered in preorder, so the first child of node i is i + 1 and a
+subtree is the contiguous id range [i, i + subtree_size). A loaded map only
+creates Node objects for the parts of the tree that are actually visited.
+"""
+
+import mmap
+import os
+import stat
+import struct
+import tempfile
+import zlib
+from array import array
+
+from .models import NO_CHILDREN, ChildList, MindMap, Node
+
+MAGIC = b'MINDMAPB'
+FORMAT_VERSION = 2
+# Extension used for binary map files
+EXTENSION = '.mmb'
+
+# magic, format version, map version (the save counter), node count, max depth,
+# hash table size, map title length, and the offsets of the depth counts,
+# records, hash table and titles sections
+HEADER = struct.Struct('<8sIQQIQIQQQQ')
+# Format version 1 had no map version
+HEADER_V1 = struct.Struct('<8sIQIQIQQQQ')
+# Leading magic and format version, common to every format version
+PREFIX = struct.Struct('<8sI')
+# parent, next sibling, child count, subtree size, depth, title offset, title length
+RECORD = struct.Struct('<IIIIIQI')
+# Marker for "no node" in the parent/sibling fields
+NONE_ID = 0xFFFFFFFF
+# Permissions of a new map file
+FILE_MODE = 0o644
+
+
+def _title_hash(key):
+    """Stable hash of a casefolded title (Python's str hash changes between runs)"""
+    return zlib.crc32(key.encode('utf-8'))
+
+
+def write_map_file(mindmap, path, version=0):
+    """
+    Write a mind map in the binary format, with version as its map version. The
+    file is written to a temporary file next to the target, synced and swapped in
+    with os.replace, so maps still memory-mapped from the old file keep working.
+    """
+    parents = array('I')
+    next_siblings = array('I')
+    child_counts = array('I')
+    depths = array('I')
+    title_offsets = array('Q')
+    title_lengths = array('I')
+    last_child = array('I')
+    titles = bytearray()
+
+    # Number the nodes in preorder, linking siblings as they are discovered
+    stack = [(mindmap.root, NONE_ID, 0)]
+    while stack:
+        node, parent_id, depth = stack.pop()
+        node_id = len(parents)
+        encoded = node.title.encode('utf-8')
+        parents.append(parent_id)
+        next_siblings.append(NONE_ID)
+        child_counts.append(0)
+        depths.append(depth)
+        title_offsets.append(len(titles))
+        title_lengths.append(len(encoded))
+        last_child.append(NONE_ID)
+        titles += encoded
+        if parent_id != NONE_ID:
+            child_counts[parent_id] += 1
+            if last_child[parent_id] != NONE_ID:
+                next_siblings[last_child[parent_id]] = node_id
+            last_child[parent_id] = node_id
+        for child in reversed(node.children):
+            stack.append((child, node_id, depth + 1))
+
+    # Subtree sizes accumulate from the leaves upwards (children follow their parent)
+    node_count = len(parents)
+    subtree_sizes = array('I', [1]) * node_count
+    for node_id in range(node_count - 1, 0, -1):
+        subtree_sizes[parents[node_id]] += subtree_sizes[node_id]
+
+    max_depth = max(depths)
+    depth_counts = array('Q', [0]) * (max_depth + 1)
+    for depth in depths:
+        depth_counts[depth] += 1
+
+    # Hash table at most half full; the first node in preorder wins on duplicates
+    hash_size = 8
+    while hash_size < node_count * 2:
+        hash_size *= 2
+    table = array('I', [0]) * hash_size
+    mask = hash_size - 1
+    seen = set()
+    for node_id in range(node_count):
+        offset = title_offsets[node_id]
+        key = titles[offset:offset + title_lengths[node_id]].decode('utf-8').casefold()
+        if key in seen:
+            continue
+        seen.add(key)
+        position = _title_hash(key) & mask
+        while table[position]:
+            position = (position + 1) & mask
+        table[position] = node_id + 1
+
+    map_title = mindmap.title.encode('utf-8')
+    depths_offset = HEADER.size + len(map_title)
+    records_offset = depths_offset + depth_counts.itemsize * len(depth_counts)
+    hash_offset = records_offset + RECORD.size * node_count
+    titles_offset = hash_offset + table.itemsize * hash_size
+
+    # A unique temporary file, so concurrent writers of the same map never share one
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.',
+                                     prefix=f".{os.path.basename(path)}.", suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, version, node_count, max_depth, hash_size, len(map_title),
+                                depths_offset, records_offset, hash_offset, titles_offset))
+            f.write(map_title)
+            f.write(depth_counts.tobytes())
+            records = bytearray()
+            for node_id in range(node_count):
+                records += RECORD.pack(parents[node_id], next_siblings[node_id], child_counts[node_id],
+                                       subtree_sizes[node_id], depths[node_id],
+                                       title_offsets[node_id], title_lengths[node_id])
+                # Write records in batches to bound the buffer size
+                if len(records) >= 1 << 20:
+                    f.write(records)
+                    records.clear()
+            f.write(records)
+            f.write(table.tobytes())
+            f.write(titles)
+            f.flush()
+            # The new file must be on disk before it replaces the old one
+            os.fsync(f.fileno())
+        # mkstemp creates the file readable by its owner only; keep the mode of the file it replaces
+        os.chmod(temp_path, stat.S_IMODE(os.stat(path).st_mode) if os.path.exists(path) else FILE_MODE)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def _unpack_header(buffer, path):
+    """Return (header struct, fields after the format version) of a binary map, map version first"""
+    magic, format_version = PREFIX.unpack_from(buffer, 0)
+    if magic != MAGIC:
+        raise ValueError(f"'{path}' is not a binary mind map")
+    if format_version == FORMAT_VERSION:
+        return HEADER, HEADER.unpack_from(buffer, 0)[2:]
+    if format_version == 1:
+        return HEADER_V1, (0,) + HEADER_V1.unpack_from(buffer, 0)[2:]
+    raise ValueError(f"Unsupported binary map version: {format_version}")
+
+
+def read_version(path):
+    """Return the map version of a binary map file from its header"""
+    with open(path, 'rb') as f:
+        return _unpack_header(f.read(HEADER.size), path)[1][0]
+
+
+class BinaryMapFile:
+    """
+    Read-only access to a binary map file through mmap
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        header, fields = _unpack_header(self._mmap, path)
+        (self.version, self.node_count, self.max_depth, self._hash_size, title_length,
+         self._depths_offset, self._records_offset, self._hash_offset, self._titles_offset) = fields
+        self.map_title = self._mmap[header.size:header.size + title_length].decode('utf-8')
+
+    def close(self):
+        """Release the memory mapping"""
+        self._mmap.close()
+
+    def depth_counts(self):
+        """Return the per-depth node counts stored in the file"""
+        counts = array('Q')
+        counts.frombytes(self._mmap[self._depths_offset:self._depths_offset + 8 * (self.max_depth + 1)])
+        return list(counts)
+
+    def record(self, node_id):
+        """Return (parent, next_sibling, child_count, subtree_size, depth, title_offset, title_length)"""
+        return RECORD.unpack_from(self._mmap, self._records_offset + RECORD.size * node_id)
+
+    def title(self, node_id):
+        """Decode the title of a node"""
+        record = self.record(node_id)
+        start = self._titles_offset + record[5]
+        return self._mmap[start:start + record[6]].decode('utf-8')
+
+    def parent(self, node_id):
+        """Return the parent id of a node (NONE_ID for the root)"""
+        return self.record(node_id)[0]
+
+    def iter_children(self, node_id):
+        """Yield the ids of the children of a node"""
+        if self.record(node_id)[2] == 0:
+            return
+        child = node_id + 1
+        while child != NONE_ID:
+            yield child
+            child = self.record(child)[1]
+
+    def subtree_depth_counts(self, node_id):
+        """Count the descendants of a node per depth by scanning its contiguous id range"""
+        counts = {}
+        subtree_size = self.record(node_id)[3]
+        for descendant in range(node_id + 1, node_id + subtree_size):
+            depth = self.record(descendant)[4]
+            counts[depth] = counts.get(depth, 0) + 1
+        return counts
+
+    def lookup(self, key):
+        """Return the id of the node indexed under a casefolded title, or None"""
+        mask = self._hash_size - 1
+        position = _title_hash(key) & mask
+        while True:
+            entry = struct.unpack_from('<I', self._mmap, self._hash_offset + 4 * position)[0]
+            if entry == 0:
+                return None
+            if self.title(entry - 1).casefold() == key:
+                return entry - 1
+            position = (position + 1) & mask
+
+
+class LazyNode(Node):
+    """
+    Node backed by a record of a binary map file; its children are only
+    turned into Node objects the first time they are accessed
+    """
+    __slots__ = ('_record', '_source', '_loaded', '_children')
+
+    def __init__(self, title, parent, record, source):
+        # Record id in the file and the file it comes from
+        self._record = record
+        self._source = source
+        record_fields = source.record(record)
+        # Leaves have nothing to load
+        self._loaded = record_fields[2] == 0
+        super().__init__(title, parent)
+        # Size of the whole stored subtree, loaded or not
+        self.subtree_size = record_fields[3]
+
+    @property
+    def children(self):
+        """List of child nodes, loaded from the file on first access"""
+        if not self._loaded:
+            self._load_children()
+        return self._children
+
+    @children.setter
+    def children(self, value):
+        self._children = value
+
+    def _load_children(self):
+        """Create LazyNode objects for the children stored in the file"""
+        self._loaded = True
+        if self._children is NO_CHILDREN:
+            self._children = ChildList()
+        for record in self._source.iter_children(self._record):
+            child = LazyNode(self._source.title(record), self, record, self._source)
+            self._children.append(child)
+            if self.mindmap is not None:
+                self.mindmap._index_loaded(child)
+
+
+class LazyMindMap(MindMap):
+    """
+    MindMap opened from a binary file; lookups go through the on-disk hash
+    table and only materialize the path to the node that was found
+    """
+    def __init__(self, source):
+        # File the nodes are loaded from
+        self._source = source
+        self.title = source.map_title
+        # Casefolded title -> Node index for materialized and newly added nodes
+        self._index = {}
+        # Record id -> LazyNode for every materialized node
+        self._loaded_nodes = {}
+        # Prefix/trigram search index over the title keys, built on first use
+        self._search_index = None
+        # Lazy maps are never saved in the background
+        self._snapshot = None
+        # Subtrees taken out by detach() and not attached back or released yet
+        self._detached = 0
+        # Node count and per-depth counts, seeded from the file header
+        self.node_count = source.node_count
+        self._depth_counts = source.depth_counts()
+        self.root = LazyNode(source.title(0), None, 0, source)
+        self.root.mindmap = self
+        self._index_loaded(self.root)
+
+    def _index_loaded(self, node):
+        """Register a node materialized from the file (already counted in the header)"""
+        self._index_title(node)
+        self._loaded_nodes[node._record] = node
+
+    def _unindex_subtree(self, node):
+        """Remove a subtree from the index and the counters without loading it from disk"""
+        self.node_count -= node.subtree_size
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            self._unindex_title(current)
+            self._depth_counts[current.depth] -= 1
+            if isinstance(current, LazyNode) and not current._loaded:
+                # Unloaded descendants are counted straight from the file records
+                for depth, count in self._source.subtree_depth_counts(current._record).items():
+                    self._depth_counts[depth] -= count
+                continue
+            stack.extend(current.children)
+        self._trim_depth_counts()
+
+    def _subtree_depth_counts(self, node):
+        """Count a subtree per depth level, reading unloaded parts from the file records"""
+        counts = {}
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            counts[current.depth] = counts.get(current.depth, 0) + 1
+            if isinstance(current, LazyNode) and not current._loaded:
+                for depth, count in self._source.subtree_depth_counts(current._record).items():
+                    counts[depth] = counts.get(depth, 0) + count
+                continue
+            stack.extend(current.children)
+        return counts
+
+    def _loaded_children(self, node):
+        """Children of a node that have been materialized (unloaded ones were never indexed)"""
+        if isinstance(node, LazyNode) and not node._loaded:
+            return ()
+        return node.children
+
+    def _iter_title_keys(self):
+        """
+        Yield the title keys stored in the file plus those added since it was opened.
+        Keys of deleted unloaded subtrees are included; searches skip them because
+        they no longer resolve to a node.
+        """
+        for node_id in range(self._source.node_count):
+            yield self._source.title(node_id).casefold()
+        yield from self._index
+
+    def _lookup(self, key):
+        """Look a title up in memory first, then in the file's hash table"""
+        node = self._index.get(key)
+        if node is None:
+            record = self._source.lookup(key)
+            if record is None:
+                return None
+            node = self._materialize(record)
+        return self._live(node)
+
+    def _materialize(self, record):
+        """Load the path from the nearest materialized ancestor down to a record"""
+        chain = []
+        while record not in self._loaded_nodes:
+            chain.append(record)
+            record = self._source.parent(record)
+        node = self._loaded_nodes[record]
+        for record in reversed(chain):
+            # Records under a deleted subtree are not part of the map anymore
+            if node.mindmap is not self:
+                return None
+            node.children
+            node = self._loaded_nodes.get(record)
+            if node is None:
+                return None
+        return node if node.mindmap is self else None
+
+
+def load_map_file(path):
+    """Open a binary map file as a LazyMindMap"""
+    return LazyMindMap(BinaryMapFile(path))
@@ -2,27 +2,60 @@
 MindMap CLI - Command-line interface for interacting with mind maps
 """
 
+import cProfile
+import io
+import json
+import pstats
+import shlex
+import shutil
 import sys
+import time
+from contextlib import redirect_stdout
 from mindmap.manager import MindMapManager
+from mindmap.history import HISTORY_LIMIT
+from mindmap.metrics import METRICS
+from mindmap import exporters
+
+# Number of functions listed by 'command --profile'
+PROFILE_TOP = 15
 
 class MindMapCLI:
     """
     Command-line interface for MindMap application
     """
-    def __init__(self):
-        # Initialize the mind map manager
-        self.manager = MindMapManager()
+    def __init__(self, data_dir="data", compact=False, journaled=False, metrics_path=None, autosave=False,
+                 history_limit=HISTORY_LIMIT, compression=None):
+        # Initialize the mind map manager (history_limit: memory cap of each map's undo history, in bytes)
+        self.manager = MindMapManager(data_dir, compact=compact, journaled=journaled, autosave=autosave,
+                                      history_limit=history_limit, compression=compression)
+        # False in script mode: every argument is given inline and nothing prompts
+        self.interactive = True
+        # File the metrics are written to as JSON on exit (None to skip)
+        self.metrics_path = metrics_path
         # Map of command names to their handler methods
         self.commands = {
             'create': self.create_map,
             'load': self.load_map,
+            'switch': self.switch_map,
             'save': self.save_map,
+            'convert': self.convert_map,
+            'diff': self.diff_maps,
+            'export': self.export_map,
+            'import': self.import_map,
+            'compact': self.compact_map,
             'list': self.list_maps,
             'display': self.display_map,
             'add': self.add_node,
+            'outline': self.add_outline,
             'delete': self.delete_node,
+            'delete-many': self.delete_nodes,
+            'move': self.move_node,
+            'undo': self.undo,
+            'redo': self.redo,
             'search': self.search_node,
+            'find': self.find_nodes,
             'info': self.show_info,
+            'stats': self.show_stats,
             'exit': self.exit_app,
             'help': self.show_help,
         }
@@ -46,34 +79,116 @@ class MindMapCLI:
                 
                 # Execute the command if recognized
                 if cmd in self.commands:
-                    self.commands[cmd](args)
+                    self._execute(cmd, args)
                 else:
                     print(f"Unknown command: '{cmd}'. Type 'help' for available commands.")
                     
             except KeyboardInterrupt:
                 print("\nExiting...")
+                self._shutdown()
                 break
             except Exception as e:
                 print(f"Error: {e}")
                 
+    def run_script(self, stream):
+        """
+        Run commands from a file or stdin without prompting. Arguments are
+        shell-quoted (add "Parent node" "New node"), blank lines and lines
+        starting with '#' are skipped, and all output is written at the end.
+        Returns the number of failed lines.
+        """
+        self.interactive = False
+        output = io.StringIO()
+        errors = 0
+        with redirect_stdout(output):
+            for line_number, line in enumerate(stream, 1):
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                try:
+                    parts = shlex.split(line)
+                    cmd = parts[0].lower()
+                    if cmd not in self.commands:
+                        errors += 1
+                        print(f"Line {line_number}: Unknown command: '{cmd}'")
+                        continue
+                    self._execute(cmd, parts[1:])
+                except SystemExit:
+                    # 'exit' stops the script
+                    break
+                except Exception as e:
+                    errors += 1
+                    print(f"Line {line_number}: Error: {e}")
+            self._shutdown()
+        sys.stdout.write(output.getvalue())
+        sys.stdout.flush()
+        return errors
+                
+    def _execute(self, cmd, args):
+        """
+        Run a command handler, recording its latency under 'command.<name>'.
+        A '--profile' argument runs it under cProfile and prints the hotspots.
+        """
+        handler = self.commands[cmd]
+        if "--profile" not in args:
+            with METRICS.timer(f"command.{cmd}"):
+                handler(args)
+            return
+            
+        args = [arg for arg in args if arg != "--profile"]
+        profiler = cProfile.Profile()
+        try:
+            with METRICS.timer(f"command.{cmd}"):
+                profiler.runcall(handler, args)
+        finally:
+            print(f"\nProfile of '{cmd}' (top {PROFILE_TOP} by cumulative time):")
+            stats = pstats.Stats(profiler, stream=sys.stdout)
+            stats.sort_stats("cumulative").print_stats(PROFILE_TOP)
+            
+    def _shutdown(self):
+        """Close the open journals and write the metrics file, if one was requested"""
+        self.manager.close_workspace()
+        if self.metrics_path:
+            with open(self.metrics_path, 'w', encoding='utf-8') as f:
+                json.dump(METRICS.snapshot(), f, indent=2)
+        
+    def _prompt(self, message):
+        """Ask the user for a value (scripts must give every argument inline)"""
+        if not self.interactive:
+            raise ValueError("missing argument (scripts cannot prompt)")
+        return input(message).strip()
+        
     def create_map(self, args):
         """Create a new mind map with interactive prompts for title and root node"""
+        if not self.interactive:
+            # Script mode: create <title> [root_title]
+            if not args:
+                print("Usage: create <title> [root_title]")
+                return
+            root_title = args[1] if len(args) > 1 else None
+            self.manager.create_map(args[0], root_title)
+            if root_title:
+                print(f"Created new mind map: '{args[0]}' with root node: '{root_title}'")
+            else:
+                print(f"Created new mind map: '{args[0]}'")
+            return
+            
         if args:
             # Use provided arguments as the map title
             map_title = " ".join(args)
         else:
             # Ask the user for the map title
-            map_title = input("Enter mind map title: ").strip()
+            map_title = self._prompt("Enter mind map title: ")
             if not map_title:
                 print("Map title cannot be empty")
                 return
         
         # Ask the user if they want a custom root node title
-        use_custom_root = input(f"Use custom root node title? (default: '{map_title}') [y/N]: ").strip().lower()
+        use_custom_root = self._prompt(f"Use custom root node title? (default: '{map_title}') [y/N]: ").lower()
         
         root_title = None
         if use_custom_root and use_custom_root[0] == 'y':
-            root_title = input("Enter root node title: ").strip()
+            root_title = self._prompt("Enter root node title: ")
             if not root_title:
                 print("Using map title as root node title")
                 root_title = None
@@ -93,31 +208,159 @@ class MindMapCLI:
             return
             
         filename = args[0]
+        if self.interactive and self.manager.dirty and self.manager.is_current_file(filename):
+            confirm = self._prompt("Discard unsaved changes and reload from disk? [y/N]: ").lower()
+            if not confirm or confirm[0] != 'y':
+                return
         success, message = self.manager.load_map(filename)
         print(message)
         
+    def switch_map(self, args):
+        """Switch to another open map, or list the open maps"""
+        if not args:
+            maps = self.manager.list_open_maps()
+            if not maps:
+                print("No open mind maps")
+                return
+            print("Open mind maps (most recently used first):")
+            for key, title, nodes, dirty, active in maps:
+                marker = "*" if active else "-"
+                status = "  [unsaved changes]" if dirty else ""
+                print(f"{marker} {key}  '{title}' ({nodes} nodes){status}")
+            return
+            
+        success, message = self.manager.switch_map(" ".join(args))
+        print(message)
+        
     def save_map(self, args):
-        """Save the current mind map to file"""
+        """Save the current mind map to file ('--overwrite' replaces a file that was not loaded)"""
+        overwrite = "--overwrite" in args
+        args = [arg for arg in args if arg != "--overwrite"]
         filename = args[0] if args else None
-        success, message = self.manager.save_map(filename)
+        success, message = self.manager.save_map(filename, overwrite)
+        print(message)
+        
+    def compact_map(self, args):
+        """Fold the operation journal of the current map into a new snapshot"""
+        success, message = self.manager.compact_map()
+        print(message)
+        
+    def convert_map(self, args):
+        """Convert a saved mind map between the JSON (plain or compressed) and binary formats"""
+        if len(args) != 2:
+            print("Usage: convert <filename> <json|json.gz|json.xz|mmb>")
+            return
+            
+        success, message = self.manager.convert_map(args[0], args[1].lower())
+        print(message)
+        
+    def diff_maps(self, args):
+        """Show the differences between two saved maps, or a saved map and the current one"""
+        if len(args) not in (1, 2):
+            print("Usage: diff <old_file> [new_file]")
+            return
+            
+        success, lines = self.manager.diff_maps(args[0], args[1] if len(args) > 1 else None)
+        if not success:
+            print(lines)
+            return
+        for line in lines:
+            print(line)
+        
+    def export_map(self, args):
+        """Write the current map to a file in another format"""
+        if len(args) != 2:
+            print("Usage: export <format> <file>")
+            for name, exporter in exporters.EXPORTERS.items():
+                print(f"  {name:<10} {exporter.description}")
+            return
+            
+        success, message = self.manager.export_map(args[0].lower(), args[1])
+        print(message)
+        
+    def import_map(self, args):
+        """Build a new map from a Markdown/outline or CSV edge list file"""
+        if len(args) != 2:
+            print(f"Usage: import <{'|'.join(exporters.importable_formats())}> <file>")
+            return
+            
+        success, message = self.manager.import_map(args[0].lower(), args[1])
         print(message)
         
     def list_maps(self, args):
-        """List all saved mind maps"""
-        files = self.manager.list_maps()
-        if not files:
+        """List all saved mind maps with their cached metadata"""
+        usage = "Usage: list [--sort name|title|nodes|depth|size|mtime] [--reverse] [--filter text]"
+        sort_fields = {'name': 'name', 'title': 'title', 'nodes': 'nodes',
+                       'depth': 'max_depth', 'size': 'size', 'mtime': 'mtime_ns'}
+        sort_key = 'name'
+        reverse = False
+        text = None
+        remaining = iter(args)
+        for arg in remaining:
+            if arg == "--sort":
+                value = next(remaining, "")
+                if value not in sort_fields:
+                    print(usage)
+                    return
+                sort_key = sort_fields[value]
+            elif arg == "--reverse":
+                reverse = True
+            elif arg == "--filter":
+                text = next(remaining, "")
+            else:
+                print(usage)
+                return
+                
+        entries = self.manager.list_map_entries(sort_key, reverse, text)
+        if not entries:
             print("No mind maps found")
             return
             
         print("Available mind maps:")
-        for file in files:
-            print(f"- {file}")
+        print(f"  {'Name':<24} {'Title':<24} {'Nodes':>8} {'Depth':>5} {'Size':>10}  Modified")
+        for entry in entries:
+            nodes = entry['nodes'] if entry['nodes'] is not None else '?'
+            depth = entry['max_depth'] if entry['max_depth'] is not None else '?'
+            title = entry['title'] if entry['title'] is not None else '(unreadable)'
+            modified = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry['mtime_ns'] / 1e9))
+            print(f"- {entry['name']:<24} {title:<24} {nodes:>8} {depth:>5} {entry['size']:>10}  {modified}")
             
     def display_map(self, args):
-        """Print the structure of the current mind map"""
-        output = self.manager.display_map()
+        """
+        Print the structure of the current map (or of a subtree) line by line
+        as the tree is walked, one screen at a time in interactive mode
+        """
+        usage = "Usage: display [node_title] [--depth N] [--all]"
+        max_depth = None
+        paged = self.interactive
+        words = []
+        remaining = iter(args)
+        for arg in remaining:
+            if arg == "--depth":
+                value = next(remaining, "")
+                if not value.isdigit():
+                    print(usage)
+                    return
+                max_depth = int(value)
+            elif arg == "--all":
+                paged = False
+            else:
+                words.append(arg)
+                
+        success, lines = self.manager.iter_display(" ".join(words) or None, max_depth)
+        if not success:
+            print(lines)
+            return
+            
         print("\nMap structure:")
-        print(output)
+        page_size = max(1, shutil.get_terminal_size().lines - 2)
+        for number, line in enumerate(lines, 1):
+            print(line)
+            if paged and number % page_size == 0:
+                answer = self._prompt("-- More (Enter: next page, q: quit) -- ").lower()
+                if answer.startswith("q"):
+                    lines.close()
+                    break
         
     def add_node(self, args):
         """Add a new node to the current mind map"""
@@ -125,12 +368,21 @@ class MindMapCLI:
             print("No active mind map. Create or load a map first.")
             return
             
+        if not self.interactive:
+            # Script mode: add <parent> <title>
+            if len(args) != 2:
+                print("Usage: add <parent> <title>")
+                return
+            success, message = self.manager.add_node(args[0], args[1])
+            print(message)
+            return
+            
         # Get the parent node title
         if args:
             parent = " ".join(args)
             print(f"Using '{parent}' as parent node")
         else:
-            parent = input("Enter parent node title (or 'root'): ").strip()
+            parent = self._prompt("Enter parent node title (or 'root'): ")
             if not parent:
                 print("Parent node cannot be empty")
                 return
@@ -147,7 +399,7 @@ class MindMapCLI:
             return
                 
         # Get the new node title
-        title = input("Enter new node title: ").strip()
+        title = self._prompt("Enter new node title: ")
         if not title:
             print("Node title cannot be empty")
             return
@@ -155,6 +407,18 @@ class MindMapCLI:
         success, message = self.manager.add_node(parent, title)
         print(message)
         
+    def add_outline(self, args):
+        """Add every node of an indented outline file in one batch"""
+        if not args:
+            print("Usage: outline <file> [parent]")
+            return
+            
+        with open(args[0], 'r', encoding='utf-8') as f:
+            text = f.read()
+        parent = " ".join(args[1:]) if len(args) > 1 else "root"
+        success, message = self.manager.add_nodes(text, parent)
+        print(message)
+        
     def delete_node(self, args):
         """Delete a node from the current mind map"""
         if not self.manager.current_map:
@@ -166,32 +430,117 @@ class MindMapCLI:
             title = " ".join(args)
             print(f"Attempting to delete node '{title}'")
         else:
-            title = input("Enter the title of the node to delete: ").strip()
+            title = self._prompt("Enter the title of the node to delete: ")
             if not title:
                 print("Node title cannot be empty")
                 return
                 
-        # Confirm with the user before deleting
-        confirm = input(f"Are you sure you want to delete '{title}'? [y/N]: ").strip().lower()
-        if not confirm or confirm[0] != 'y':
-            print("Deletion cancelled")
-            return
+        # Confirm with the user before deleting (scripts don't ask)
+        if self.interactive:
+            confirm = self._prompt(f"Are you sure you want to delete '{title}'? [y/N]: ").lower()
+            if not confirm or confirm[0] != 'y':
+                print("Deletion cancelled")
+                return
             
         success, message = self.manager.delete_node(title)
         print(message)
         
+    def delete_nodes(self, args):
+        """Delete several nodes (and their subtrees) in one operation"""
+        if not self.manager.current_map:
+            print("No active mind map. Create or load a map first.")
+            return
+            
+        if not self.interactive:
+            # Script mode: delete-many <title> <title> ...
+            if not args:
+                print("Usage: delete-many <title> [title ...]")
+                return
+            titles = args
+        else:
+            # Titles can contain spaces, so ask for one per line
+            print("Enter the titles of the nodes to delete, one per line (empty line to finish):")
+            titles = []
+            while True:
+                title = self._prompt("  title: ")
+                if not title:
+                    break
+                titles.append(title)
+            if not titles:
+                print("No node given")
+                return
+            confirm = self._prompt(f"Are you sure you want to delete {len(titles)} nodes? [y/N]: ").lower()
+            if not confirm or confirm[0] != 'y':
+                print("Deletion cancelled")
+                return
+                
+        success, message = self.manager.delete_nodes(titles)
+        print(message)
+        
+    def move_node(self, args):
+        """Move a node and its subtree under another parent"""
+        if not self.manager.current_map:
+            print("No active mind map. Create or load a map first.")
+            return
+            
+        if not self.interactive:
+            # Script mode: move <node> <new_parent>
+            if len(args) != 2:
+                print("Usage: move <node> <new_parent>")
+                return
+            title, new_parent = args
+        else:
+            title = " ".join(args) if args else self._prompt("Enter the title of the node to move: ")
+            if not title:
+                print("Node title cannot be empty")
+                return
+            new_parent = self._prompt("Enter the new parent node title (or 'root'): ")
+            if not new_parent:
+                print("Parent node cannot be empty")
+                return
+                
+        success, message = self.manager.move_node(title, new_parent)
+        print(message)
+        
+    def undo(self, args):
+        """Revert the last change(s) to the current map: undo [count]"""
+        self._step_history(args, self.manager.undo, "undo")
+        
+    def redo(self, args):
+        """Re-apply the last undone change(s): redo [count]"""
+        self._step_history(args, self.manager.redo, "redo")
+        
+    def _step_history(self, args, step, name):
+        """Run undo or redo count times, stopping at the first failure"""
+        if not self.manager.current_map:
+            print("No active mind map. Create or load a map first.")
+            return
+        if len(args) > 1 or (args and (not args[0].isdigit() or int(args[0]) < 1)):
+            print(f"Usage: {name} [count]")
+            return
+        for _ in range(int(args[0]) if args else 1):
+            success, message = step()
+            print(message)
+            if not success:
+                break
+        
     def search_node(self, args):
         """Search for a node by title"""
         if not self.manager.current_map:
             print("No active mind map. Create or load a map first.")
             return
             
+        # Ranked prefix/fuzzy search: search [--prefix|--fuzzy] [--top K] <query>
+        if any(arg in ("--prefix", "--fuzzy", "--top") for arg in args):
+            self._search_ranked(args)
+            return
+            
         # Get the node title to search
         if args:
             title = " ".join(args)
             print(f"Searching for node '{title}'")
         else:
-            title = input("Enter the title of the node to search: ").strip()
+            title = self._prompt("Enter the title of the node to search: ")
             if not title:
                 print("Node title cannot be empty")
                 return
@@ -207,6 +556,69 @@ class MindMapCLI:
         else:
             print(f"Node '{title}' not found")
             
+    def _search_ranked(self, args):
+        """Print the top-k prefix or fuzzy matches with their paths"""
+        mode = "fuzzy"
+        limit = 10
+        words = []
+        remaining = iter(args)
+        for arg in remaining:
+            if arg in ("--prefix", "--fuzzy"):
+                mode = arg[2:]
+            elif arg == "--top":
+                value = next(remaining, "")
+                if not value.isdigit() or int(value) < 1:
+                    print("Usage: search [--prefix|--fuzzy] [--top K] <query>")
+                    return
+                limit = int(value)
+            else:
+                words.append(arg)
+        query = " ".join(words)
+        if not query and mode == "fuzzy":
+            print("Usage: search [--prefix|--fuzzy] [--top K] <query>")
+            return
+            
+        results = self.manager.search_nodes(query, mode, limit)
+        if not results:
+            print(f"No node matches '{query}'")
+            return
+            
+        print(f"\nTop {len(results)} {mode} matches for '{query}':")
+        for rank, (node, score) in enumerate(results, 1):
+            path = self.manager.current_map.get_path(node)
+            print(f"{rank:>3}. {node.title}  ({score:.2f})")
+            print(f"     Path: {' > '.join(path)}")
+            
+    def find_nodes(self, args):
+        """Find nodes in every saved map through the full-text index: find [--top K] <terms>"""
+        limit = 20
+        words = []
+        remaining = iter(args)
+        for arg in remaining:
+            if arg == "--top":
+                value = next(remaining, "")
+                if not value.isdigit() or int(value) < 1:
+                    words = []
+                    break
+                limit = int(value)
+            else:
+                words.append(arg)
+        if not words:
+            print("Usage: find [--top K] <terms>")
+            return
+            
+        success, results = self.manager.find_nodes(words, limit)
+        if not success:
+            print(results)
+            return
+        query = " ".join(words)
+        if not results:
+            print(f"No saved node matches '{query}'")
+            return
+        print(f"\nSaved nodes matching '{query}'" + (f" (first {limit})" if len(results) == limit else "") + ":")
+        for name, path in results:
+            print(f"  {name}: {' > '.join(path)}")
+            
     def show_info(self, args):
         """Show basic statistics about the current mind map"""
         info = self.manager.get_map_info()
@@ -219,8 +631,41 @@ class MindMapCLI:
         print(f"Nodes: {info['nodes']}")
         print(f"Maximum depth: {info['max_depth']}")
         
+    def show_stats(self, args):
+        """Show command/storage latencies, traversal sizes and I/O counters"""
+        if args and args[0] == "reset":
+            METRICS.reset()
+            print("Statistics reset")
+            return
+            
+        snapshot = METRICS.snapshot()
+        if not snapshot['histograms'] and not snapshot['counters']:
+            print("No statistics recorded yet")
+            return
+            
+        # Latencies are in microseconds; the other histograms count items
+        print(f"\n{'Metric':<32} {'Count':>7} {'Mean':>10} {'p50':>10} {'p95':>10} {'Max':>10}")
+        for name, summary in snapshot['histograms'].items():
+            print(f"{name:<32} {summary['count']:>7} {summary['mean']:>10.0f} "
+                  f"{summary['p50']:>10} {summary['p95']:>10} {summary['max']:>10}")
+        print("(command.*, storage.* and journal.* latencies in microseconds)")
+        if snapshot['counters']:
+            print()
+            for name, value in snapshot['counters'].items():
+                print(f"{name:<32} {value:>12}")
+            
     def exit_app(self, args):
         """Exit the CLI application"""
+        unsaved = self.manager.unsaved_maps()
+        if unsaved:
+            print(f"Unsaved changes in: {', '.join(unsaved)}")
+            if self.interactive:
+                confirm = self._prompt("Exit anyway? [y/N]: ").lower()
+                if not confirm or confirm[0] != 'y':
+                    return
+        # run_script shuts down after its loop, which this exit ends
+        if self.interactive:
+            self._shutdown()
         print("Goodbye !")
         sys.exit(0)
         
@@ -228,13 +673,28 @@ class MindMapCLI:
         """Show a list of available commands"""
         print("\nAvailable commands:")
         print("  create [map_title]               - Create a new mind map (interactive prompts for details)")
-        print("  load <filename>                  - Load an existing mind map")
-        print("  save [filename]                  - Save the current mind map")
-        print("  list                             - List all available mind maps")
-        print("  display                          - Display the current mind map")
+        print("  load <filename>                  - Load an existing mind map (or switch to it if already open)")
+        print("  switch [name]                    - Switch to another open map, or list the open maps")
+        print("  save [filename] [--overwrite]    - Save the current mind map (.mmb for binary, .json.gz/.json.xz compressed)")
+        print("  convert <filename> <format>      - Convert a saved map to json, json.gz, json.xz or mmb")
+        print("  diff <old_file> [new_file]       - Show what changed between two saved maps (or a map and the current one)")
+        print("  export <format> <file>           - Write the current map as markdown, opml, dot or csv")
+        print("  import <markdown|csv> <file>     - Create a map from a Markdown/indented outline or a CSV edge list")
+        print("  compact                          - Fold the journal of the current map into a new snapshot")
+        print("  list [--sort field] [--reverse] [--filter text] - List maps with title, size and node counts")
+        print("  display [node] [--depth N] [--all] - Display the map or a subtree, one screen at a time")
         print("  add [parent]                     - Add a new node (interactive prompts)")
+        print("  outline <file> [parent]          - Add all nodes of an indented outline file at once")
         print("  delete [node_title]              - Delete a node (interactive prompts)")
+        print("  delete-many                      - Delete several nodes at once (titles prompted one per line)")
+        print("  move [node_title]                - Move a node and its subtree under another parent")
+        print("  undo [count]                     - Revert the last add, delete or move (count times)")
+        print("  redo [count]                     - Re-apply the last undone change (count times)")
         print("  search [node_title]              - Search a node (interactive prompts)")
+        print("  search --prefix|--fuzzy [--top K] <query> - Ranked prefix or fuzzy search with paths")
+        print("  find [--top K] <terms>           - Find the nodes of all saved maps whose titles contain every term")
         print("  info                             - Show information about the current map")
+        print("  stats [reset]                    - Show command and storage latencies, traversal sizes and I/O")
+        print("  <command> ... --profile          - Run one command under cProfile and print its hotspots")
         print("  help                             - Show this help message")
         print("  exit                             - Exit the application")
\ No newline at end of file
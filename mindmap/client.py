@@ -0,0 +1,153 @@
+"""
+MindMap Client - Send CLI-style commands to a running MindMap server
+
+Commands use the same words as the interactive CLI, with every argument inline:
+    create <title> [root_title]     add <parent> <title>     delete <title>
+    search <title>                  search [--prefix|--fuzzy] [--top K] <query>
+    display [node] [--depth N]      save [filename] [--overwrite]
+    info    list    ping    shutdown
+"""
+
+import json
+import shlex
+import socket
+
+
+def build_request(words, map_name=None):
+    """Turn a command line (as a list of words) into a request dictionary"""
+    if not words:
+        raise ValueError("empty command")
+    op = words[0].lower()
+    args = words[1:]
+    if op in ('ping', 'list', 'shutdown', 'info'):
+        request_args = {}
+    elif op == 'display':
+        request_args = {}
+        if "--depth" in args:
+            position = args.index("--depth")
+            if position + 1 >= len(args) or not args[position + 1].isdigit():
+                raise ValueError("Usage: display [node] [--depth N]")
+            request_args['depth'] = int(args[position + 1])
+            args = args[:position] + args[position + 2:]
+        if args:
+            request_args['node'] = " ".join(args)
+    elif op == 'create':
+        if not args:
+            raise ValueError("Usage: create <title> [root_title]")
+        request_args = {'title': args[0]}
+        if len(args) > 1:
+            request_args['root_title'] = args[1]
+    elif op == 'add':
+        if len(args) != 2:
+            raise ValueError("Usage: add <parent> <title>")
+        request_args = {'parent': args[0], 'title': args[1]}
+    elif op == 'delete':
+        if not args:
+            raise ValueError("Usage: delete <title>")
+        request_args = {'title': " ".join(args)}
+    elif op == 'save':
+        request_args = {}
+        if "--overwrite" in args:
+            request_args['overwrite'] = True
+            args = [arg for arg in args if arg != "--overwrite"]
+        if args:
+            request_args['filename'] = args[0]
+    elif op == 'search':
+        request_args = {}
+        words = []
+        remaining = iter(args)
+        for arg in remaining:
+            if arg in ("--prefix", "--fuzzy"):
+                request_args['mode'] = arg[2:]
+            elif arg == "--top":
+                request_args['limit'] = int(next(remaining, "10"))
+            else:
+                words.append(arg)
+        if request_args:
+            request_args['query'] = " ".join(words)
+        elif words:
+            request_args['title'] = " ".join(words)
+        else:
+            raise ValueError("Usage: search [--prefix|--fuzzy] [--top K] <query>")
+    else:
+        raise ValueError(f"Unknown command: '{op}'")
+    return {'op': op, 'map': map_name, 'args': request_args}
+
+
+def format_result(op, result):
+    """Render a successful result the way the interactive CLI prints it"""
+    if isinstance(result, str):
+        return result
+    if op == 'search' and isinstance(result, dict):
+        return (f"Node '{result['title']}' found\n"
+                f"Path: {' > '.join(result['path'])}\n"
+                f"Level: {result['level']}")
+    if op == 'search':
+        if not result:
+            return "No matching node"
+        return "\n".join(f"{rank:>3}. {match['title']}  ({match['score']:.2f})\n"
+                         f"     Path: {' > '.join(match['path'])}"
+                         for rank, match in enumerate(result, 1))
+    if op == 'info':
+        return (f"Mind Map: {result['title']}\nRoot Node: {result['root_node']}\n"
+                f"Nodes: {result['nodes']}\nMaximum depth: {result['max_depth']}")
+    if op == 'list':
+        return "\n".join(f"- {key}" for key in result) or "No maps loaded"
+    return json.dumps(result, indent=2, ensure_ascii=False)
+
+
+class Client:
+    """
+    Connection to a MindMap server
+    """
+    def __init__(self, socket_path):
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.connect(socket_path)
+        self._file = self._socket.makefile('rwb')
+        self._next_id = 1
+
+    def request(self, request):
+        """Send one request and return the decoded response"""
+        request = dict(request, id=self._next_id)
+        self._next_id += 1
+        self._file.write(json.dumps(request, ensure_ascii=False).encode('utf-8') + b'\n')
+        self._file.flush()
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError("server closed the connection")
+        return json.loads(line)
+
+    def close(self):
+        """Close the connection"""
+        self._file.close()
+        self._socket.close()
+
+
+def run_commands(socket_path, lines, map_name=None):
+    """
+    Send each command line to the server over one connection and print the
+    results. Blank lines and '#' comments are skipped. Returns the number of
+    failed commands.
+    """
+    client = Client(socket_path)
+    errors = 0
+    try:
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            try:
+                request = build_request(shlex.split(line), map_name)
+            except ValueError as e:
+                errors += 1
+                print(e)
+                continue
+            response = client.request(request)
+            if response['ok']:
+                print(format_result(request['op'], response['result']))
+            else:
+                errors += 1
+                print(f"Error: {response['error']}")
+    finally:
+        client.close()
+    return errors
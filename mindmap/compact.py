@@ -0,0 +1,621 @@
+"""
+Compact MindMap - Array-backed node store for very large mind maps
+"""
+
+from array import array
+
+from .search import TitleSearchIndex
+from .merkle import DIGEST_SIZE, node_digest
+
+# Sentinel used in the link arrays for "no node"
+NONE = -1
+# Marker left in the title hash table when an entry is removed
+DELETED = -2
+# Parent of the top slot of a detached subtree that was released, and of free slots
+RELEASED = -3
+# Bits of the title hashes kept next to the hash table entries
+HASH_MASK = 0xFFFFFFFF
+# Digest bytes of a new slot, not yet computed
+NO_DIGEST = bytes(DIGEST_SIZE)
+
+
+class CompactNode:
+    """
+    Thin Node-compatible view over one slot of a CompactMindMap
+    """
+    __slots__ = ('mindmap', 'index')
+
+    def __init__(self, mindmap, index):
+        # Map owning the arrays and the slot number of this node
+        self.mindmap = mindmap
+        self.index = index
+
+    @property
+    def title(self):
+        """Title of the node, decoded from the shared title buffer"""
+        return self.mindmap._get_title(self.index)
+
+    @property
+    def parent(self):
+        """View on the parent node (None for the root)"""
+        parent_index = self.mindmap._parent[self.index]
+        if parent_index == NONE:
+            return None
+        return CompactNode(self.mindmap, parent_index)
+
+    @property
+    def children(self):
+        """List of views on the child nodes, in insertion order"""
+        return [CompactNode(self.mindmap, i) for i in self.mindmap._iter_children(self.index)]
+
+    def add_child(self, title):
+        """Create a new child node with the given title and attach it"""
+        return CompactNode(self.mindmap, self.mindmap._add(self.index, title))
+
+    def remove_child(self, node):
+        """Remove a specific child node (and its whole subtree) if it exists"""
+        if node.mindmap is not self.mindmap or self.mindmap._parent[node.index] != self.index:
+            return False
+        self.mindmap._remove(node.index)
+        return True
+
+    def move_to(self, new_parent, before=None):
+        """
+        Detach this node's subtree and attach it as the last child of another
+        node of the same map (or just ahead of its child before)
+        """
+        self.mindmap._move(self.index, new_parent.index, NONE if before is None else before.index)
+
+    @property
+    def depth(self):
+        """Depth level of the node (root is level 0)"""
+        return self.mindmap._depth[self.index]
+
+    @property
+    def subtree_size(self):
+        """Number of nodes in the subtree rooted at this node (itself included)"""
+        return self.mindmap._subtree_size[self.index]
+
+    def get_level(self):
+        """Return the depth level of this node (root is level 0)"""
+        return self.mindmap._depth[self.index]
+
+    def content_hash(self):
+        """Digest of the title and the children's digests, cached by the map until the subtree changes"""
+        return self.mindmap._subtree_hash(self.index)
+
+    def __eq__(self, other):
+        return isinstance(other, CompactNode) and other.mindmap is self.mindmap and other.index == self.index
+
+    def __hash__(self):
+        return hash((id(self.mindmap), self.index))
+
+    def __str__(self):
+        """Return the node title when printed"""
+        return self.title
+
+    def to_dict(self):
+        """Convert the node and its children to a dictionary format (for saving)"""
+        return self.mindmap._subtree_to_dict(self.index)
+
+
+class CompactMindMap:
+    """
+    MindMap stored in parallel arrays instead of one Python object per node.
+
+    Links are kept as first-child/next-sibling (plus last-child and previous-sibling
+    so appends and removals stay O(1)); titles are UTF-8 encoded once into a shared
+    buffer and referenced by offset. The casefolded title index is an open-addressing
+    hash table of slot numbers, so it costs a few bytes per node instead of a dict
+    entry plus a key string; the low bits of each key's hash are stored next to its
+    entry, so a probe only decodes titles whose hash matches. CompactNode views are
+    created on demand.
+
+    Slots of removed nodes (and of released detached subtrees) go to a free list and
+    are reused by later additions, and the title buffer is rewritten without their
+    bytes once they make up half of it. Slots are never renumbered, since undo history
+    holds CompactNode views by slot number.
+    """
+    # Detached slots stay allocated until the next load whether or not undo
+    # history keeps them, so they add nothing to its memory
+    NODE_BYTES = 0
+
+    def __init__(self, title, root_title=None):
+        # Title of the mind map
+        self.title = title
+        # Parallel per-node arrays (slot 0 is the root)
+        self._parent = array('i')
+        self._first_child = array('i')
+        self._last_child = array('i')
+        self._next_sibling = array('i')
+        self._prev_sibling = array('i')
+        self._title_offset = array('Q')
+        self._title_length = array('I')
+        self._depth = array('I')
+        self._subtree_size = array('I')
+        # Shared UTF-8 buffer holding every title
+        self._titles = bytearray()
+        # Cached content digests (DIGEST_SIZE bytes per slot) and whether each one is current
+        self._hashes = bytearray()
+        self._hash_valid = bytearray()
+        # Open-addressing hash table: casefolded title -> slot index, and the low bits of each key's hash
+        self._table = array('i', [NONE]) * 8
+        self._table_hashes = array('I', [0]) * 8
+        # Table entries in use (live + DELETED markers) and live entries
+        self._table_used = 0
+        self._table_live = 0
+        # Live node count and number of nodes per depth level
+        self.node_count = 0
+        self._depth_counts = []
+        # Prefix/trigram search index over the title keys, built on first use
+        self._search_index = None
+        # Slots of removed nodes, reused by _add, and the title bytes they no longer use
+        self._free = array('i')
+        self._title_garbage = 0
+        # Number of subtrees taken out by detach() that are neither attached back nor released
+        self._detached = 0
+        root_node_title = root_title if root_title is not None else title
+        self._add(NONE, root_node_title)
+
+    @property
+    def root(self):
+        """View on the root node"""
+        return CompactNode(self, 0)
+
+    @property
+    def max_depth(self):
+        """Depth of the deepest node (root is depth 0)"""
+        return len(self._depth_counts) - 1
+
+    def _get_title(self, index):
+        """Decode the title stored for a slot"""
+        offset = self._title_offset[index]
+        return self._titles[offset:offset + self._title_length[index]].decode('utf-8')
+
+    def _store_title(self, title, existing):
+        """Return (offset, length) of the title in the shared buffer, reusing the one of slot existing if identical"""
+        encoded = title.encode('utf-8')
+        if existing is not None:
+            offset = self._title_offset[existing]
+            if self._titles[offset:offset + self._title_length[existing]] == encoded:
+                return offset, len(encoded)
+        offset = len(self._titles)
+        self._titles += encoded
+        return offset, len(encoded)
+
+    def _probe(self, key):
+        """Return (position, slot) for a casefolded title; slot is None when absent"""
+        table = self._table
+        hashes = self._table_hashes
+        mask = len(table) - 1
+        key_hash = hash(key) & HASH_MASK
+        position = key_hash & mask
+        free = None
+        while True:
+            entry = table[position]
+            if entry == NONE:
+                return (position if free is None else free), None
+            if entry == DELETED:
+                if free is None:
+                    free = position
+            elif hashes[position] == key_hash and self._get_title(entry).casefold() == key:
+                return position, entry
+            position = (position + 1) & mask
+
+    def _lookup(self, key):
+        """Return the slot indexed under a casefolded title, or None"""
+        return self._live(self._probe(key)[1])
+
+    def _top(self, index):
+        """Top slot of the tree a slot hangs in (0 unless it lies inside a detached subtree)"""
+        while self._parent[index] >= 0:
+            index = self._parent[index]
+        return index
+
+    def _live(self, index):
+        """Return an indexed slot, or None if it lies inside a detached subtree"""
+        if index is None or not self._detached:
+            return index
+        return index if self._top(index) == 0 else None
+
+    def _index_slot(self, index, key, probe=None):
+        """
+        Register a slot in the title index (first title wins on duplicates);
+        probe is the result of _probe(key) if the caller already has it
+        """
+        position, existing = probe if probe is not None else self._probe(key)
+        if existing is not None:
+            if existing != index and self._live(existing) is None:
+                # A detached subtree gives its titles up to new nodes
+                self._table[position] = index
+            return
+        if self._table[position] == NONE:
+            self._table_used += 1
+        self._table[position] = index
+        self._table_hashes[position] = hash(key) & HASH_MASK
+        self._table_live += 1
+        if self._search_index is not None:
+            self._search_index.add(key)
+        # Keep the table at most half full so probe chains stay short
+        if self._table_used * 2 > len(self._table):
+            self._resize_table()
+
+    def _unindex_slot(self, index, key):
+        """Remove a slot from the title index if it is the indexed one"""
+        position, existing = self._probe(key)
+        if existing == index:
+            self._table[position] = DELETED
+            self._table_live -= 1
+            if self._search_index is not None:
+                self._search_index.remove(key)
+
+    def _resize_table(self):
+        """Rebuild the hash table from its live entries with their stored hashes, dropping DELETED markers"""
+        live = [(entry, key_hash) for entry, key_hash in zip(self._table, self._table_hashes) if entry >= 0]
+        size = 8
+        while size < len(live) * 4:
+            size *= 2
+        table = self._table = array('i', [NONE]) * size
+        hashes = self._table_hashes = array('I', [0]) * size
+        mask = size - 1
+        for entry, key_hash in live:
+            position = key_hash & mask
+            while table[position] != NONE:
+                position = (position + 1) & mask
+            table[position] = entry
+            hashes[position] = key_hash
+        self._table_used = self._table_live = len(live)
+
+    def _iter_title_keys(self):
+        """Yield every casefolded title key of the map"""
+        for entry in self._table:
+            if entry >= 0:
+                yield self._get_title(entry).casefold()
+
+    def title_search_index(self):
+        """Return the prefix/trigram index over titles, building it on first use"""
+        if self._search_index is None:
+            self._search_index = TitleSearchIndex(self._iter_title_keys())
+        return self._search_index
+
+    def has_search_index(self):
+        """Whether the prefix/trigram index is built (ranked searches no longer change the map)"""
+        return self._search_index is not None
+
+    def snapshot(self):
+        """
+        Independent copy of the map for a background save: the arrays and the
+        title buffer are copied with memcpy-speed slices, the search index is not
+        """
+        copy = object.__new__(CompactMindMap)
+        for name, value in vars(self).items():
+            if isinstance(value, (array, bytearray, list)):
+                value = value[:]
+            copy.__dict__[name] = value
+        copy._search_index = None
+        return copy
+
+    def _iter_children(self, index):
+        """Yield the slot indexes of the children of a slot"""
+        child = self._first_child[index]
+        while child != NONE:
+            yield child
+            child = self._next_sibling[child]
+
+    def _add(self, parent_index, title):
+        """Add a new slot under the given parent (reusing a free one) and return its index"""
+        key = title.casefold()
+        probe = self._probe(key)
+        offset, length = self._store_title(title, probe[1])
+        depth = 0 if parent_index == NONE else self._depth[parent_index] + 1
+        if self._free:
+            index = self._free.pop()
+            self._parent[index] = NONE
+            self._prev_sibling[index] = NONE
+            self._next_sibling[index] = NONE
+            self._first_child[index] = NONE
+            self._last_child[index] = NONE
+            self._title_offset[index] = offset
+            self._title_length[index] = length
+            self._depth[index] = depth
+            self._subtree_size[index] = 1
+            self._hash_valid[index] = 0
+        else:
+            index = len(self._parent)
+            self._parent.append(NONE)
+            self._first_child.append(NONE)
+            self._last_child.append(NONE)
+            self._next_sibling.append(NONE)
+            self._prev_sibling.append(NONE)
+            self._title_offset.append(offset)
+            self._title_length.append(length)
+            self._depth.append(depth)
+            self._subtree_size.append(1)
+            self._hashes += NO_DIGEST
+            self._hash_valid.append(0)
+
+        # Link the new slot as the last child of its parent
+        if parent_index != NONE:
+            last = self._last_child[parent_index]
+            self._parent[index] = parent_index
+            self._prev_sibling[index] = last
+            self._next_sibling[index] = NONE
+            if last == NONE:
+                self._first_child[parent_index] = index
+            else:
+                self._next_sibling[last] = index
+            self._last_child[parent_index] = index
+            self._add_to_subtree_sizes(parent_index, 1)
+
+        # Update the counters (the parent is counted, so at most one new level appears)
+        self.node_count += 1
+        if depth == len(self._depth_counts):
+            self._depth_counts.append(0)
+        self._depth_counts[depth] += 1
+
+        self._index_slot(index, key, probe)
+        return index
+
+    def _add_to_subtree_sizes(self, index, delta):
+        """Adjust the subtree size of a slot and all of its ancestors, clearing their digests"""
+        while index != NONE:
+            self._subtree_size[index] += delta
+            self._hash_valid[index] = 0
+            index = self._parent[index]
+
+    def _get_hash(self, index):
+        """Cached digest of a slot"""
+        return bytes(self._hashes[index * DIGEST_SIZE:(index + 1) * DIGEST_SIZE])
+
+    def _subtree_hash(self, index):
+        """Content digest of the subtree rooted at a slot, computing the missing ones bottom-up"""
+        if not self._hash_valid[index]:
+            # Collect the slots whose digest is missing (parents first), then fill them in bottom-up
+            missing = []
+            stack = [index]
+            while stack:
+                current = stack.pop()
+                missing.append(current)
+                stack.extend([child for child in self._iter_children(current) if not self._hash_valid[child]])
+            for current in reversed(missing):
+                offset = self._title_offset[current]
+                title = bytes(self._titles[offset:offset + self._title_length[current]])
+                digest = node_digest(title, [self._get_hash(child) for child in self._iter_children(current)])
+                self._hashes[current * DIGEST_SIZE:(current + 1) * DIGEST_SIZE] = digest
+                self._hash_valid[current] = 1
+        return self._get_hash(index)
+
+    def _link(self, index, parent_index, before=NONE):
+        """Insert a slot into a parent's child list ahead of before (last if NONE) and add its subtree size upwards"""
+        if before == NONE:
+            prev_index = self._last_child[parent_index]
+            self._last_child[parent_index] = index
+        else:
+            prev_index = self._prev_sibling[before]
+            self._prev_sibling[before] = index
+        if prev_index == NONE:
+            self._first_child[parent_index] = index
+        else:
+            self._next_sibling[prev_index] = index
+        self._parent[index] = parent_index
+        self._prev_sibling[index] = prev_index
+        self._next_sibling[index] = before
+        self._add_to_subtree_sizes(parent_index, self._subtree_size[index])
+
+    def _unlink(self, index):
+        """Take a slot out of its parent's child list and subtract its subtree size upwards"""
+        parent_index = self._parent[index]
+        prev_index = self._prev_sibling[index]
+        next_index = self._next_sibling[index]
+        if prev_index == NONE:
+            self._first_child[parent_index] = next_index
+        else:
+            self._next_sibling[prev_index] = next_index
+        if next_index == NONE:
+            self._last_child[parent_index] = prev_index
+        else:
+            self._prev_sibling[next_index] = prev_index
+        self._add_to_subtree_sizes(parent_index, -self._subtree_size[index])
+
+    def _move(self, index, parent_index, before=NONE):
+        """Re-attach a slot (and its subtree) as the last child of another slot, or ahead of its child before"""
+        self._unlink(index)
+        self._link(index, parent_index, before)
+
+        # Shift the subtree's depths and the per-depth counters
+        delta = self._depth[parent_index] + 1 - self._depth[index]
+        if delta:
+            stack = [index]
+            while stack:
+                current = stack.pop()
+                self._depth_counts[self._depth[current]] -= 1
+                self._depth[current] += delta
+                while self._depth[current] >= len(self._depth_counts):
+                    self._depth_counts.append(0)
+                self._depth_counts[self._depth[current]] += 1
+                stack.extend(self._iter_children(current))
+            while len(self._depth_counts) > 1 and self._depth_counts[-1] == 0:
+                self._depth_counts.pop()
+
+    def _remove(self, index):
+        """Unlink a slot from its parent and drop its subtree from the title index"""
+        self._unlink(index)
+        self.node_count -= self._subtree_size[index]
+
+        self._prev_sibling[index] = NONE
+        self._next_sibling[index] = NONE
+        stack = [index]
+        while stack:
+            current = stack.pop()
+            self._unindex_slot(current, self._get_title(current).casefold())
+            self._depth_counts[self._depth[current]] -= 1
+            stack.extend(self._iter_children(current))
+            self._free_slot(current)
+        while len(self._depth_counts) > 1 and self._depth_counts[-1] == 0:
+            self._depth_counts.pop()
+        self._collect_titles()
+
+    def _free_slot(self, index):
+        """Put a slot whose node is gone for good on the free list"""
+        self._parent[index] = RELEASED
+        self._free.append(index)
+        self._title_garbage += self._title_length[index]
+
+    def _collect_titles(self):
+        """Rewrite the title buffer without the bytes of free slots once they make up half of it"""
+        if self._title_garbage * 2 <= len(self._titles):
+            return
+        free = set(self._free)
+        offsets = self._title_offset
+        lengths = self._title_length
+        old = self._titles
+        titles = bytearray()
+        # Slots sharing the bytes of an identical title keep sharing them
+        moved = {}
+        for index in range(len(offsets)):
+            if index in free:
+                continue
+            offset = offsets[index]
+            new_offset = moved.get(offset)
+            if new_offset is None:
+                new_offset = moved[offset] = len(titles)
+                titles += old[offset:offset + lengths[index]]
+            offsets[index] = new_offset
+        self._titles = titles
+        self._title_garbage = 0
+
+    def place_of(self, node):
+        """Return (parent, next sibling or None) of a node, to move it back there with move_to()"""
+        next_index = self._next_sibling[node.index]
+        return node.parent, (None if next_index == NONE else CompactNode(self, next_index))
+
+    def detach(self, node):
+        """
+        Take a node's subtree out of the map, leaving its slots linked and its
+        titles indexed (lookups skip them), so attach() can put it back without
+        visiting it. Returns the place to pass to attach(); release() drops the
+        subtree for good.
+        """
+        index = node.index
+        parent, before = self.place_of(node)
+        depth_counts = {}
+        stack = [index]
+        while stack:
+            current = stack.pop()
+            depth = self._depth[current]
+            depth_counts[depth] = depth_counts.get(depth, 0) + 1
+            stack.extend(self._iter_children(current))
+        self._unlink(index)
+        self.node_count -= self._subtree_size[index]
+        self._parent[index] = NONE
+        self._prev_sibling[index] = NONE
+        self._next_sibling[index] = NONE
+        for depth, count in depth_counts.items():
+            self._depth_counts[depth] -= count
+        while len(self._depth_counts) > 1 and self._depth_counts[-1] == 0:
+            self._depth_counts.pop()
+        self._detached += 1
+        return parent, before, depth_counts
+
+    def attach(self, node, place):
+        """Put a detached subtree back where detach() took it from, in O(height)"""
+        parent, before, depth_counts = place
+        self._link(node.index, parent.index, NONE if before is None else before.index)
+        self.node_count += self._subtree_size[node.index]
+        for depth, count in depth_counts.items():
+            while depth >= len(self._depth_counts):
+                self._depth_counts.append(0)
+            self._depth_counts[depth] += count
+        self._detached -= 1
+
+    def release(self, node):
+        """Drop the titles of a detached subtree from the index once it will not be attached again"""
+        self._detached -= 1
+        stack = [node.index]
+        while stack:
+            current = stack.pop()
+            self._unindex_slot(current, self._get_title(current).casefold())
+            stack.extend(self._iter_children(current))
+            self._free_slot(current)
+        self._collect_titles()
+
+    def shadowed_node(self, title):
+        """
+        Return the detached node (kept for undo) whose title a new node would
+        take over, or None
+        """
+        index = self._probe(title.casefold())[1]
+        if index is None or self._live(index) is not None:
+            return None
+        return CompactNode(self, index)
+
+    def _claim_title(self, node):
+        """Index a node's title under it again if a detached node holds it"""
+        self._index_slot(node.index, node.title.casefold())
+
+    def _restore_title(self, node, previous):
+        """Give a title key back to the detached node it was taken over from"""
+        key = node.title.casefold()
+        position, existing = self._probe(key)
+        if existing != node.index:
+            return
+        # previous may have been released since, and its slot freed or reused by another node
+        top = self._top(previous.index)
+        if top != 0 and self._parent[top] != RELEASED and self._get_title(previous.index).casefold() == key:
+            self._table[position] = previous.index
+
+    def search_node(self, title, node=None):
+        """Search for a node by title (case-insensitive), optionally within a subtree"""
+        index = self._lookup(title.casefold())
+        if index is None:
+            return None
+        if node is not None and node.index != 0:
+            # Only accept the indexed slot if it lies inside the requested subtree
+            current = index
+            while current != NONE and current != node.index:
+                current = self._parent[current]
+            if current == NONE:
+                return None
+        return CompactNode(self, index)
+
+    def get_path(self, node):
+        """Return the path (titles) from the root to the specified node"""
+        path = []
+        current = node.index
+        while current != NONE:
+            path.append(self._get_title(current))
+            current = self._parent[current]
+        path.reverse()
+        return path
+
+    def _subtree_to_dict(self, index):
+        """Convert the subtree rooted at a slot to nested dictionaries (iteratively)"""
+        result = {'title': self._get_title(index), 'children': []}
+        stack = [(index, result)]
+        while stack:
+            current, current_data = stack.pop()
+            for child in self._iter_children(current):
+                child_data = {'title': self._get_title(child), 'children': []}
+                current_data['children'].append(child_data)
+                stack.append((child, child_data))
+        return result
+
+    def to_dict(self):
+        """Convert the entire mind map to a dictionary for saving"""
+        return {
+            'title': self.title,
+            'root_title': self._get_title(0),
+            'children': self._subtree_to_dict(0)['children']
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Reconstruct a CompactMindMap instance from a dictionary (e.g., loaded from JSON)"""
+        mindmap = cls(data['title'], data.get('root_title'))
+        stack = [(0, child_data) for child_data in reversed(data.get('children', []))]
+        while stack:
+            parent_index, node_data = stack.pop()
+            index = mindmap._add(parent_index, node_data['title'])
+            for child_data in reversed(node_data.get('children', [])):
+                stack.append((index, child_data))
+        return mindmap
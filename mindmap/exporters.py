@@ -0,0 +1,325 @@
+"""
+MindMap Exporters - Streaming writers (and readers) for outside formats
+
+Each exporter walks the tree iteratively and writes lines to the file in
+batches as it goes, so exporting a map takes memory independent of its size.
+Exporters that can also read their format back are the importers.
+"""
+
+import csv
+from itertools import chain
+from xml.sax.saxutils import escape, quoteattr
+
+from .metrics import METRICS
+
+# Number of pending lines before they are written out
+WRITE_BATCH = 4096
+
+
+def iter_preorder(root):
+    """
+    Yield (node, depth, number, parent number) for every node in display order,
+    numbering from 0. Only one child iterator per open level is kept.
+    """
+    yield root, 0, 0, None
+    number = 1
+    # Each frame: (iterator over the remaining children, number of their parent); depth is len(stack)
+    stack = [(iter(root.children), 0)]
+    while stack:
+        child = next(stack[-1][0], None)
+        if child is None:
+            stack.pop()
+            continue
+        yield child, len(stack), number, stack[-1][1]
+        stack.append((iter(child.children), number))
+        number += 1
+
+
+def iter_outline(lines):
+    """
+    Parse indented outline lines into (level, title) pairs, level 0 being the top.
+    Lines may use '- ' or '* ' bullets (as printed by display); deeper indentation
+    than the previous line means a child of it.
+    """
+    # Indentation widths of the currently open levels
+    indents = []
+    for line in lines:
+        stripped = line.strip()
+        if not stripped:
+            continue
+        expanded = line.expandtabs(2)
+        width = len(expanded) - len(expanded.lstrip())
+        while indents and indents[-1] >= width:
+            indents.pop()
+        yield len(indents), stripped[2:].strip() if stripped[:2] in ('- ', '* ') else stripped
+        indents.append(width)
+
+
+def add_imported(mindmap, parent, title, max_level, where):
+    """
+    Add a node read from a file under parent, refusing what add_node refuses:
+    an empty title, a title already in the map (case-insensitively) or a node
+    below max_level (None for no limit). where names the item in errors.
+    """
+    if not title:
+        raise ValueError(f"{where}: node title cannot be empty")
+    if mindmap.search_node(title) is not None:
+        raise ValueError(f"{where}: a node with title '{title}' already exists")
+    if max_level is not None and parent.get_level() >= max_level:
+        raise ValueError(f"{where}: maximum depth of {max_level + 1} levels reached (including root)")
+    return parent.add_child(title)
+
+
+class _Exporter:
+    """
+    Base class: subclasses produce the lines of the file, written in batches
+    """
+    name = None
+    extension = None
+    description = None
+    # Passed to open(): csv needs newline='' to write its own line endings
+    newline = None
+
+    def write(self, mindmap, f):
+        """Stream a map to an open text file and return the number of nodes written"""
+        batch = []
+        count = 0
+        for line in self.iter_lines(mindmap):
+            if line is None:
+                # One node done
+                count += 1
+                continue
+            batch.append(line)
+            if len(batch) >= WRITE_BATCH:
+                f.write(''.join(batch))
+                batch.clear()
+        f.write(''.join(batch))
+        return count
+
+    def iter_lines(self, mindmap):
+        """Yield the text of the file in pieces, and None after each node"""
+        raise NotImplementedError
+
+
+class MarkdownExporter(_Exporter):
+    """
+    Nested Markdown list under a heading with the map title; read back as an outline
+    """
+    name = 'markdown'
+    extension = '.md'
+    description = "Markdown nested list under a title heading (importable)"
+
+    def iter_lines(self, mindmap):
+        yield f"# {mindmap.title}\n\n"
+        for node, depth, _, _ in iter_preorder(mindmap.root):
+            yield f"{'  ' * depth}- {node.title}\n"
+            yield None
+
+    def read(self, f, map_class, max_level=None):
+        """
+        Build a map from a Markdown list or an indented outline. An optional
+        '# heading' first line gives the map title; the single top-level item
+        is the root and every other item must be indented under it, at most
+        max_level levels below it (no limit if None).
+        """
+        lines = iter(f)
+        title = None
+        for line in lines:
+            if line.strip():
+                if line.startswith('# '):
+                    title = line[2:].strip()
+                else:
+                    lines = chain([line], lines)
+                break
+
+        mindmap = None
+        # Open nodes, one per level, from the root down
+        path = []
+        for level, text in iter_outline(lines):
+            if mindmap is None:
+                if level != 0:
+                    raise ValueError(f"Item '{text}': indentation skips a level")
+                mindmap = map_class(title or text, text)
+                path.append(mindmap.root)
+            elif level == 0:
+                raise ValueError(f"Item '{text}' is a second top-level item; indent it under '{path[0].title}'")
+            elif level > len(path):
+                raise ValueError(f"Item '{text}': indentation skips a level")
+            else:
+                del path[level:]
+                path.append(add_imported(mindmap, path[-1], text, max_level, f"Item '{text}'"))
+        if mindmap is None:
+            raise ValueError("The outline has no items")
+        return mindmap
+
+
+class OpmlExporter(_Exporter):
+    """
+    OPML 2.0 outline, readable by most outliners and mind-mapping tools
+    """
+    name = 'opml'
+    extension = '.opml'
+    description = "OPML 2.0 outline"
+
+    def iter_lines(self, mindmap):
+        yield '<?xml version="1.0" encoding="UTF-8"?>\n<opml version="2.0">\n'
+        yield f"  <head>\n    <title>{escape(mindmap.title)}</title>\n  </head>\n  <body>\n"
+        # Depths of the outline elements still open
+        open_depths = []
+        for node, depth, _, _ in iter_preorder(mindmap.root):
+            while open_depths and open_depths[-1] >= depth:
+                yield f"{'  ' * (open_depths.pop() + 2)}</outline>\n"
+            indent = '  ' * (depth + 2)
+            if node.subtree_size > 1:
+                yield f"{indent}<outline text={quoteattr(node.title)}>\n"
+                open_depths.append(depth)
+            else:
+                yield f"{indent}<outline text={quoteattr(node.title)}/>\n"
+            yield None
+        while open_depths:
+            yield f"{'  ' * (open_depths.pop() + 2)}</outline>\n"
+        yield "  </body>\n</opml>\n"
+
+
+class DotExporter(_Exporter):
+    """
+    Graphviz digraph with one edge per parent/child link
+    """
+    name = 'dot'
+    extension = '.dot'
+    description = "Graphviz DOT digraph"
+
+    @staticmethod
+    def _quote(text):
+        """DOT double-quoted string"""
+        return '"' + text.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+
+    def iter_lines(self, mindmap):
+        yield f"digraph {self._quote(mindmap.title)} {{\n  rankdir=LR;\n  node [shape=box];\n"
+        for node, _, number, parent_number in iter_preorder(mindmap.root):
+            yield f"  n{number} [label={self._quote(node.title)}];\n"
+            if parent_number is not None:
+                yield f"  n{parent_number} -> n{number};\n"
+            yield None
+        yield "}\n"
+
+
+class CsvExporter(_Exporter):
+    """
+    Edge list with one row per node: id, parent id (empty for the root), title
+    """
+    name = 'csv'
+    extension = '.csv'
+    description = "CSV edge list with id,parent,title rows (importable)"
+    newline = ''
+    header = ['id', 'parent', 'title']
+
+    def write(self, mindmap, f):
+        writer = csv.writer(f)
+        writer.writerow(self.header)
+        batch = []
+        count = 0
+        for node, _, number, parent_number in iter_preorder(mindmap.root):
+            batch.append((number, '' if parent_number is None else parent_number, node.title))
+            count += 1
+            if len(batch) >= WRITE_BATCH:
+                writer.writerows(batch)
+                batch.clear()
+        writer.writerows(batch)
+        return count
+
+    def read(self, f, map_class, max_level=None):
+        """
+        Build a map from an edge list. The root is the row with an empty parent;
+        rows may come in any order, children of unseen parents wait for them.
+        The map is titled after its root; no node may lie more than max_level
+        levels below it (no limit if None).
+        """
+        try:
+            return self._read_rows(csv.reader(f), map_class, max_level)
+        except csv.Error as e:
+            raise ValueError(f"Malformed CSV: {e}")
+
+    def _read_rows(self, rows, map_class, max_level=None):
+        """Build a map from parsed (id, parent, title) rows"""
+        mindmap = None
+        # Row id -> created node, and parent id -> [(row number, id, title)] waiting for that parent
+        nodes = {}
+        waiting = {}
+        for number, row in enumerate(rows, 1):
+            if not row or (number == 1 and [cell.strip().lower() for cell in row] == self.header):
+                continue
+            if len(row) != 3:
+                raise ValueError(f"Row {number}: expected 3 columns (id,parent,title), got {len(row)}")
+            row_id, parent_id, title = row
+            if row_id in nodes:
+                raise ValueError(f"Row {number}: duplicate id '{row_id}'")
+            if not parent_id:
+                if mindmap is not None:
+                    raise ValueError(f"Row {number}: second root '{title}'")
+                if not title:
+                    raise ValueError(f"Row {number}: node title cannot be empty")
+                mindmap = map_class(title, title)
+                nodes[row_id] = mindmap.root
+            elif parent_id in nodes:
+                nodes[row_id] = add_imported(mindmap, nodes[parent_id], title, max_level, f"Row {number}")
+            else:
+                waiting.setdefault(parent_id, []).append((number, row_id, title))
+                continue
+            # Attach the rows that were waiting for this one (and for their own children)
+            stack = [row_id]
+            while stack:
+                ready_id = stack.pop()
+                for child_number, child_id, child_title in waiting.pop(ready_id, ()):
+                    if child_id in nodes:
+                        raise ValueError(f"Row {child_number}: duplicate id '{child_id}'")
+                    nodes[child_id] = add_imported(mindmap, nodes[ready_id], child_title, max_level,
+                                                   f"Row {child_number}")
+                    stack.append(child_id)
+        if mindmap is None:
+            raise ValueError("No root row (a row with an empty parent)")
+        if waiting:
+            raise ValueError(f"Unknown parent id(s): {', '.join(sorted(waiting)[:5])}")
+        return mindmap
+
+
+# Available export formats by name; those with a read() method can be imported too
+EXPORTERS = {}
+
+
+def register_exporter(exporter):
+    """Make an exporter (an instance with name, extension and write()) available by name"""
+    EXPORTERS[exporter.name] = exporter
+    return exporter
+
+
+for _exporter in (MarkdownExporter(), OpmlExporter(), DotExporter(), CsvExporter()):
+    register_exporter(_exporter)
+
+
+def importable_formats():
+    """Names of the formats that can be read back"""
+    return [name for name, exporter in EXPORTERS.items() if hasattr(exporter, 'read')]
+
+
+def export_map(mindmap, format_name, path):
+    """Write a map to a file in the named format and return the number of nodes written"""
+    exporter = EXPORTERS[format_name]
+    with METRICS.timer(f"export.{format_name}"):
+        with open(path, 'w', encoding='utf-8', newline=exporter.newline) as f:
+            count = exporter.write(mindmap, f)
+    METRICS.observe('traversal.export.nodes', count)
+    return count
+
+
+def import_map(format_name, path, map_class, max_level=None):
+    """
+    Build a map of the given class from a file in the named format, with no
+    node more than max_level levels below the root (no limit if None)
+    """
+    exporter = EXPORTERS[format_name]
+    with METRICS.timer(f"import.{format_name}"):
+        with open(path, 'r', encoding='utf-8', newline=exporter.newline) as f:
+            mindmap = exporter.read(f, map_class, max_level)
+    METRICS.observe('traversal.import.nodes', mindmap.node_count)
+    return mindmap
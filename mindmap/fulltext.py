@@ -0,0 +1,237 @@
+"""
+MindMap Full-text Index - Inverted index of node titles across saved maps
+
+An SQLite database in the data directory maps every title token to the
+(map file, node path) pairs of the nodes whose title contains it, so a query
+over thousands of maps reads a few postings instead of the map files.
+
+Nodes are grouped by top-level branch, and each branch keeps the content hash
+it had when it was indexed. Re-indexing a saved map only reads back the node
+paths of the branches whose hash changed and writes the difference between
+the old and new sets (a path ends with the node's title, so equal paths have
+equal tokens); unchanged branches are not touched. Database errors are raised
+as FullTextIndexError.
+"""
+
+import os
+import re
+import sqlite3
+from contextlib import closing, contextmanager
+
+# Tokens are runs of letters, digits and underscores of the casefolded title
+TOKEN = re.compile(r'\w+')
+# Separator of the titles in a stored node path (from the root title down)
+PATH_SEPARATOR = '\x1f'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS maps (
+    id INTEGER PRIMARY KEY,
+    file TEXT NOT NULL UNIQUE,
+    root_title TEXT NOT NULL,
+    size INTEGER, mtime_ns INTEGER, journal_size INTEGER
+);
+CREATE TABLE IF NOT EXISTS branches (
+    id INTEGER PRIMARY KEY,
+    map INTEGER NOT NULL,
+    key TEXT NOT NULL,
+    digest BLOB,
+    UNIQUE (map, key)
+);
+CREATE TABLE IF NOT EXISTS nodes (
+    id INTEGER PRIMARY KEY,
+    branch INTEGER NOT NULL,
+    path TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS nodes_by_branch ON nodes (branch);
+CREATE TABLE IF NOT EXISTS postings (
+    token TEXT NOT NULL,
+    node INTEGER NOT NULL,
+    PRIMARY KEY (token, node)
+) WITHOUT ROWID;
+"""
+
+
+def tokenize(text):
+    """Set of the casefolded word tokens of a text"""
+    return set(TOKEN.findall(text.casefold()))
+
+
+def _path_tokens(path):
+    """Tokens of the node a stored path leads to (its last title)"""
+    return tokenize(path.rpartition(PATH_SEPARATOR)[2])
+
+
+def _iter_paths(node, prefix):
+    """Yield (path, title) for every node of a subtree, prefix being the path of its parent"""
+    stack = [(node, prefix)]
+    while stack:
+        node, prefix = stack.pop()
+        title = node.title
+        path = prefix + PATH_SEPARATOR + title
+        yield path, title
+        for child in node.children:
+            stack.append((child, path))
+
+
+class FullTextIndexError(Exception):
+    """The index database could not be read or written"""
+
+
+class FullTextIndex:
+    """
+    Persistent token -> (map file, node path) index of a data directory
+    """
+    NAME = '.index.sqlite'
+
+    def __init__(self, data_dir):
+        self.path = os.path.join(data_dir, self.NAME)
+
+    @contextmanager
+    def _connect(self, transaction=False):
+        """
+        Open the database for the duration of the block, creating its tables on
+        first use; with transaction, the block's changes are committed together
+        (or rolled back if it raises)
+        """
+        try:
+            # A connection per call, so any thread can use the index
+            with closing(sqlite3.connect(self.path, timeout=30)) as connection:
+                # Readers keep going while another process writes
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.execute("PRAGMA synchronous=NORMAL")
+                # Room for the B-tree pages a large map's postings touch (in KiB)
+                connection.execute("PRAGMA cache_size=-65536")
+                connection.executescript(SCHEMA)
+                if transaction:
+                    with connection:
+                        yield connection
+                else:
+                    yield connection
+        except sqlite3.Error as e:
+            raise FullTextIndexError(str(e)) from e
+
+    def signatures(self):
+        """Return file name -> file signature (size, mtime_ns, journal_size) of the indexed maps"""
+        with self._connect() as connection:
+            return {file: {'size': size, 'mtime_ns': mtime_ns, 'journal_size': journal_size}
+                    for file, size, mtime_ns, journal_size
+                    in connection.execute("SELECT file, size, mtime_ns, journal_size FROM maps")}
+
+    def update(self, filename, mindmap, signature):
+        """
+        Index a map as saved to filename (with the file's signature), rewriting
+        only the branches whose content hash changed. Returns the number of
+        nodes added to and removed from the index.
+        """
+        root = mindmap.root
+        with self._connect(transaction=True) as connection:
+            # Node ids are allocated here, so keep other writers out until commit
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute("SELECT id, root_title FROM maps WHERE file = ?", (filename,)).fetchone()
+            if row is None:
+                map_id = connection.execute("INSERT INTO maps (file, root_title) VALUES (?, ?)",
+                                            (filename, root.title)).lastrowid
+                stored = {}
+            else:
+                map_id = row[0]
+                stored = {key: (branch_id, digest) for branch_id, key, digest in connection.execute(
+                    "SELECT id, key, digest FROM branches WHERE map = ?", (map_id,))}
+                if row[1] != root.title:
+                    # Every stored path starts with the root title
+                    stored = {key: (branch_id, None) for key, (branch_id, _) in stored.items()}
+            connection.execute("UPDATE maps SET root_title = ?, size = ?, mtime_ns = ?, journal_size = ? "
+                               "WHERE id = ?", (root.title, signature['size'], signature['mtime_ns'],
+                                                signature['journal_size'], map_id))
+            next_id = connection.execute("SELECT coalesce(max(id), 0) + 1 FROM nodes").fetchone()[0]
+
+            # Top-level children by title key; children sharing a key form one branch.
+            # The root is the '' branch, its own title being its whole content.
+            branches = {'': None}
+            for child in root.children:
+                branches.setdefault(child.title.casefold(), []).append(child)
+            changed = 0
+            findall = TOKEN.findall
+            new_nodes = []
+            new_postings = []
+            for key, children in branches.items():
+                if children is None:
+                    digest = root.title.encode('utf-8')
+                elif all(hasattr(child, 'content_hash') for child in children):
+                    digest = b''.join(child.content_hash() for child in children)
+                else:
+                    # Snapshots written by autosave have no hashes: their branches are always diffed
+                    digest = None
+                branch_id, stored_digest = stored.pop(key, (None, None))
+                if branch_id is not None and digest is not None and digest == stored_digest:
+                    continue
+
+                if children is None:
+                    paths = {root.title: root.title}
+                else:
+                    paths = {path: title for child in children for path, title in _iter_paths(child, root.title)}
+                if branch_id is None:
+                    branch_id = connection.execute("INSERT INTO branches (map, key, digest) VALUES (?, ?, ?)",
+                                                   (map_id, key, digest)).lastrowid
+                    old = {}
+                else:
+                    connection.execute("UPDATE branches SET digest = ? WHERE id = ?", (digest, branch_id))
+                    old = dict(connection.execute("SELECT path, id FROM nodes WHERE branch = ?", (branch_id,)))
+                changed += self._delete_nodes(connection, [(node_id, path) for path, node_id in old.items()
+                                                           if path not in paths])
+                for path, title in paths.items():
+                    if path not in old:
+                        new_nodes.append((next_id, branch_id, path))
+                        for token in set(findall(title.casefold())):
+                            new_postings.append((token, next_id))
+                        next_id += 1
+
+            # Branches that are gone
+            for branch_id, _ in stored.values():
+                changed += self._delete_nodes(connection, connection.execute(
+                    "SELECT id, path FROM nodes WHERE branch = ?", (branch_id,)).fetchall())
+                connection.execute("DELETE FROM branches WHERE id = ?", (branch_id,))
+
+            connection.executemany("INSERT INTO nodes (id, branch, path) VALUES (?, ?, ?)", new_nodes)
+            connection.executemany("INSERT OR IGNORE INTO postings (token, node) VALUES (?, ?)", new_postings)
+            return changed + len(new_nodes)
+
+    def _delete_nodes(self, connection, nodes):
+        """Remove (node id, path) entries and their postings; returns how many"""
+        if not nodes:
+            return 0
+        connection.executemany("DELETE FROM postings WHERE token = ? AND node = ?",
+                               [(token, node_id) for node_id, path in nodes for token in _path_tokens(path)])
+        connection.executemany("DELETE FROM nodes WHERE id = ?", [(node_id,) for node_id, _ in nodes])
+        return len(nodes)
+
+    def remove(self, filenames):
+        """Drop maps from the index"""
+        with self._connect(transaction=True) as connection:
+            for filename in filenames:
+                row = connection.execute("SELECT id FROM maps WHERE file = ?", (filename,)).fetchone()
+                if row is None:
+                    continue
+                for (branch_id,) in connection.execute("SELECT id FROM branches WHERE map = ?", row).fetchall():
+                    self._delete_nodes(connection, connection.execute(
+                        "SELECT id, path FROM nodes WHERE branch = ?", (branch_id,)).fetchall())
+                connection.execute("DELETE FROM branches WHERE map = ?", row)
+                connection.execute("DELETE FROM maps WHERE id = ?", row)
+
+    def search(self, terms, limit=None):
+        """
+        Return (file, path) of the nodes whose title contains every token of
+        terms, sorted by file and path; a path is the list of titles from the root
+        """
+        tokens = sorted(tokenize(' '.join(terms)))
+        if not tokens:
+            return []
+        hits = " INTERSECT ".join(["SELECT node FROM postings WHERE token = ?"] * len(tokens))
+        query = (f"SELECT maps.file, nodes.path FROM ({hits}) AS hits "
+                 f"JOIN nodes ON nodes.id = hits.node JOIN branches ON branches.id = nodes.branch "
+                 f"JOIN maps ON maps.id = branches.map ORDER BY maps.file, nodes.path")
+        parameters = list(tokens)
+        if limit is not None:
+            query += " LIMIT ?"
+            parameters.append(limit)
+        with self._connect() as connection:
+            return [(file, path.split(PATH_SEPARATOR)) for file, path in connection.execute(query, parameters)]
@@ -0,0 +1,119 @@
+"""
+MindMap History - Undo and redo through structural sharing
+
+Each change is recorded as the operations that revert it. A deleted subtree
+is detached from the map but kept whole by reference (see MindMap.detach),
+so undoing the delete re-links it instead of rebuilding it: the cost does not
+depend on the size of the subtree, and nothing is copied. Operations:
+    ('attach', node, place, previous)   put a detached subtree back
+    ('detach', node, previous)          take an added node out again
+    ('move', node, (parent, before))    move a node back ahead of before
+previous is the detached node whose title the node took over (or None).
+
+The history is capped by an estimate of the memory it keeps alive; the
+oldest entries are dropped first and their detached subtrees released.
+"""
+
+from collections import deque
+
+from .metrics import METRICS
+
+# Default cap on the memory kept alive by the history of one map, in bytes
+HISTORY_LIMIT = 64 * 1024 * 1024
+# Estimated cost of an entry and of each of its operations
+ENTRY_BYTES = 200
+OPERATION_BYTES = 100
+
+
+class History:
+    """
+    Undo and redo stacks of changes to one map
+    """
+    def __init__(self, mindmap, limit=HISTORY_LIMIT):
+        self.mindmap = mindmap
+        # Cap on the estimated memory of both stacks, in bytes
+        self.limit = limit
+        # [label, operations, estimated bytes] entries, oldest first
+        self._undo = deque()
+        self._redo = deque()
+        # Estimated memory of both stacks
+        self.size = 0
+
+    def __len__(self):
+        """Number of changes that can be undone"""
+        return len(self._undo)
+
+    def _entry(self, label, operations):
+        """Build a stack entry, estimating what it keeps alive"""
+        retained = sum(operation[1].subtree_size for operation in operations if operation[0] == 'attach')
+        size = ENTRY_BYTES + OPERATION_BYTES * len(operations) + self.mindmap.NODE_BYTES * retained
+        self.size += size
+        return [label, operations, size]
+
+    def _drop(self, entry):
+        """Forget an entry, releasing the subtrees only it kept"""
+        self.size -= entry[2]
+        for operation in entry[1]:
+            if operation[0] == 'attach':
+                self.mindmap.release(operation[1])
+
+    def _trim(self):
+        """Drop the oldest entries (then the farthest redos) until the history fits its cap"""
+        while self.size > self.limit and (self._undo or self._redo):
+            self._drop(self._undo.popleft() if self._undo else self._redo.popleft())
+            METRICS.increment('history.evictions')
+
+    def record(self, label, operations):
+        """Record a change by the operations that revert it; redo is no longer possible"""
+        while self._redo:
+            self._drop(self._redo.pop())
+        self._undo.append(self._entry(label, operations))
+        self._trim()
+
+    def _apply(self, operation):
+        """Apply one operation and return the one that reverts it"""
+        mindmap = self.mindmap
+        kind, node = operation[0], operation[1]
+        if kind == 'attach':
+            previous = operation[3]
+            mindmap.attach(node, operation[2])
+            if previous is not None:
+                mindmap._claim_title(node)
+            return ('detach', node, previous)
+        if kind == 'detach':
+            previous = operation[2]
+            place = mindmap.detach(node)
+            if previous is not None:
+                mindmap._restore_title(node, previous)
+            return ('attach', node, place, previous)
+        place = mindmap.place_of(node)
+        parent, before = operation[2]
+        node.move_to(parent, before)
+        return ('move', node, place)
+
+    def _replay(self, source, target, metric):
+        """Apply the newest entry of one stack and push its reverse onto the other"""
+        if not source:
+            return None
+        label, operations, size = source.pop()
+        self.size -= size
+        with METRICS.timer(metric):
+            reverse = [self._apply(operation) for operation in reversed(operations)]
+        target.append(self._entry(label, reverse))
+        self._trim()
+        return label, list(reversed(operations))
+
+    def undo(self):
+        """Revert the last change; returns (label, operations applied) or None if there is none"""
+        return self._replay(self._undo, self._redo, 'history.undo')
+
+    def redo(self):
+        """Re-apply the last undone change; returns (label, operations applied) or None"""
+        return self._replay(self._redo, self._undo, 'history.redo')
+
+    def clear(self):
+        """Forget every entry, releasing the detached subtrees"""
+        while self._undo:
+            self._drop(self._undo.pop())
+        while self._redo:
+            self._drop(self._redo.pop())
@@ -0,0 +1,202 @@
+"""
+MindMap Journal - Append-only operation log stored next to a map file
+
+Each line is a compact JSON array describing one change:
+    ["a", parent_title, title]   add a node
+    ["d", title]                 delete a node (and its subtree)
+    ["m", title, new_parent]     move a node (and its subtree) under another node
+Adds and moves made by undo/redo may end with the title of the sibling the
+node goes ahead of; without one the node becomes the last child.
+Loading a map replays its journal on top of the last snapshot. The same
+records, kept in memory by a ChangeLog, let a save merge unsaved changes
+into a map file that another process rewrote.
+"""
+
+import json
+import os
+from contextlib import nullcontext
+
+from .metrics import METRICS
+
+# Extension appended to the map file path for its journal
+EXTENSION = '.journal'
+# Records kept for merging before a map is considered too changed to merge
+MERGE_LIMIT = 100000
+
+
+class _Recorder:
+    """
+    Base class: builds operation records and hands them to append()
+    """
+    def append(self, op, *args):
+        """Handle one operation record"""
+        raise NotImplementedError
+
+    def record_add(self, parent_title, title, before_title=None):
+        """Record that a node was added under a parent (ahead of a sibling if given)"""
+        if before_title is None:
+            self.append('a', parent_title, title)
+        else:
+            self.append('a', parent_title, title, before_title)
+
+    def record_delete(self, title):
+        """Record that a node (and its subtree) was deleted"""
+        self.append('d', title)
+
+    def record_move(self, title, new_parent_title, before_title=None):
+        """Record that a node (and its subtree) was moved under another node (ahead of a sibling if given)"""
+        if before_title is None:
+            self.append('m', title, new_parent_title)
+        else:
+            self.append('m', title, new_parent_title, before_title)
+
+
+class ChangeLog(_Recorder):
+    """
+    Records of the node operations made to a map since it was last loaded or
+    saved, kept so that a save can re-apply them on top of a newer version of
+    the file written by another process (see Storage.save)
+    """
+    def __init__(self, limit=MERGE_LIMIT):
+        # Records in the journal line format; None once more than limit were made
+        self.records = []
+        self.limit = limit
+
+    def append(self, op, *args):
+        """Keep one operation record"""
+        if self.records is None:
+            return
+        if len(self.records) >= self.limit:
+            # Too many to keep: a conflicting save will fail instead of merging
+            self.records = None
+            return
+        self.records.append([op, *args])
+
+    def drop(self, count):
+        """Forget the first count records (they were saved)"""
+        if self.records is not None:
+            del self.records[:count]
+
+    def clear(self):
+        """Forget every record (the map was saved or reloaded)"""
+        self.records = []
+
+
+class Journal(_Recorder):
+    """
+    Append-only log of node operations for one map file. Records are kept in
+    memory until sync writes them, holding the lock of the map file if one is
+    given, so the lines of concurrent writers never interleave.
+    """
+    def __init__(self, path, lock=None, on_sync=None):
+        # Path of the sidecar log file
+        self.path = path
+        # Context manager factory for the lock of the map file (None: no locking)
+        self.lock = lock
+        # Called with the size of the log file before and after each write
+        self.on_sync = on_sync
+        # Lines not written yet, and their size in bytes
+        self._lines = []
+        self._pending_bytes = 0
+        # Size of the log in bytes, pending lines included
+        self.size = os.path.getsize(path) if os.path.exists(path) else 0
+
+    def append(self, op, *args):
+        """Append one operation record (buffered until the next sync)"""
+        line = _encode_record([op, *args])
+        self._lines.append(line)
+        size = len(line.encode('utf-8'))
+        self._pending_bytes += size
+        self.size += size
+        METRICS.increment('journal.bytes_written', size)
+
+    def sync(self):
+        """Write the pending lines to the end of the log and fsync them to disk"""
+        if not self._lines:
+            return
+        with self.lock() if self.lock is not None else nullcontext():
+            # Reopened each time: another process may have folded the log into a snapshot
+            with open(self.path, 'a', encoding='utf-8') as f:
+                before = os.fstat(f.fileno()).st_size
+                f.write(''.join(self._lines))
+                f.flush()
+                with METRICS.timer('journal.fsync'):
+                    os.fsync(f.fileno())
+            if self.on_sync is not None:
+                self.on_sync(before, before + self._pending_bytes)
+        self.size = before + self._pending_bytes
+        self._lines = []
+        self._pending_bytes = 0
+
+    def discard(self):
+        """Drop the pending lines (the map is reloaded without their changes)"""
+        self.size -= self._pending_bytes
+        self._lines = []
+        self._pending_bytes = 0
+
+    def close(self):
+        """Write the pending lines"""
+        self.sync()
+
+
+def _encode_record(record):
+    """One journal line"""
+    return json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+def replay(path, mindmap):
+    """
+    Apply the operations of a journal file to a map and return how many were applied.
+    Operations that no longer apply (already folded into the snapshot) are skipped,
+    and a truncated last line from an interrupted write is ignored.
+    """
+    applied = 0
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            if apply_record(mindmap, record):
+                applied += 1
+    return applied
+
+
+def apply_record(mindmap, record):
+    """Apply one operation record to a map; returns False if it does not apply to it"""
+    if record[0] == 'a':
+        parent = mindmap.search_node(record[1])
+        if parent is None or mindmap.search_node(record[2]):
+            return False
+        child = parent.add_child(record[2])
+        before = _sibling(mindmap, record, 3, parent)
+        if before is not None:
+            child.move_to(parent, before)
+    elif record[0] == 'd':
+        node = mindmap.search_node(record[1])
+        if node is None or node.parent is None:
+            return False
+        node.parent.remove_child(node)
+    elif record[0] == 'm':
+        node = mindmap.search_node(record[1])
+        parent = mindmap.search_node(record[2])
+        if node is None or parent is None or node.parent is None or node.parent == parent:
+            return False
+        # Skip a move that would put the node inside its own subtree
+        current = parent
+        while current is not None and current != node:
+            current = current.parent
+        if current is not None:
+            return False
+        node.move_to(parent, _sibling(mindmap, record, 3, parent))
+    else:
+        return False
+    return True
+
+
+def _sibling(mindmap, record, position, parent):
+    """Child of parent named by an optional trailing field of a record, or None"""
+    if len(record) <= position:
+        return None
+    sibling = mindmap.search_node(record[position])
+    return sibling if sibling is not None and sibling.parent == parent else None
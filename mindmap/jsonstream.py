@@ -0,0 +1,448 @@
+"""
+JSON Stream - Iterative JSON writer and incremental reader for mind map files
+
+Both directions walk the tree with an explicit stack, so a map is never held
+as a nested dict and deep maps don't hit Python's recursion limit. The reader
+decodes each node object whose text is under DECODE_LIMIT with json's C
+scanner and walks larger ones key by key. Apart from the leading "version"
+counter of saved files, the output is byte-for-byte what
+json.dump(map.to_dict(), indent=2, ensure_ascii=False) would produce.
+"""
+
+import json
+import re
+from json.decoder import scanstring
+
+from .models import MindMap
+
+# Size of the chunks read from the file by the tokenizer
+CHUNK_SIZE = 64 * 1024
+# Minimum number of buffered characters before a token is matched
+LOOKAHEAD = 64
+# Node objects with shorter texts are decoded whole by json's C scanner (the rest key by key)
+DECODE_LIMIT = 1024 * 1024
+# Number of pending string pieces before they are written out
+WRITE_BATCH = 4096
+# Subtrees at least this large are not cached whole by incremental saves (their children are)
+FRAGMENT_NODES = 256
+# A run of cached siblings ends after a child whose hash starts with a byte below this (1 in 64)
+RUN_BOUNDARY = 4
+
+# One punctuation or string token, preceded by optional whitespace
+_TOKEN = re.compile(r'[ \t\n\r]*(?:([{}\[\]:,])|"([^"\\]*(?:\\.[^"\\]*)*)")', re.DOTALL)
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+# Version counter written first in a map file
+_VERSION = re.compile(r'[ \t\n\r]*\{[ \t\n\r]*"version"[ \t\n\r]*:[ \t\n\r]*([0-9]+)')
+# Characters read to find it
+VERSION_LOOKAHEAD = 128
+_encode = json.JSONEncoder(ensure_ascii=False).encode
+_raw_decode = json.JSONDecoder().raw_decode
+# Returned by _Scanner.decode for values longer than its limit
+TOO_LARGE = object()
+
+
+def write_map(mindmap, f, fragments=None, version=None):
+    """
+    Write a mind map to a text file in the indented JSON format, walking the tree iteratively.
+    fragments, if given, holds the UTF-8 encoded texts of subtrees from the previous
+    save, keyed by content hash: unchanged subtrees are copied from it to the binary
+    buffer under f instead of being serialized and encoded again, and it is refilled
+    with the texts written this time. version, if given, is written first so
+    read_version finds it without parsing the map.
+    """
+    root = mindmap.root
+    pieces = [
+        '{\n',
+        f'  "title": {_encode(mindmap.title)},\n',
+        f'  "root_title": {_encode(root.title)},\n',
+        '  "children": ',
+    ]
+    if version is not None:
+        pieces.insert(1, f'  "version": {version},\n')
+    if fragments is None:
+        _write_children(root, 1, pieces, f)
+    else:
+        _write_fragments(root, pieces, f, fragments)
+    pieces.append('\n}')
+    f.write(''.join(pieces))
+
+
+def _write_fragments(root, pieces, f, fragments):
+    """
+    Write the children array of the root, reusing the texts of unchanged subtrees.
+    Subtrees smaller than FRAGMENT_NODES are grouped into runs of siblings that end
+    after a child whose hash starts with a low byte, so an insertion or removal only
+    changes the run it falls in. Larger subtrees are cached as the nested parts of
+    their text (sharing the run strings) with the keys of the entries below them,
+    and opened only when their hash changed. Everything after the header goes to
+    the binary buffer under f.
+    """
+    children = root.children
+    if not children:
+        pieces.append('[]')
+        return
+
+    previous = dict(fragments)
+    fragments.clear()
+    f.write(''.join(pieces))
+    pieces.clear()
+    f.flush()
+    # Each frame: [iterator over the remaining children, indentation level, first child?,
+    #              pending run, parts of the text, keys of the cached entries inside, own key]
+    stack = [[iter(children), 1, True, [], [b'['], [], None]]
+    while stack:
+        frame = stack[-1]
+        child = next(frame[0], None)
+        small = child is not None and child.subtree_size < FRAGMENT_NODES
+        if small:
+            digest = child.content_hash()
+            frame[3].append((child, digest))
+            if digest[0] >= RUN_BOUNDARY:
+                continue
+
+        # Emit the pending run: at a boundary, before a large subtree or at the end
+        run = frame[3]
+        if run:
+            key = ('run', frame[1], b''.join([digest for _, digest in run]))
+            text = previous.get(key) or fragments.get(key)
+            if text is None:
+                text = _run_text([node for node, _ in run], frame[1]).encode('utf-8')
+            fragments[key] = text
+            frame[4].append(b'\n' if frame[2] else b',\n')
+            frame[4].append(text)
+            frame[5].append(key)
+            frame[2] = False
+            frame[3] = []
+
+        if child is None:
+            # Close the array, then the node object that owns it (if any), and cache it
+            stack.pop()
+            frame[4].append(b'\n' + b'  ' * frame[1] + b']')
+            if not stack:
+                _write_parts(frame[4], f.buffer)
+                break
+            frame[4].append(b'\n' + b'  ' * (frame[1] - 1) + b'}')
+            entry = fragments[frame[6]] = (tuple(frame[4]), tuple(frame[5]))
+            stack[-1][4].append(entry[0])
+            stack[-1][5].extend(entry[1])
+            stack[-1][5].append(frame[6])
+        elif not small:
+            frame[4].append(b'\n' if frame[2] else b',\n')
+            frame[2] = False
+            key = ('node', frame[1], child.content_hash())
+            entry = previous.get(key) or fragments.get(key)
+            if entry is not None:
+                # Unchanged: reuse its text and keep the entries it is made of
+                for inner_key in entry[1]:
+                    fragments[inner_key] = previous.get(inner_key) or fragments[inner_key]
+                fragments[key] = entry
+                frame[4].append(entry[0])
+                frame[5].extend(entry[1])
+                frame[5].append(key)
+                continue
+            indent = '  ' * (frame[1] + 1)
+            header = f'{indent}{{\n{indent}  "title": {_encode(child.title)},\n{indent}  "children": ['
+            stack.append([iter(child.children), frame[1] + 2, True, [], [header.encode('utf-8')], [], key])
+
+
+def _write_parts(parts, f):
+    """
+    Write nested tuples/lists of byte strings in order. f is a buffered binary
+    stream: joining the cached texts first would only copy them once more.
+    """
+    stack = [iter(parts)]
+    while stack:
+        part = next(stack[-1], None)
+        if part is None:
+            stack.pop()
+        elif isinstance(part, bytes):
+            f.write(part)
+        else:
+            stack.append(iter(part))
+
+
+def _run_text(nodes, level):
+    """JSON text of consecutive node objects (and their subtrees) inside an array at the given indentation level"""
+    indent = '  ' * (level + 1)
+    pieces = []
+    for position, node in enumerate(nodes):
+        if position:
+            pieces.append(',\n')
+        pieces.append(f'{indent}{{\n{indent}  "title": {_encode(node.title)},\n{indent}  "children": ')
+        _write_children(node, level + 2, pieces, None)
+        pieces.append(f'\n{indent}}}')
+    return ''.join(pieces)
+
+
+def _write_children(node, level, pieces, f):
+    """
+    Write the children array of a node whose key sits at the given indentation level
+    (with f None, everything is left in pieces)
+    """
+    children = node.children
+    if not children:
+        pieces.append('[]')
+        return
+
+    pieces.append('[')
+    # Each frame: [iterator over the remaining children, indentation level, first child?]
+    stack = [[iter(children), level, True]]
+    while stack:
+        frame = stack[-1]
+        child = next(frame[0], None)
+        if child is None:
+            # Close the array, then the node object that owns it (if any)
+            stack.pop()
+            pieces.append('\n' + '  ' * frame[1] + ']')
+            if stack:
+                pieces.append('\n' + '  ' * (frame[1] - 1) + '}')
+            continue
+
+        pieces.append('\n' if frame[2] else ',\n')
+        frame[2] = False
+        indent = '  ' * (frame[1] + 1)
+        pieces.append(f'{indent}{{\n{indent}  "title": {_encode(child.title)},\n{indent}  "children": ')
+        grandchildren = child.children
+        if grandchildren:
+            pieces.append('[')
+            stack.append([iter(grandchildren), frame[1] + 2, True])
+        else:
+            pieces.append(f'[]\n{indent}}}')
+
+        # Flush regularly so the output never accumulates in memory
+        if f is not None and len(pieces) >= WRITE_BATCH:
+            f.write(''.join(pieces))
+            pieces.clear()
+
+
+class _Scanner:
+    """
+    Buffered reader of a JSON text file: punctuation and strings are matched one
+    token at a time, whole values are decoded by json's C scanner
+    """
+
+    def __init__(self, f, chunk_size=CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self, size):
+        """Read until at least size characters follow the current position, or the file ends"""
+        chunks = [self.buffer[self.pos:]]
+        length = len(chunks[0])
+        self.pos = 0
+        while length < size and not self.eof:
+            chunk = self.f.read(max(self.chunk_size, size - length))
+            if not chunk:
+                self.eof = True
+            chunks.append(chunk)
+            length += len(chunk)
+        self.buffer = ''.join(chunks)
+
+    def _error(self, message):
+        return ValueError(f"{message} near: {self.buffer[self.pos:self.pos + 40]!r}")
+
+    def peek(self):
+        """Return the next non-whitespace character without consuming it ('' at the end of the file)"""
+        while True:
+            self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer) or self.eof:
+                return self.buffer[self.pos:self.pos + 1]
+            self._fill(self.chunk_size)
+
+    def token(self):
+        """
+        Consume the next token and return (kind, value): kind is the character for
+        punctuation, '"' for a string (its value decoded) and '' at the end of the file
+        """
+        while True:
+            # Keep some lookahead so a token is never cut by the buffer end
+            if self.eof or len(self.buffer) - self.pos >= LOOKAHEAD:
+                match = _TOKEN.match(self.buffer, self.pos)
+                if match is not None:
+                    break
+                if self.eof:
+                    if self.peek() == '':
+                        return '', None
+                    raise self._error("Invalid JSON")
+            # Read more input when a longer token (string) is still incomplete
+            self._fill(len(self.buffer) - self.pos + self.chunk_size)
+        self.pos = match.end()
+        punct = match.group(1)
+        if punct is not None:
+            return punct, None
+        string = match.group(2)
+        if '\\' in string:
+            string = scanstring(match.group(0).lstrip(' \t\n\r'), 1)[0]
+        return '"', string
+
+    def expect(self, expected):
+        """Consume a punctuation token, checking it is the expected one"""
+        kind, _ = self.token()
+        if kind != expected:
+            raise self._error(f"Expected {expected!r}")
+
+    def decode(self, limit=None):
+        """
+        Consume the next value and return it, or return TOO_LARGE without consuming
+        anything if its text runs past limit characters
+        """
+        self.peek()
+        # Numbers and literals must not be cut by the buffer end either
+        if not self.eof and len(self.buffer) - self.pos < LOOKAHEAD:
+            self._fill(LOOKAHEAD)
+        while True:
+            try:
+                value, end = _raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError as error:
+                available = len(self.buffer) - self.pos
+                if self.eof:
+                    raise self._error(f"Invalid JSON ({error.msg})") from None
+                if limit is not None and available >= limit:
+                    return TOO_LARGE
+                # The value is incomplete: retry with twice the text, so retries cost O(limit)
+                size = available * 2 + self.chunk_size
+                self._fill(size if limit is None else min(size, limit))
+                continue
+            self.pos = end
+            return value
+
+
+def read_map(f, map_class=MindMap, header=None):
+    """
+    Build a mind map from a JSON text file, creating nodes as the text arrives.
+    header, if given, receives the 'version' of the file (0 if it has none).
+    """
+    scanner = _Scanner(f)
+    scanner.expect('{')
+    title = None
+    root_title = None
+    mindmap = None
+    version = 0
+
+    kind, key = scanner.token()
+    while kind != '}':
+        if kind != '"':
+            raise scanner._error("Expected a key")
+        scanner.expect(':')
+        if key == 'children':
+            if mindmap is None:
+                if title is None:
+                    raise ValueError("Map 'children' found before its 'title'")
+                mindmap = map_class(title, root_title)
+            _read_children(scanner, mindmap.root)
+        else:
+            # Unknown keys are decoded and dropped
+            value = scanner.decode()
+            if key == 'version':
+                version = _checked(value, int, 'version')
+            elif key == 'title':
+                title = _checked(value, str, 'title')
+            elif key == 'root_title':
+                root_title = _checked(value, str, 'root_title')
+        kind, key = scanner.token()
+        if kind == ',':
+            kind, key = scanner.token()
+        elif kind != '}':
+            raise scanner._error("Expected ',' or '}'")
+
+    if mindmap is None:
+        if title is None:
+            raise ValueError("Map has no 'title'")
+        mindmap = map_class(title, root_title)
+    if header is not None:
+        header['version'] = version
+    return mindmap
+
+
+def read_version(f):
+    """Return the version counter at the start of a map file, without reading the rest (0 if it has none)"""
+    match = _VERSION.match(f.read(VERSION_LOOKAHEAD))
+    return int(match.group(1)) if match else 0
+
+
+def _checked(value, kind, key):
+    """Return a decoded value, checking its type"""
+    if not isinstance(value, kind) or isinstance(value, bool):
+        raise ValueError(f"'{key}' should be {'a string' if kind is str else 'a number'}")
+    return value
+
+
+def _read_children(scanner, parent):
+    """
+    Read a children array and attach its nodes under the given parent, iteratively.
+    A node object whose text is shorter than DECODE_LIMIT is decoded whole; a larger
+    one is walked key by key, so no more than that is ever decoded at once.
+    """
+    scanner.expect('[')
+    # Each frame: ['array', parent node, first element?] or ['object', parent node, node once titled, first key?]
+    frames = [['array', parent, True]]
+    while frames:
+        frame = frames[-1]
+        if frame[0] == 'array':
+            if frame[2]:
+                frame[2] = False
+                if scanner.peek() == ']':
+                    scanner.token()
+                    frames.pop()
+                    continue
+            else:
+                kind, _ = scanner.token()
+                if kind == ']':
+                    frames.pop()
+                    continue
+                if kind != ',':
+                    raise scanner._error("Expected ',' or ']'")
+            if scanner.peek() != '{':
+                raise scanner._error("Expected a node object")
+            data = scanner.decode(DECODE_LIMIT)
+            if data is TOO_LARGE:
+                scanner.token()
+                frames.append(['object', frame[1], None, True])
+            else:
+                _add_subtree(frame[1], data)
+            continue
+
+        kind, key = scanner.token()
+        if frame[3]:
+            frame[3] = False
+        elif kind == ',':
+            kind, key = scanner.token()
+        elif kind != '}':
+            raise scanner._error("Expected ',' or '}'")
+        if kind == '}':
+            if frame[2] is None:
+                raise ValueError("Node without a 'title'")
+            frames.pop()
+            continue
+        if kind != '"':
+            raise scanner._error("Expected a key")
+        scanner.expect(':')
+        if key == 'title':
+            frame[2] = frame[1].add_child(_checked(scanner.decode(), str, 'title'))
+        elif key == 'children':
+            if frame[2] is None:
+                raise ValueError("Node 'children' found before its 'title'")
+            scanner.expect('[')
+            frames.append(['array', frame[2], True])
+        else:
+            scanner.decode()
+
+
+def _add_subtree(parent, data):
+    """Attach the node of a decoded object, and its descendants, under the given parent"""
+    stack = [(parent, data)]
+    while stack:
+        parent, data = stack.pop()
+        title = data.get('title') if isinstance(data, dict) else None
+        if not isinstance(title, str):
+            raise ValueError("Node without a 'title'")
+        node = parent.add_child(title)
+        children = data.get('children')
+        if children:
+            if not isinstance(children, list):
+                raise ValueError("Node 'children' should be an array")
+            # Reversed, so siblings are popped (and added) in order
+            stack.extend([(node, child) for child in reversed(children)])
@@ -2,50 +2,541 @@
 MindMap Manager - Core logic for managing mind maps
 """
 
+import os
+import time
+from collections import OrderedDict
+from itertools import islice
+
 from mindmap.models import MindMap, Node
+from mindmap.compact import CompactMindMap
 from mindmap.storage import Storage
+from mindmap.search import search_prefix, search_fuzzy
+from mindmap.merkle import diff_maps
+from mindmap.fulltext import FullTextIndexError
+from mindmap import exporters
+from mindmap.exporters import iter_outline, iter_preorder
+from mindmap.metrics import METRICS
+from mindmap.autosave import Autosaver
+from mindmap.history import History, HISTORY_LIMIT
+from mindmap.journal import ChangeLog, apply_record
+
+# Journal size (in bytes) above which a save folds the journal into a new snapshot
+JOURNAL_THRESHOLD = 4 * 1024 * 1024
+# Deepest level a node can be added at (3 levels including the root)
+MAX_LEVEL = 2
+# Total node count of the open maps above which the least recently used ones are closed
+WORKSPACE_NODE_LIMIT = 2000000
+# Autosave once this many changes are pending, or once changes are this many seconds old
+AUTOSAVE_CHANGES = 50
+AUTOSAVE_INTERVAL = 30
+
+def parse_outline(text):
+    """
+    Parse an indented outline into (level, title) pairs, level 0 being the top.
+    Lines may use '- ' or '* ' bullets (as printed by display); deeper indentation
+    than the previous line means a child of it.
+    """
+    return list(iter_outline(text.splitlines()))
+
+class WorkspaceEntry:
+    """
+    A map kept open in the workspace while another map is active
+    """
+    def __init__(self, mindmap, filename, journal, dirty, history, unsaved):
+        self.map = mindmap
+        # File the map belongs to (None if it was never saved)
+        self.filename = filename
+        # Open journal of the file (journaled mode)
+        self.journal = journal
+        # True if the map has changes that are not on disk
+        self.dirty = dirty
+        # Undo/redo history of the map (None if nothing was recorded)
+        self.history = history
+        # Changes not saved yet, for merging (see MindMapManager._merge_unsaved)
+        self.unsaved = unsaved
 
 class MindMapManager:
     """
     Manager class for handling mind map operations
     """
-    def __init__(self, data_dir="data"):
-        # Initialize the storage system (file-based persistence)
-        self.storage = Storage(data_dir)
+    def __init__(self, data_dir="data", compact=False, journaled=False, journal_threshold=JOURNAL_THRESHOLD,
+                 workspace_limit=WORKSPACE_NODE_LIMIT, autosave=False, history_limit=HISTORY_LIMIT,
+                 compression=None):
+        # Map representation: array-backed CompactMindMap or one object per node
+        self.map_class = CompactMindMap if compact else MindMap
+        # Initialize the storage system (file-based persistence; compression of new JSON files)
+        self.storage = Storage(data_dir, self.map_class, compression)
         # Holds the currently active mind map
         self.current_map = None
+        # File the current map was loaded from or last saved to (None if never saved)
+        self.current_file = None
+        # Journaled mode: changes are appended to a sidecar log and saves only sync it
+        self.journaled = journaled
+        self.journal_threshold = journal_threshold
+        # Open journal of the current file (journaled mode, once the map has a snapshot)
+        self.journal = None
+        # Changes to the current map since it was loaded or saved (when not journaled),
+        # re-applied if another process saves its file in the meantime
+        self.unsaved = ChangeLog()
+        self._autosaved_records = 0
+        # True if the current map has changes that are not on disk
+        self.dirty = False
+        # Other open maps, least recently used first, keyed by _workspace_key
+        self.workspace = OrderedDict()
+        # Node count above which parked maps are closed (unsaved changes are saved or kept)
+        self.workspace_limit = workspace_limit
+        # Autosave: changes of the current map are written by a background thread
+        self.autosaver = Autosaver(self.storage) if autosave else None
+        # Changes made to the current map, and the count at the last (auto)save
+        self.changes = 0
+        self._autosaved_changes = 0
+        self._autosaved_at = time.monotonic()
+        # Undo/redo history of the current map, and the memory cap (in bytes) of each map's history
+        self.history = None
+        self.history_limit = history_limit
+        
+    def _workspace_key(self, filename, title=None):
+        """Key of a map in the workspace: its file name with extension, or its title if unsaved"""
+        if filename:
+            return os.path.basename(self.storage._get_full_path(filename))
+        return f"unsaved:{title}"
+        
+    def _park_current(self):
+        """Move the current map into the workspace as the most recently used entry"""
+        if not self.current_map:
+            return
+        self._finish_autosave()
+        key = self._workspace_key(self.current_file, self.current_map.title)
+        # Two unsaved maps can share a title; keep both
+        base_key = key
+        copy = 2
+        while key in self.workspace:
+            key = f"{base_key} ({copy})"
+            copy += 1
+        history = self.history if self.history is not None and self.history.mindmap is self.current_map else None
+        self.workspace[key] = WorkspaceEntry(self.current_map, self.current_file, self.journal, self.dirty, history,
+                                             self.unsaved)
+        self.current_map = None
+        self.current_file = None
+        self.journal = None
+        self.dirty = False
+        self.history = None
+        self.unsaved = ChangeLog()
+        
+    def _activate(self, key):
+        """Make a workspace entry the current map"""
+        entry = self.workspace.pop(key)
+        self.current_map = entry.map
+        self.current_file = entry.filename
+        self.journal = entry.journal
+        self.dirty = entry.dirty
+        self.history = entry.history
+        self.unsaved = entry.unsaved
+        self._reset_autosave()
+        
+    def _evict(self):
+        """
+        Close least recently used maps until the open maps fit in workspace_limit nodes.
+        Unsaved changes are written first (journal sync or full save); maps that
+        cannot be written (never saved, or the save failed) stay open.
+        Returns the keys of the closed maps.
+        """
+        total = sum(entry.map.node_count for entry in self.workspace.values())
+        if self.current_map:
+            total += self.current_map.node_count
+        closed = []
+        for key in list(self.workspace):
+            if total <= self.workspace_limit:
+                break
+            entry = self.workspace[key]
+            if entry.dirty:
+                if entry.journal is not None:
+                    entry.journal.sync()
+                elif not entry.filename or not self.storage.save(entry.map, entry.filename):
+                    continue
+            if entry.journal is not None:
+                entry.journal.close()
+            del self.workspace[key]
+            if entry.filename:
+                self.storage.forget(entry.filename)
+            total -= entry.map.node_count
+            closed.append(key)
+            METRICS.increment('workspace.evictions')
+        return closed
+        
+    def _evicted_note(self, closed):
+        """Suffix for a status message listing the maps closed by an eviction"""
+        if not closed:
+            return ""
+        return f" (closed {', '.join(closed)})"
         
     def create_map(self, title, root_title=None):
         """Create a new mind map with a title and optional root node title"""
-        self.current_map = MindMap(title, root_title)
+        self._park_current()
+        self.current_map = self.map_class(title, root_title)
+        self.current_file = None
+        # Never saved, so the workspace keeps it open until it is
+        self.dirty = True
+        self._reset_autosave()
+        self._evict()
         return self.current_map
         
-    def save_map(self, filename=None):
-        """Save the current mind map to file"""
+    def switch_map(self, key):
+        """Make an open map current, keeping the current one in the workspace"""
+        if key not in self.workspace:
+            # Accept file names without extension as well
+            key = self._workspace_key(key)
+            if key not in self.workspace:
+                return False, f"No open map named '{key}'"
+        self._park_current()
+        self._activate(key)
+        closed = self._evict()
+        return True, f"Switched to map: {self.current_map.title}{self._evicted_note(closed)}"
+        
+    def list_open_maps(self):
+        """Return (key, title, node count, dirty, active) for the current map and the workspace"""
+        self._collect_autosave()
+        maps = []
+        if self.current_map:
+            maps.append((self._workspace_key(self.current_file, self.current_map.title),
+                         self.current_map.title, self.current_map.node_count, self.dirty, True))
+        # Most recently used first
+        for key, entry in reversed(self.workspace.items()):
+            maps.append((key, entry.map.title, entry.map.node_count, entry.dirty, False))
+        return maps
+        
+    def unsaved_maps(self):
+        """Return the keys of the open maps whose changes close_workspace would not write"""
+        self._finish_autosave()
+        # Journaled changes are made durable when the journal is closed
+        unsaved = [key for key, entry in self.workspace.items() if entry.dirty and entry.journal is None]
+        if self.current_map and self.dirty and self.journal is None:
+            unsaved.insert(0, self._workspace_key(self.current_file, self.current_map.title))
+        return unsaved
+        
+    def close_workspace(self):
+        """Wait for a running autosave, then flush and close the journals of every open map"""
+        self._finish_autosave()
+        self._close_journal()
+        for entry in self.workspace.values():
+            if entry.journal is not None:
+                entry.journal.close()
+                entry.journal = None
+
+    def _history(self):
+        """History of the current map, started afresh when the current map changes"""
+        if self.history is None or self.history.mindmap is not self.current_map:
+            self.history = History(self.current_map, self.history_limit)
+        return self.history
+
+    def _changed(self, count=1):
+        """Note changes to the current map, autosaving it if enough changes are pending"""
+        self.dirty = True
+        self.changes += count
+        if self.autosaver is not None:
+            self._maybe_autosave()
+
+    def _reset_autosave(self):
+        """Start counting pending changes afresh (a new current map, or it was just saved)"""
+        self._autosaved_changes = self.changes
+        self._autosaved_at = time.monotonic()
+
+    def _collect_autosave(self):
+        """Mark the current map clean if a finished autosave wrote all of its changes"""
+        if self.autosaver is None:
+            return
+        result = self.autosaver.collect()
+        if result is None:
+            return
+        mindmap, filename, changes, success = result
+        if success and mindmap is self.current_map and filename == self.current_file:
+            # The changes made before the snapshot are in the file now
+            self.unsaved.drop(self._autosaved_records)
+            if changes == self.changes:
+                self.dirty = False
+
+    def _finish_autosave(self):
+        """Wait for a running autosave, so the map is not saved or replaced under it"""
+        if self.autosaver is not None:
+            self.autosaver.wait()
+            self._collect_autosave()
+
+    def _maybe_autosave(self):
+        """
+        Save the current map if enough changes are pending. A journaled map only
+        syncs its journal; others are snapshotted and written in the background.
+        Maps that were never saved have no file to write to and are skipped.
+        """
+        self._collect_autosave()
+        pending = self.changes - self._autosaved_changes
+        if not self.current_file or not pending:
+            return
+        if pending < AUTOSAVE_CHANGES and time.monotonic() - self._autosaved_at < AUTOSAVE_INTERVAL:
+            return
+        if self.journal is not None:
+            self.journal.sync()
+            self.storage.index_map(self.current_file, self.current_map)
+            self.dirty = False
+        elif self.autosaver.busy:
+            # Debounced: the next change after this save finishes triggers another
+            return
+        elif self.autosaver.start(self.current_map, self.current_file, self.changes):
+            self._autosaved_records = len(self.unsaved.records or ())
+        elif self.storage.save(self.current_map, self.current_file):
+            # No background save for lazily loaded maps
+            self.dirty = False
+            self.unsaved.clear()
+        self._reset_autosave()
+
+    def _open_journal(self):
+        """Start journaling changes of the current file (journaled mode only)"""
+        if self.journaled and self.current_file:
+            self.journal = self.storage.open_journal(self.current_file)
+
+    def _close_journal(self):
+        """Flush and release the journal of the current file"""
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+        
+    def save_map(self, filename=None, overwrite=False):
+        """Save the current mind map to file (overwrite: replace a file that was never loaded here)"""
         if not self.current_map:
             return False, "No active mind map to save"
+        self._finish_autosave()
         
-        # Default filename is the map title with spaces replaced by underscores
+        # Default filename is the file the map came from, or the map title
+        # with spaces replaced by underscores
         if not filename:
-            filename = self.current_map.title.replace(" ", "_")
+            filename = self.current_file or self.current_map.title.replace(" ", "_")
+        saved_name = os.path.basename(self.storage._get_full_path(filename))
         
-        success = self.storage.save(self.current_map, filename)
-        if success:
-            return True, f"Map saved as '{filename}.json'"
+        # Another open map owns that file; saving over it would make it stale
+        if saved_name in self.workspace:
+            return False, f"'{saved_name}' is open in the workspace; switch to it first"
+        
+        # In journaled mode the snapshot is already on disk: only make the log durable
+        if self.journal is not None and filename == self.current_file:
+            self.journal.sync()
+            self.storage.index_map(filename, self.current_map)
+            self.dirty = False
+            self._reset_autosave()
+            if self.journal.size >= self.journal_threshold:
+                return self.compact_map()
+            return True, f"Map saved as '{saved_name}' (journal synced)"
+        
+        self._close_journal()
+        merged = self._save_current(filename, overwrite)
+        if merged is not None:
+            self.current_file = filename
+            self.dirty = False
+            self._reset_autosave()
+            self._open_journal()
+            note = " (merged with changes saved by another process)" if merged else ""
+            return True, f"Map saved as '{saved_name}'{note}"
         return False, "Failed to save mind map"
         
+    def compact_map(self):
+        """Fold the journal of the current map into a new full snapshot"""
+        if not self.current_map:
+            return False, "No active mind map"
+        if not self.current_file:
+            return False, "The current map has not been saved yet"
+        
+        self._finish_autosave()
+        self._close_journal()
+        merged = self._save_current(self.current_file)
+        self._open_journal()
+        if merged is not None:
+            self.dirty = False
+            self._reset_autosave()
+            saved_name = os.path.basename(self.storage._get_full_path(self.current_file))
+            note = " (merged with changes saved by another process)" if merged else ""
+            return True, f"Journal compacted into '{saved_name}'{note}"
+        return False, "Failed to compact mind map"
+        
+    def _save_current(self, filename, overwrite=False):
+        """
+        Write the current map to filename. If another process saved that file
+        since the map was loaded from it, the unsaved changes are re-applied on
+        top of its version and the result becomes the current map. Returns True
+        if such a merge happened, False for a plain save and None on failure.
+        """
+        merged = []
+        
+        def merge(newer_map):
+            if self._merge_unsaved(newer_map):
+                merged.append(newer_map)
+                return newer_map
+            return None
+        
+        same_file = self.current_file is not None and self._workspace_key(filename) == self._workspace_key(
+            self.current_file)
+        if not self.storage.save(self.current_map, filename, merge if same_file else None, overwrite):
+            return None
+        self.unsaved.clear()
+        if merged:
+            self.current_map = merged[0]
+            # The history refers to nodes of the replaced map
+            self.history = None
+        return bool(merged)
+        
+    def _merge_unsaved(self, newer_map):
+        """Re-apply the unsaved changes to a newer version of the map; False if any no longer applies"""
+        records = self.unsaved.records
+        if records is None:
+            return False
+        return all(apply_record(newer_map, record) for record in records)
+        
     def load_map(self, filename):
-        """Load a mind map from file"""
+        """Load a mind map from file, or switch to it if it is already open"""
+        key = self._workspace_key(filename)
+        if self.is_current_file(filename):
+            if not self.dirty:
+                return True, f"Map already open: {self.current_map.title}"
+            return self._reload_current()
+        if key in self.workspace:
+            METRICS.increment('workspace.hits')
+            return self.switch_map(key)
+        
+        METRICS.increment('workspace.misses')
         loaded_map = self.storage.load(filename)
         if loaded_map:
+            self._park_current()
             self.current_map = loaded_map
-            return True, f"Loaded map: {loaded_map.title}"
+            self.current_file = filename
+            self._reset_autosave()
+            self._open_journal()
+            closed = self._evict()
+            return True, f"Loaded map: {loaded_map.title}{self._evicted_note(closed)}"
         return False, f"Could not load map: {filename}"
         
+    def is_current_file(self, filename):
+        """True if filename is the file of the current map"""
+        return bool(self.current_map and self.current_file
+                    and self._workspace_key(self.current_file) == self._workspace_key(filename))
+        
+    def _reload_current(self):
+        """Read the current map from its file again, discarding the changes made since it was saved"""
+        self._finish_autosave()
+        loaded_map = self.storage.load(self.current_file)
+        if not loaded_map:
+            return False, f"Could not load map: {self.current_file}"
+        if self.journal is not None:
+            # Changes not synced to the journal yet are dropped with the rest
+            self.journal.discard()
+            self._close_journal()
+        self.current_map = loaded_map
+        self.dirty = False
+        self.history = None
+        self.unsaved = ChangeLog()
+        self._reset_autosave()
+        self._open_journal()
+        return True, f"Reloaded map: {loaded_map.title} (unsaved changes discarded)"
+        
+    def convert_map(self, filename, target_format):
+        """Convert a saved map between the JSON and binary formats"""
+        extensions = {backend.extension.lstrip('.'): backend.extension for backend in self.storage.BACKENDS}
+        if target_format not in extensions:
+            return False, f"Unknown format '{target_format}' (expected one of: {', '.join(extensions)})"
+        
+        new_name = self.storage.convert(filename, extensions[target_format])
+        if new_name:
+            return True, f"Converted '{filename}' to '{new_name}'"
+        return False, f"Could not convert map: {filename}"
+        
+    def diff_maps(self, old_file, new_file=None):
+        """
+        Compare two saved maps, or a saved map with the current one, and return
+        (True, one line per difference) or (False, message). Only subtrees whose
+        content hashes differ are visited.
+        """
+        old_map = self.storage.load(old_file, track=False)
+        if old_map is None:
+            return False, f"Could not load map: {old_file}"
+        if new_file is None:
+            if not self.current_map:
+                return False, "No active mind map to compare with"
+            new_map = self.current_map
+        else:
+            new_map = self.storage.load(new_file, track=False)
+            if new_map is None:
+                return False, f"Could not load map: {new_file}"
+        
+        changes, compared = diff_maps(old_map, new_map)
+        lines = []
+        for change, detail in changes:
+            if change == 'title':
+                lines.append(f"~ map title '{detail[0]}' -> '{detail[1]}'")
+            elif change == 'renamed':
+                lines.append(f"~ {' > '.join(detail[0])} (was '{detail[1]}')")
+            elif change == 'added':
+                lines.append(f"+ {' > '.join(detail[0])} ({detail[1]} nodes)")
+            elif change == 'removed':
+                lines.append(f"- {' > '.join(detail[0])} ({detail[1]} nodes)")
+            elif change == 'moved':
+                lines.append(f"~ {' > '.join(detail[0])} moved to {' > '.join(detail[1][:-1])}")
+            else:
+                lines.append(f"~ children of {' > '.join(detail)} reordered")
+        if not lines:
+            lines.append("Maps are identical")
+        lines.append(f"({compared} of {new_map.node_count} nodes compared)")
+        return True, lines
+        
+    def export_map(self, format_name, path):
+        """Write the current map to a file in one of the export formats"""
+        if not self.current_map:
+            return False, "No active mind map to export"
+        if format_name not in exporters.EXPORTERS:
+            return False, f"Unknown format '{format_name}' (expected one of: {', '.join(exporters.EXPORTERS)})"
+        
+        try:
+            count = exporters.export_map(self.current_map, format_name, path)
+        except OSError as e:
+            return False, f"Export error: {e}"
+        return True, f"Exported {count} nodes to '{path}' ({format_name})"
+        
+    def import_map(self, format_name, path):
+        """Build a new current map from a file in one of the importable formats"""
+        formats = exporters.importable_formats()
+        if format_name not in formats:
+            return False, f"Cannot import '{format_name}' (expected one of: {', '.join(formats)})"
+        
+        try:
+            imported_map = exporters.import_map(format_name, path, self.map_class, MAX_LEVEL)
+        except (OSError, ValueError) as e:
+            return False, f"Import error: {e}"
+        self._park_current()
+        self.current_map = imported_map
+        self.current_file = None
+        # Never saved, like a newly created map
+        self.dirty = True
+        self._reset_autosave()
+        closed = self._evict()
+        return True, (f"Imported map: {imported_map.title} ({imported_map.node_count} nodes)"
+                      f"{self._evicted_note(closed)}")
+        
     def list_maps(self):
         """List all available mind maps in the data directory"""
         return self.storage.list_files()
     
+    def list_map_entries(self, sort_key="name", reverse=False, text=None):
+        """
+        Return the catalog entries of the saved maps, keeping those whose name
+        or title contains text, sorted by one of their fields
+        """
+        entries = self.storage.list_entries()
+        if text:
+            text = text.casefold()
+            entries = [entry for entry in entries
+                       if text in entry['name'].casefold() or text in (entry['title'] or '').casefold()]
+        # Unreadable maps have no metadata; keep them last in either order
+        known = [entry for entry in entries if entry.get(sort_key) is not None]
+        unknown = [entry for entry in entries if entry.get(sort_key) is None]
+        known.sort(key=lambda entry: entry[sort_key].casefold() if isinstance(entry[sort_key], str)
+                   else entry[sort_key], reverse=reverse)
+        return known + unknown
+    
     def add_node(self, parent_title, node_title):
         """Add a node under the specified parent node, limited to 3 levels max (including root)"""
         if not self.current_map:
@@ -67,14 +558,86 @@ class MindMapManager:
         
         # Check the level limitation (max 3 levels including root)
         parent_level = parent.get_level()
-        if parent_level >= 2:
+        if parent_level >= MAX_LEVEL:
             return False, f"Cannot add node: maximum depth of 3 levels reached (including root)"
         
-        # Add the new child node
+        # Add the new child node (it may take its title over from a deleted node kept for undo)
+        previous = self.current_map.shadowed_node(node_title)
         new_node = parent.add_child(node_title)
+        self._log().record_add(parent.title, new_node.title)
+        self._history().record(f"add '{new_node.title}'", [('detach', new_node, previous)])
+        self._changed()
         parent_display_title = self.current_map.root.title if parent == self.current_map.root else parent_title
         return True, f"Added '{node_title}' under '{parent_display_title}'"
         
+    def add_nodes(self, items, parent_title="root"):
+        """
+        Add many nodes at once from (parent, title) pairs or an indented outline
+        (whose top-level lines go under parent_title). Everything is validated in
+        one pass first, so either all nodes are added or none.
+        """
+        if not self.current_map:
+            return False, "No active mind map"
+        
+        if isinstance(items, str):
+            # Turn the outline into pairs: each line's parent is the last line one level up
+            pairs = []
+            open_titles = [parent_title]
+            for level, title in parse_outline(items):
+                if level >= len(open_titles):
+                    return False, f"Item '{title}': indentation skips a level"
+                del open_titles[level + 1:]
+                pairs.append((open_titles[level], title))
+                open_titles.append(title)
+        else:
+            pairs = list(items)
+        
+        # Validate every pair against the map and the nodes added earlier in the batch
+        root = self.current_map.root
+        # Casefolded title -> depth level of the nodes added by this batch
+        batch_levels = {}
+        for number, (parent, title) in enumerate(pairs, 1):
+            if not title:
+                return False, f"Item {number}: node title cannot be empty"
+            key = title.casefold()
+            if key in batch_levels or self.current_map.search_node(title):
+                return False, f"Item {number}: a node with title '{title}' already exists"
+            
+            parent_key = parent.casefold()
+            if parent_key in batch_levels:
+                parent_level = batch_levels[parent_key]
+            elif parent_key == "root" or parent_key == root.title.casefold():
+                parent_level = 0
+            else:
+                parent_node = self.current_map.search_node(parent)
+                if not parent_node:
+                    return False, f"Item {number}: parent node '{parent}' not found"
+                parent_level = parent_node.get_level()
+            
+            if parent_level >= MAX_LEVEL:
+                return False, f"Item {number}: maximum depth of 3 levels reached (including root) under '{parent}'"
+            batch_levels[key] = parent_level + 1
+        
+        # Insert, resolving parents created by the batch without another lookup
+        METRICS.observe('batch.add_nodes.items', len(pairs))
+        created = {}
+        operations = []
+        log = self._log()
+        for parent, title in pairs:
+            parent_key = parent.casefold()
+            parent_node = created.get(parent_key)
+            if parent_node is None:
+                parent_node = root if parent_key == "root" else self.current_map.search_node(parent)
+            previous = self.current_map.shadowed_node(title)
+            new_node = parent_node.add_child(title)
+            created[title.casefold()] = new_node
+            operations.append(('detach', new_node, previous))
+            log.record_add(parent_node.title, new_node.title)
+        self._history().record(f"add of {len(pairs)} nodes", operations)
+        self._changed(len(pairs))
+        
+        return True, f"Added {len(pairs)} nodes"
+        
     def delete_node(self, node_title):
         """Delete a node from the mind map"""
         if not self.current_map:
@@ -87,10 +650,138 @@ class MindMapManager:
         if node == self.current_map.root:
             return False, "Cannot delete the root node"
         
-        parent = node.parent
-        if parent.remove_child(node):
-            return True, f"Deleted node '{node_title}'"
-        return False, "Failed to delete node"
+        # The subtree is detached whole and kept by the history, so undo can re-link it
+        place = self.current_map.detach(node)
+        self._log().record_delete(node.title)
+        self._history().record(f"delete of '{node.title}'", [('attach', node, place, None)])
+        self._changed()
+        return True, f"Deleted node '{node_title}'"
+        
+    def delete_nodes(self, titles):
+        """
+        Delete many nodes (with their subtrees) at once. Every title is checked
+        first, so either all nodes are deleted or none; nodes lying inside
+        another deleted subtree are dropped with it.
+        """
+        if not self.current_map:
+            return False, "No active mind map"
+        
+        nodes = []
+        for title in titles:
+            node = self.current_map.search_node(title)
+            if not node:
+                return False, f"Node '{title}' not found"
+            if node == self.current_map.root:
+                return False, "Cannot delete the root node"
+            nodes.append(node)
+        
+        # Delete the shallowest nodes first; their descendants leave the map with them
+        nodes.sort(key=lambda node: node.depth)
+        deleted = 0
+        removed = 0
+        operations = []
+        for node in nodes:
+            # Skip nodes already removed with an ancestor (or listed twice)
+            top = node
+            while top.parent is not None:
+                top = top.parent
+            if top != self.current_map.root:
+                continue
+            removed += node.subtree_size
+            operations.append(('attach', node, self.current_map.detach(node), None))
+            deleted += 1
+            self._log().record_delete(node.title)
+        if deleted:
+            self._history().record(f"delete of {deleted} nodes", operations)
+            self._changed(deleted)
+        return True, f"Deleted {deleted} nodes ({removed} including descendants)"
+        
+    def move_node(self, node_title, new_parent_title):
+        """Move a node and its subtree under another node, within the depth limit"""
+        if not self.current_map:
+            return False, "No active mind map"
+        
+        node = self.search_node(node_title)
+        if not node:
+            return False, f"Node '{node_title}' not found"
+        if node == self.current_map.root:
+            return False, "Cannot move the root node"
+        new_parent = self.search_node(new_parent_title)
+        if not new_parent:
+            return False, f"Parent node '{new_parent_title}' not found"
+        
+        # The new parent must not lie inside the moved subtree
+        current = new_parent
+        while current is not None:
+            if current == node:
+                return False, f"Cannot move '{node.title}' under its own subtree"
+            current = current.parent
+        if new_parent == node.parent:
+            return True, f"'{node.title}' is already under '{new_parent.title}'"
+        
+        # Height of the subtree, to check the level limitation after the move
+        height = 0
+        stack = [(node, 0)]
+        while stack:
+            current, level = stack.pop()
+            height = max(height, level)
+            stack.extend((child, level + 1) for child in current.children)
+        if new_parent.get_level() + 1 + height > MAX_LEVEL:
+            return False, f"Cannot move node: maximum depth of 3 levels reached (including root)"
+        
+        place = self.current_map.place_of(node)
+        node.move_to(new_parent)
+        self._log().record_move(node.title, new_parent.title)
+        self._history().record(f"move of '{node.title}'", [('move', node, place)])
+        self._changed()
+        return True, f"Moved '{node.title}' under '{new_parent.title}'"
+        
+    def undo(self):
+        """Revert the last change to the current map"""
+        if not self.current_map:
+            return False, "No active mind map"
+        result = self._history().undo()
+        if result is None:
+            return False, "Nothing to undo"
+        label, operations = result
+        self._record_operations(operations)
+        self._changed(len(operations))
+        return True, f"Undid {label}"
+        
+    def redo(self):
+        """Re-apply the last undone change to the current map"""
+        if not self.current_map:
+            return False, "No active mind map"
+        result = self._history().redo()
+        if result is None:
+            return False, "Nothing to redo"
+        label, operations = result
+        self._record_operations(operations)
+        self._changed(len(operations))
+        return True, f"Redid {label}"
+        
+    def _log(self):
+        """Where changes of the current map are recorded: its journal, or the unsaved changes"""
+        return self.journal if self.journal is not None else self.unsaved
+        
+    def _record_operations(self, operations):
+        """Record the effect of undone or redone history operations"""
+        log = self._log()
+        for operation in operations:
+            kind, node = operation[0], operation[1]
+            if kind == 'detach':
+                log.record_delete(node.title)
+                continue
+            # Back in its old place: ahead of the sibling it used to precede
+            before = operation[2][1]
+            before_title = before.title if before is not None else None
+            if kind == 'move':
+                log.record_move(node.title, node.parent.title, before_title)
+                continue
+            # There is no record for a whole subtree: re-add it node by node
+            log.record_add(node.parent.title, node.title, before_title)
+            for current, _, _, _ in islice(iter_preorder(node), 1, None):
+                log.record_add(current.parent.title, current.title)
         
     def search_node(self, title):
         """Search for a node by its title"""
@@ -103,50 +794,77 @@ class MindMapManager:
         
         return self.current_map.search_node(title)
         
-    def display_map(self, node=None, indent=0):
-        """Return a formatted string representing the mind map hierarchy"""
+    def find_nodes(self, terms, limit=None):
+        """
+        Return (True, [(map name, path)]) for the nodes of every saved map whose
+        title contains all the words of terms, answered from the full-text index
+        (unsaved changes are not included), or (False, message)
+        """
+        try:
+            return True, self.storage.find(terms, limit)
+        except FullTextIndexError as e:
+            return False, f"Index error: {e}"
+        
+    def search_nodes(self, query, mode="fuzzy", limit=10):
+        """Return up to limit (node, score) pairs matching a title prefix or fuzzy query"""
         if not self.current_map:
-            return "No active mind map"
+            return []
+        
+        if mode == "prefix":
+            return search_prefix(self.current_map, query, limit)
+        return search_fuzzy(self.current_map, query, limit)
+        
+    def iter_display(self, title=None, max_depth=None):
+        """
+        Return (True, line generator) rendering the map, or the subtree of the
+        node with the given title, one line per node; or (False, message).
+        Nodes max_depth levels below the start node are collapsed into a count
+        of their children and descendants.
+        """
+        if not self.current_map:
+            return False, "No active mind map"
         
+        node = self.search_node(title) if title else self.current_map.root
         if node is None:
-            node = self.current_map.root
+            return False, f"Node '{title}' not found"
+        return True, self._display_lines(node, max_depth)
         
-        result = []
-        result.append("  " * indent + "- " + node.title)
-        for child in node.children:
-            result.append(self.display_map(child, indent + 1))
-        return "\n".join(result)
+    def _display_lines(self, start, max_depth):
+        """Walk a subtree iteratively in display order, yielding each line as it is reached"""
+        visited = 0
+        stack = [(start, 0)]
+        try:
+            while stack:
+                node, indent = stack.pop()
+                visited += 1
+                line = "  " * indent + "- " + node.title
+                if max_depth is not None and indent >= max_depth:
+                    if node.subtree_size > 1:
+                        line += f"  [+{len(node.children)} children, {node.subtree_size - 1} nodes]"
+                else:
+                    # Reversed so the first child is popped first
+                    stack.extend((child, indent + 1) for child in reversed(node.children))
+                yield line
+        finally:
+            # Also recorded when the reader stops early (e.g. quitting the pager)
+            METRICS.observe('traversal.display_map.nodes', visited)
+        
+    def display_map(self, title=None, max_depth=None):
+        """Return a formatted string representing the mind map hierarchy (or a subtree)"""
+        success, lines = self.iter_display(title, max_depth)
+        if not success:
+            return lines
+        return "\n".join(lines)
         
     def get_map_info(self):
         """Get basic stats about the current mind map"""
         if not self.current_map:
             return "No active mind map"
         
-        node_count = self._count_nodes(self.current_map.root)
-        max_depth = self._get_max_depth(self.current_map.root)
-        
+        # Counters are maintained by the map on every add/delete/load
         return {
             "title": self.current_map.title,
             "root_node": self.current_map.root.title,
-            "nodes": node_count,
-            "max_depth": max_depth
+            "nodes": self.current_map.node_count,
+            "max_depth": self.current_map.max_depth
         }
-        
-    def _count_nodes(self, node):
-        """Recursively count nodes starting from the given node"""
-        count = 1  # Include current node
-        for child in node.children:
-            count += self._count_nodes(child)
-        return count
-        
-    def _get_max_depth(self, node, current_depth=0):
-        """Recursively determine the maximum depth from the given node"""
-        if not node.children:
-            return current_depth
-        
-        max_child_depth = 0
-        for child in node.children:
-            depth = self._get_max_depth(child, current_depth + 1)
-            max_child_depth = max(max_child_depth, depth)
-        
-        return max_child_depth
\ No newline at end of file
@@ -0,0 +1,83 @@
+"""
+MindMap Merkle - Content hashes of subtrees and hash-guided map diffs
+
+The digest of a node covers its title and, in order, the digests of its
+children, so two subtrees with equal digests are identical and a diff never
+has to look inside them. Nodes cache their digest until a change below them
+clears it along the parent chain.
+"""
+
+from hashlib import blake2b
+
+from .metrics import METRICS
+
+# Size of a node digest in bytes
+DIGEST_SIZE = 16
+
+
+def node_digest(encoded_title, child_digests):
+    """Digest of a node from its UTF-8 title and the digests of its children"""
+    # The length prefix keeps the title and the child digests from running together
+    data = len(encoded_title).to_bytes(4, 'little') + encoded_title + b''.join(child_digests)
+    return blake2b(data, digest_size=DIGEST_SIZE).digest()
+
+
+def diff_maps(old, new):
+    """
+    Compare two maps and return their differences as (change, detail) pairs,
+    along with the number of node pairs that had to be compared:
+        ('title', (old title, new title))        map titles differ
+        ('renamed', (path, old title))           same node, title case changed
+        ('added', (path, subtree size))          subtree only in the new map
+        ('removed', (path, subtree size))        subtree only in the old map
+        ('moved', (old path, new path))          subtree under another parent
+        ('reordered', path)                      same children, other order
+    Children are matched by casefolded title; subtrees whose digests match
+    are skipped without being visited.
+    """
+    changes = []
+    if old.title != new.title:
+        changes.append(('title', (old.title, new.title)))
+    compared = 0
+    # Pairs of nodes whose subtrees still have to be compared, with their paths
+    stack = [(old.root, new.root, [old.root.title], [new.root.title])]
+    added = {}
+    removed = {}
+    while stack:
+        while stack:
+            old_node, new_node, old_path, new_path = stack.pop()
+            compared += 1
+            if old_node.title != new_node.title:
+                changes.append(('renamed', (new_path, old_node.title)))
+            if old_node.content_hash() == new_node.content_hash():
+                continue
+            old_children = {child.title.casefold(): child for child in old_node.children}
+            new_children = {child.title.casefold(): child for child in new_node.children}
+            for key, child in old_children.items():
+                if key not in new_children:
+                    removed[key] = (child, old_path + [child.title])
+            for key, child in new_children.items():
+                if key not in old_children:
+                    added[key] = (child, new_path + [child.title])
+                elif child.content_hash() != old_children[key].content_hash() or child.title != old_children[key].title:
+                    stack.append((old_children[key], child, old_path + [old_children[key].title],
+                                  new_path + [child.title]))
+            common_old = [key for key in old_children if key in new_children]
+            common_new = [key for key in new_children if key in old_children]
+            if common_old != common_new:
+                changes.append(('reordered', new_path))
+
+        # A subtree removed in one place and added in another was moved;
+        # compare the two sides as well, since it may also have changed
+        for key in [key for key in removed if key in added]:
+            old_child, old_path = removed.pop(key)
+            new_child, new_path = added.pop(key)
+            changes.append(('moved', (old_path, new_path)))
+            stack.append((old_child, new_child, old_path, new_path))
+
+    for old_child, old_path in removed.values():
+        changes.append(('removed', (old_path, old_child.subtree_size)))
+    for new_child, new_path in added.values():
+        changes.append(('added', (new_path, new_child.subtree_size)))
+    METRICS.observe('traversal.diff.nodes', compared)
+    return changes, compared
@@ -0,0 +1,111 @@
+"""
+MindMap Metrics - Process-wide latency histograms and counters
+
+Commands, storage calls and tree traversals report into the METRICS registry;
+the CLI shows it with 'stats' and can dump it as JSON on exit.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Histogram:
+    """
+    Distribution of non-negative values in power-of-two buckets, so recording
+    is O(1) and memory does not grow with the number of observations
+    """
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+        # Bucket number (bit length of the value) -> observations
+        self.buckets = {}
+
+    def observe(self, value):
+        """Record one value"""
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        bucket = int(value).bit_length()
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given fraction of the values (capped at max)"""
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min((1 << bucket) - 1 if bucket else 0, self.max)
+        return self.max
+
+    def to_dict(self):
+        """Summary of the distribution"""
+        return {
+            'count': self.count,
+            'total': self.total,
+            'mean': self.total / self.count if self.count else None,
+            'min': self.min,
+            'p50': self.percentile(0.5),
+            'p95': self.percentile(0.95),
+            'max': self.max,
+        }
+
+
+class Metrics:
+    """
+    Registry of named histograms and counters. Latencies are recorded in
+    microseconds under names such as 'command.add' or 'storage.save.json'.
+    Autosave and server worker threads record too, so updates hold a lock.
+    """
+    def __init__(self):
+        self.histograms = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, value):
+        """Add a value to the named histogram"""
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(value)
+
+    def increment(self, name, amount=1):
+        """Add to the named counter"""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    @contextmanager
+    def timer(self, name):
+        """Record the duration of a block, in microseconds, even if it raises"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, int((time.perf_counter() - start) * 1e6))
+
+    def reset(self):
+        """Forget every recorded value"""
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+    def snapshot(self):
+        """JSON-serializable copy of all histograms and counters"""
+        with self._lock:
+            return {
+                'histograms': {name: histogram.to_dict() for name, histogram in sorted(self.histograms.items())},
+                'counters': dict(sorted(self.counters.items())),
+            }
+
+
+# Registry shared by the CLI, the manager and the storage layer
+METRICS = Metrics()
@@ -1,33 +1,322 @@
+from itertools import chain
+
+from .search import TitleSearchIndex
+from .merkle import node_digest
+
+
+# Child lists shorter than this are scanned instead of getting a position index
+INDEXED_CHILDREN = 32
+# Parents that reach this many children keep them in a HubChildren once changed
+HUB_CHILDREN = 1024
+# Children per run of a HubChildren built or appended to; runs are split past twice that
+HUB_RUN = 64
+# Children of every leaf; replaced by a ChildList when the first child is added
+NO_CHILDREN = ()
+
+
+class ChildList(list):
+    """
+    List of child nodes that finds the position of a child of a large parent
+    through an index built on first use, so removing a child or inserting next
+    to one does not scan its siblings. The index stays usable across changes:
+    a child can only have moved as many places as there were removals and
+    insertions since it was built, and it is rebuilt once that window grows
+    past the square root of the length.
+    """
+    __slots__ = ('_index',)
+
+    def __init__(self, nodes=()):
+        super().__init__(nodes)
+        # None, or [child -> position when recorded, removals since built, insertions since built]
+        self._index = None
+
+    def append(self, node):
+        """Add a node after the existing children"""
+        list.append(self, node)
+        if self._index is not None:
+            self._index[0][node] = len(self) - 1
+
+    def position(self, node):
+        """Return the position of a child (ValueError if it is not one)"""
+        if len(self) < INDEXED_CHILDREN:
+            return self.index(node)
+        index = self._index
+        if index is not None:
+            recorded = index[0].get(node)
+            if recorded is not None:
+                try:
+                    return self.index(node, max(recorded - index[1], 0), recorded + index[2] + 1)
+                except ValueError:
+                    pass
+        positions = {child: position for position, child in enumerate(self)}
+        self._index = [positions, 0, 0]
+        if node not in positions:
+            raise ValueError("node is not a child")
+        return positions[node]
+
+    def following(self, node):
+        """Return the next sibling of a child, None for the last one"""
+        position = self.position(node) + 1
+        return self[position] if position < len(self) else None
+
+    def remove(self, node):
+        """Remove a child (ValueError if it is not one)"""
+        del self[self.position(node)]
+        index = self._index
+        if index is not None:
+            index[0].pop(node, None)
+            index[1] += 1
+            self._check_index()
+
+    def insert_before(self, node, before):
+        """Add a node just ahead of a child (after the others if before is not one)"""
+        try:
+            position = self.position(before)
+        except ValueError:
+            self.append(node)
+            return
+        self.insert(position, node)
+        index = self._index
+        if index is not None:
+            index[0][node] = position
+            index[2] += 1
+            self._check_index()
+
+    def _check_index(self):
+        """Drop the index once the window a child must be looked for in grows too wide"""
+        index = self._index
+        window = index[1] + index[2]
+        if window * window > len(self):
+            self._index = None
+
+
+class _Run(list):
+    """Consecutive children of a hub, linked to the runs before and after it"""
+    __slots__ = ('previous', 'next')
+
+    def __init__(self, nodes=()):
+        super().__init__(nodes)
+        self.previous = None
+        self.next = None
+
+
+class HubChildren:
+    """
+    Children of a parent with thousands of them, kept in linked runs of at most
+    2 * HUB_RUN nodes with the run of every child in a dict. Removing a child,
+    inserting next to one and finding its next sibling cost O(HUB_RUN) however
+    many children there are, where a list moves every later child; iterating
+    chains the runs.
+    """
+    __slots__ = ('_first', '_last', '_run_of', '_length')
+
+    def __init__(self, nodes=()):
+        self._first = None
+        self._last = None
+        # child -> run holding it
+        self._run_of = {}
+        self._length = 0
+        nodes = list(nodes)
+        for start in range(0, len(nodes), HUB_RUN):
+            self._link_after(self._last, _Run(nodes[start:start + HUB_RUN]))
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        return chain.from_iterable(self._runs())
+
+    def __reversed__(self):
+        return chain.from_iterable(reversed(run) for run in self._runs(backwards=True))
+
+    def __getitem__(self, position):
+        """Child at a position (walks the runs: iterate instead where possible)"""
+        return list(self)[position]
+
+    def _runs(self, backwards=False):
+        run = self._last if backwards else self._first
+        while run is not None:
+            yield run
+            run = run.previous if backwards else run.next
+
+    def _link_after(self, previous, run):
+        """Insert a run after another (first if previous is None) and record its children"""
+        run.previous = previous
+        run.next = self._first if previous is None else previous.next
+        if run.next is None:
+            self._last = run
+        else:
+            run.next.previous = run
+        if previous is None:
+            self._first = run
+        else:
+            previous.next = run
+        for node in run:
+            self._run_of[node] = run
+        self._length += len(run)
+
+    def _unlink(self, run):
+        """Drop an empty run"""
+        if run.previous is None:
+            self._first = run.next
+        else:
+            run.previous.next = run.next
+        if run.next is None:
+            self._last = run.previous
+        else:
+            run.next.previous = run.previous
+
+    def append(self, node):
+        """Add a node after the existing children"""
+        last = self._last
+        if last is None or len(last) >= HUB_RUN:
+            self._link_after(last, _Run([node]))
+            return
+        last.append(node)
+        self._run_of[node] = last
+        self._length += 1
+
+    def following(self, node):
+        """Return the next sibling of a child, None for the last one"""
+        run = self._run_of[node]
+        position = run.index(node) + 1
+        if position < len(run):
+            return run[position]
+        return run.next[0] if run.next is not None else None
+
+    def remove(self, node):
+        """Remove a child (ValueError if it is not one)"""
+        run = self._run_of.pop(node, None)
+        if run is None:
+            raise ValueError("node is not a child")
+        run.remove(node)
+        self._length -= 1
+        if not run:
+            self._unlink(run)
+
+    def insert_before(self, node, before):
+        """Add a node just ahead of a child (after the others if before is not one)"""
+        run = self._run_of.get(before)
+        if run is None:
+            self.append(node)
+            return
+        run.insert(run.index(before), node)
+        self._run_of[node] = run
+        self._length += 1
+        if len(run) > 2 * HUB_RUN:
+            # Split so the next insertion into this part of the list stays short
+            tail = _Run(run[HUB_RUN:])
+            del run[HUB_RUN:]
+            self._length -= len(tail)
+            self._link_after(run, tail)
+
+
 class Node:
+    __slots__ = ('title', 'parent', 'children', 'mindmap', 'depth', 'subtree_size', '_hash')
+
     def __init__(self, title, parent=None):
         # Title of the node
         self.title = title
         # Reference to the parent node (None for root)
         self.parent = parent
-        # List of child nodes
-        self.children = []
+        # Child nodes, in insertion order (leaves share the empty NO_CHILDREN)
+        self.children = NO_CHILDREN
+        # Mind map this node belongs to (inherited from the parent, None when detached)
+        self.mindmap = parent.mindmap if parent is not None else None
+        # Depth level of the node (root is level 0), fixed when the node is created
+        self.depth = parent.depth + 1 if parent is not None else 0
+        # Number of nodes in the subtree rooted at this node (itself included)
+        self.subtree_size = 1
+        # Cached content digest of the subtree (None until computed or after a change)
+        self._hash = None
+
+    def _writable_children(self):
+        """
+        Return the children container, copied first if a background save is
+        still reading the current one (copy-on-write, once per node and save)
+        """
+        snapshot = self.mindmap._snapshot if self.mindmap is not None else None
+        children = self.children
+        copy = snapshot is not None and self not in snapshot.saved
+        if copy:
+            # Publish the old container before swapping it, so the writer never sees the new one
+            snapshot.saved[self] = children
+        if len(children) >= HUB_CHILDREN and (copy or not isinstance(children, HubChildren)):
+            # A hub: changes no longer move its other children
+            self.children = HubChildren(children)
+        elif copy or children is NO_CHILDREN:
+            self.children = ChildList(children)
+        return self.children
 
     def add_child(self, title):
         """Create a new child node with the given title and attach it"""
         child = Node(title, self)
-        self.children.append(child)
+        self._writable_children().append(child)
+        self._add_to_subtree_sizes(1)
+        # Keep the owning map's title index and counters up to date
+        if self.mindmap is not None:
+            self.mindmap._index_node(child)
         return child
     
     def remove_child(self, node):
-        """Remove a specific child node if it exists"""
-        if node in self.children:
-            self.children.remove(node)
+        """Remove a specific child node (and its whole subtree) if it exists"""
+        if node.parent is self:
+            self._writable_children().remove(node)
+            node.parent = None
+            self._add_to_subtree_sizes(-node.subtree_size)
+            # Drop every title of the detached subtree from the owning map's index
+            if self.mindmap is not None:
+                self.mindmap._unindex_subtree(node)
             return True
         return False
     
-    def get_level(self):
-        """Calculate the depth level of this node (root is level 0)"""
-        level = 0
+    def move_to(self, new_parent, before=None):
+        """
+        Detach this node's subtree and attach it as the last child of another
+        node of the same map (or just ahead of its child before). Depths and
+        the map's counters are updated for the whole subtree; titles stay indexed.
+        """
+        self.parent._writable_children().remove(self)
+        self.parent._add_to_subtree_sizes(-self.subtree_size)
+        self.parent = new_parent
+        if before is None:
+            new_parent._writable_children().append(self)
+        else:
+            new_parent._writable_children().insert_before(self, before)
+        new_parent._add_to_subtree_sizes(self.subtree_size)
+        delta = new_parent.depth + 1 - self.depth
+        if delta and self.mindmap is not None:
+            self.mindmap._shift_depths(self, delta)
+    
+    def _add_to_subtree_sizes(self, delta):
+        """Adjust the subtree size of this node and all of its ancestors, clearing their digests"""
         current = self
-        while current.parent:
-            level += 1
+        while current is not None:
+            current.subtree_size += delta
+            current._hash = None
             current = current.parent
-        return level
+
+    def content_hash(self):
+        """Digest of the title and the children's digests, computed lazily and cached until the subtree changes"""
+        if self._hash is None:
+            # Collect the nodes whose digest is missing (parents first), then fill them in bottom-up
+            missing = []
+            stack = [self]
+            while stack:
+                node = stack.pop()
+                missing.append(node)
+                for child in node.children:
+                    if child._hash is None:
+                        stack.append(child)
+            for node in reversed(missing):
+                children = node.children
+                node._hash = node_digest(node.title.encode('utf-8'),
+                                         [child._hash for child in children] if children else ())
+        return self._hash
+    
+    def get_level(self):
+        """Return the depth level of this node (root is level 0)"""
+        return self.depth
         
     def __str__(self):
         """Return the node title when printed"""
@@ -44,35 +333,242 @@ class Node:
     def from_dict(data, parent=None):
         """Reconstruct a node and its children from a dictionary (for loading)"""
         node = Node(data['title'], parent)
-        for child_data in data.get('children', []):
-            child = Node.from_dict(child_data, node)
-            node.children.append(child)
+        # Rebuild the subtree iteratively so deep maps don't hit the recursion limit
+        created = []
+        stack = [(node, data)]
+        while stack:
+            current, current_data = stack.pop()
+            children_data = current_data.get('children')
+            if children_data:
+                current.children = ChildList()
+            for child_data in children_data or ():
+                child = Node(child_data['title'], current)
+                current.children.append(child)
+                created.append(child)
+                stack.append((child, child_data))
+        # Children are created after their parent, so sizes accumulate bottom-up
+        for child in reversed(created):
+            child.parent.subtree_size += child.subtree_size
         return node
 
 
 class MindMap:
+    # Approximate memory of one node (object, children container and title), used to cap undo history
+    NODE_BYTES = 260
+
     def __init__(self, title, root_title=None):
         # Title of the mind map
         self.title = title
         # Create the root node (use custom title if provided)
         root_node_title = root_title if root_title is not None else title
         self.root = Node(root_node_title)
-        
-    def search_node(self, title, node=None):
-        """Search for a node by title recursively (case-insensitive)"""
-        if node is None:
-            node = self.root
+        self.root.mindmap = self
+        # Casefolded title -> Node index, kept in sync by Node.add_child/remove_child
+        self._index = {}
+        # Live node count and number of nodes per depth level
+        self.node_count = 0
+        self._depth_counts = []
+        # Prefix/trigram search index over the title keys, built on first use
+        self._search_index = None
+        # Snapshot being written by a background save (see autosave.MapSnapshot)
+        self._snapshot = None
+        # Number of subtrees taken out by detach() that are neither attached back nor released
+        self._detached = 0
+        self._index_node(self.root)
+
+    @property
+    def max_depth(self):
+        """Depth of the deepest node (root is depth 0)"""
+        return len(self._depth_counts) - 1
+
+    def _index_title(self, node):
+        """Register a node's title in the index (first title wins on duplicates)"""
+        node.mindmap = self
+        key = node.title.casefold()
+        existing = self._index.get(key)
+        if existing is None:
+            self._index[key] = node
+            if self._search_index is not None:
+                self._search_index.add(key)
+        elif existing is not node and self._live(existing) is None:
+            # A detached subtree gives its titles up to new nodes
+            self._index[key] = node
+
+    def _unindex_title(self, node):
+        """Drop a node's title from the index if it is the indexed node"""
+        key = node.title.casefold()
+        if self._index.get(key) is node:
+            del self._index[key]
+            if self._search_index is not None:
+                self._search_index.remove(key)
+        node.mindmap = None
+
+    def _index_node(self, node):
+        """Register a single new node in the title index and the counters"""
+        self._index_title(node)
+        self.node_count += 1
+        # A node's parent is already counted, so at most one new level appears
+        if node.depth == len(self._depth_counts):
+            self._depth_counts.append(0)
+        self._depth_counts[node.depth] += 1
+
+    def _index_subtree(self, node):
+        """Register a node and all of its descendants in the title index"""
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            self._index_node(current)
+            # Reversed so duplicates resolve to the first node in display order
+            stack.extend(reversed(current.children))
+
+    def _unindex_subtree(self, node):
+        """Remove a node and all of its descendants from the title index and the counters"""
+        self.node_count -= node.subtree_size
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            self._unindex_title(current)
+            self._depth_counts[current.depth] -= 1
+            stack.extend(current.children)
+        self._trim_depth_counts()
+
+    def _shift_depths(self, node, delta):
+        """Move a node and its descendants delta levels deeper (or up) in the depth counters"""
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            self._depth_counts[current.depth] -= 1
+            current.depth += delta
+            while current.depth >= len(self._depth_counts):
+                self._depth_counts.append(0)
+            self._depth_counts[current.depth] += 1
+            stack.extend(current.children)
+        self._trim_depth_counts()
+
+    def _trim_depth_counts(self):
+        """Drop empty levels at the bottom so max_depth stays accurate"""
+        while len(self._depth_counts) > 1 and self._depth_counts[-1] == 0:
+            self._depth_counts.pop()
+
+    def _subtree_depth_counts(self, node):
+        """Count a node and its descendants per depth level"""
+        counts = {}
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            counts[current.depth] = counts.get(current.depth, 0) + 1
+            stack.extend(current.children)
+        return counts
+
+    def _loaded_children(self, node):
+        """Children of a node that have been indexed"""
+        return node.children
 
-        # Match current node
-        if node.title.lower() == title.lower():
+    def _live(self, node):
+        """Return an indexed node, or None if it lies inside a detached subtree"""
+        if node is None or not self._detached:
             return node
-        
-        # Search recursively through children
-        for child in node.children:
-            result = self.search_node(title, child)
-            if result:
+        top = node
+        while top.parent is not None:
+            top = top.parent
+        return node if top is self.root else None
+
+    def place_of(self, node):
+        """Return (parent, next sibling or None) of a node, to move it back there with move_to()"""
+        return node.parent, node.parent.children.following(node)
+
+    def detach(self, node):
+        """
+        Take a node's subtree out of the map, keeping it whole and its titles
+        indexed (lookups skip them), so attach() can put it back without
+        visiting it. Returns the place to pass to attach(); release() drops
+        the subtree for good.
+        """
+        parent, before = self.place_of(node)
+        depth_counts = self._subtree_depth_counts(node)
+        parent._writable_children().remove(node)
+        node.parent = None
+        parent._add_to_subtree_sizes(-node.subtree_size)
+        self.node_count -= node.subtree_size
+        for depth, count in depth_counts.items():
+            self._depth_counts[depth] -= count
+        self._trim_depth_counts()
+        self._detached += 1
+        return parent, before, depth_counts
+
+    def attach(self, node, place):
+        """Put a detached subtree back where detach() took it from, in O(height) plus its later siblings"""
+        parent, before, depth_counts = place
+        if before is None:
+            parent._writable_children().append(node)
+        else:
+            parent._writable_children().insert_before(node, before)
+        node.parent = parent
+        parent._add_to_subtree_sizes(node.subtree_size)
+        self.node_count += node.subtree_size
+        for depth, count in depth_counts.items():
+            while depth >= len(self._depth_counts):
+                self._depth_counts.append(0)
+            self._depth_counts[depth] += count
+        self._detached -= 1
+
+    def release(self, node):
+        """Drop the titles of a detached subtree from the index once it will not be attached again"""
+        self._detached -= 1
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            self._unindex_title(current)
+            stack.extend(self._loaded_children(current))
+
+    def shadowed_node(self, title):
+        """
+        Return the detached node (kept for undo) whose title a new node would
+        take over, or None
+        """
+        node = self._index.get(title.casefold())
+        return node if node is not None and self._live(node) is None else None
+
+    def _claim_title(self, node):
+        """Index a node's title under it again if a detached node holds it"""
+        self._index_title(node)
+
+    def _restore_title(self, node, previous):
+        """Give a title key back to the detached node it was taken over from"""
+        key = node.title.casefold()
+        if self._index.get(key) is node and previous.mindmap is self:
+            self._index[key] = previous
+
+    def _lookup(self, key):
+        """Return the node indexed under a casefolded title, or None"""
+        return self._live(self._index.get(key))
+
+    def _iter_title_keys(self):
+        """Yield every casefolded title key of the map"""
+        return iter(self._index)
+
+    def title_search_index(self):
+        """Return the prefix/trigram index over titles, building it on first use"""
+        if self._search_index is None:
+            self._search_index = TitleSearchIndex(self._iter_title_keys())
+        return self._search_index
+
+    def has_search_index(self):
+        """Whether the prefix/trigram index is built (ranked searches no longer change the map)"""
+        return self._search_index is not None
+
+    def search_node(self, title, node=None):
+        """Search for a node by title (case-insensitive), optionally within a subtree"""
+        result = self._lookup(title.casefold())
+        if result is None or node is None or node is self.root:
+            return result
+
+        # Only accept the indexed node if it lies inside the requested subtree
+        current = result
+        while current:
+            if current is node:
                 return result
-        
+            current = current.parent
         return None
         
     def get_path(self, node):
@@ -101,9 +597,11 @@ class MindMap:
         else:
             mindmap = cls(data['title'])  # fallback
         
-        # Rebuild the children recursively under the root node
+        # Rebuild the children under the root node and index their titles
         for child_data in data.get('children', []):
             child = Node.from_dict(child_data, mindmap.root)
-            mindmap.root.children.append(child)
+            mindmap.root._writable_children().append(child)
+            mindmap.root.subtree_size += child.subtree_size
+            mindmap._index_subtree(child)
         
         return mindmap
\ No newline at end of file
@@ -0,0 +1,273 @@
+"""
+MindMap Search - Prefix trie and trigram index over casefolded node titles
+
+The index stores title keys only; maps resolve keys back to nodes through
+their own title index, so the same index works for every map representation.
+"""
+
+import heapq
+import math
+from bisect import bisect_left
+
+# Number of keys a trie leaf holds before it is split on the next character
+BURST_SIZE = 128
+# Fraction of the query's trigrams a fuzzy candidate must share
+MIN_OVERLAP = 0.34
+# Posting lists up to this size are scanned eagerly by fuzzy searches
+RARE_POSTINGS = 4096
+
+
+class _TrieNode:
+    """
+    Burst-trie node: a leaf keeps a sorted bucket of keys, an internal node
+    branches on the next character
+    """
+    __slots__ = ('children', 'bucket', 'terminal')
+
+    def __init__(self):
+        # Character -> _TrieNode (None while this node is a leaf)
+        self.children = None
+        # Sorted keys stored in this leaf (None once the node is split)
+        self.bucket = []
+        # Key equal to this node's prefix, if any (internal nodes only)
+        self.terminal = None
+
+
+class TitleTrie:
+    """
+    Prefix trie over title keys. Leaves are small sorted buckets that are
+    split ("burst") when they grow, which keeps memory close to one list
+    slot per key while lookups only walk a few characters.
+    """
+    def __init__(self, keys=()):
+        self._root = _TrieNode()
+        # Bulk load: one sorted bucket, then split the oversized leaves
+        self._root.bucket = sorted(set(keys))
+        self._burst_all(self._root, 0)
+
+    def _leaf_for(self, key):
+        """Return (node, depth) of the leaf or internal node where a key belongs"""
+        node = self._root
+        depth = 0
+        while node.children is not None and depth < len(key):
+            child = node.children.get(key[depth])
+            if child is None:
+                child = node.children[key[depth]] = _TrieNode()
+            node = child
+            depth += 1
+        return node, depth
+
+    def add(self, key):
+        """Insert a key (no-op if present)"""
+        node, depth = self._leaf_for(key)
+        if node.children is not None:
+            node.terminal = key
+            return
+        bucket = node.bucket
+        position = bisect_left(bucket, key)
+        if position < len(bucket) and bucket[position] == key:
+            return
+        bucket.insert(position, key)
+        if len(bucket) > BURST_SIZE:
+            self._burst_all(node, depth)
+
+    def remove(self, key):
+        """Remove a key (no-op if absent)"""
+        node = self._root
+        depth = 0
+        while node.children is not None and depth < len(key):
+            node = node.children.get(key[depth])
+            if node is None:
+                return
+            depth += 1
+        if node.children is not None:
+            if node.terminal == key:
+                node.terminal = None
+            return
+        bucket = node.bucket
+        position = bisect_left(bucket, key)
+        if position < len(bucket) and bucket[position] == key:
+            del bucket[position]
+
+    def _burst_all(self, node, depth):
+        """Split a leaf and any child that is still too large"""
+        stack = [(node, depth)]
+        while stack:
+            node, depth = stack.pop()
+            if node.children is not None or len(node.bucket) <= BURST_SIZE:
+                continue
+            keys = node.bucket
+            node.bucket = None
+            node.children = {}
+            # Keys are sorted, so every child bucket stays sorted
+            for key in keys:
+                if len(key) == depth:
+                    node.terminal = key
+                    continue
+                child = node.children.get(key[depth])
+                if child is None:
+                    child = node.children[key[depth]] = _TrieNode()
+                child.bucket.append(key)
+            stack.extend((child, depth + 1) for child in node.children.values())
+
+    def prefix(self, prefix):
+        """Yield the keys starting with a prefix, in lexicographic order"""
+        node = self._root
+        depth = 0
+        while node.children is not None and depth < len(prefix):
+            node = node.children.get(prefix[depth])
+            if node is None:
+                return
+            depth += 1
+
+        if node.children is None:
+            bucket = node.bucket
+            position = bisect_left(bucket, prefix)
+            while position < len(bucket) and bucket[position].startswith(prefix):
+                yield bucket[position]
+                position += 1
+            return
+
+        # Every key below this internal node matches the prefix
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            if current.children is None:
+                yield from current.bucket
+                continue
+            if current.terminal is not None:
+                yield current.terminal
+            stack.extend(current.children[char] for char in sorted(current.children, reverse=True))
+
+
+def trigrams(key):
+    """Set of trigrams of a key, padded so short keys and word starts count"""
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """
+    Inverted index from trigrams to the title keys containing them
+    """
+    def __init__(self, keys=()):
+        # Trigram -> set of keys
+        self._postings = {}
+        for key in keys:
+            self.add(key)
+
+    def add(self, key):
+        """Index a key under each of its trigrams"""
+        for trigram in trigrams(key):
+            postings = self._postings.get(trigram)
+            if postings is None:
+                postings = self._postings[trigram] = set()
+            postings.add(key)
+
+    def remove(self, key):
+        """Remove a key from the postings of its trigrams"""
+        for trigram in trigrams(key):
+            postings = self._postings.get(trigram)
+            if postings is not None:
+                postings.discard(key)
+                if not postings:
+                    del self._postings[trigram]
+
+    def search(self, query):
+        """
+        Yield (score, key) pairs by decreasing Dice similarity to the query.
+        A candidate must share at least MIN_OVERLAP of the query's trigrams.
+        Only the rare posting lists are scanned up front; keys that appear in
+        none of them share few trigrams with the query, so the large lists are
+        only scanned if the results run below that score bound.
+        """
+        query_trigrams = trigrams(query)
+        empty = frozenset()
+        lists = sorted((self._postings.get(t, empty) for t in query_trigrams), key=len)
+        required = max(1, math.ceil(len(lists) * MIN_OVERLAP))
+        # By pigeonhole, a candidate appears in one of the (n - required + 1) rarest lists
+        scanned = lists[:len(lists) - required + 1]
+        rare_count = sum(1 for postings in scanned if len(postings) <= RARE_POSTINGS)
+
+        def score(key):
+            shared = sum(1 for postings in lists if key in postings)
+            if shared < required:
+                return None
+            # A padded key of length n has at most n + 1 trigrams
+            return 2 * shared / (len(lists) + len(key) + 1)
+
+        seen = set()
+        heap = []
+        for postings in scanned[:rare_count]:
+            for key in postings:
+                if key not in seen:
+                    seen.add(key)
+                    key_score = score(key)
+                    if key_score is not None:
+                        heap.append((-key_score, key))
+        heapq.heapify(heap)
+
+        # Best possible score of a key missing from every rare list
+        max_shared = len(lists) - rare_count
+        bound = 2 * max_shared / (len(lists) + max_shared) if max_shared >= required else 0
+        while heap and -heap[0][0] >= bound:
+            key_score, key = heapq.heappop(heap)
+            yield -key_score, key
+
+        # Fall back to the large posting lists
+        for postings in scanned[rare_count:]:
+            for key in postings:
+                if key not in seen:
+                    seen.add(key)
+                    key_score = score(key)
+                    if key_score is not None:
+                        heapq.heappush(heap, (-key_score, key))
+        while heap:
+            key_score, key = heapq.heappop(heap)
+            yield -key_score, key
+
+
+class TitleSearchIndex:
+    """
+    Prefix trie plus trigram index, kept in sync with a map's title index
+    """
+    def __init__(self, keys=()):
+        keys = list(keys)
+        self.trie = TitleTrie(keys)
+        self.trigrams = TrigramIndex(keys)
+
+    def add(self, key):
+        """Index a new title key"""
+        self.trie.add(key)
+        self.trigrams.add(key)
+
+    def remove(self, key):
+        """Forget a title key"""
+        self.trie.remove(key)
+        self.trigrams.remove(key)
+
+
+def search_prefix(mindmap, prefix, limit=10):
+    """Return up to limit (node, score) pairs whose title starts with prefix, in title order"""
+    prefix = prefix.casefold()
+    results = []
+    for key in mindmap.title_search_index().trie.prefix(prefix):
+        # Keys can outlive their node in lazily loaded maps; skip those
+        node = mindmap.search_node(key)
+        if node is not None:
+            results.append((node, len(prefix) / max(len(key), 1)))
+            if len(results) >= limit:
+                break
+    return results
+
+
+def search_fuzzy(mindmap, query, limit=10):
+    """Return up to limit (node, score) pairs ranked by trigram similarity to query"""
+    results = []
+    for score, key in mindmap.title_search_index().trigrams.search(query.casefold()):
+        node = mindmap.search_node(key)
+        if node is not None:
+            results.append((node, score))
+            if len(results) >= limit:
+                break
+    return results
@@ -0,0 +1,316 @@
+"""
+MindMap Server - Daemon keeping maps resident behind a Unix domain socket
+
+Protocol: one JSON object per line in each direction.
+    request   {"id": 1, "op": "add", "map": "ideas", "args": {"parent": "root", "title": "New"}}
+    response  {"id": 1, "ok": true, "result": "Added 'New' under 'Ideas'"}
+              {"id": 1, "ok": false, "error": "Parent node 'x' not found"}
+
+Operations and their args:
+    ping, list, shutdown                      (no map)
+    create   {title, root_title?}             create a new map under the "map" file name (which must not exist)
+    add      {parent, title}
+    delete   {title}
+    search   {title} or {query, mode: prefix|fuzzy, limit?}
+    display  {node?, depth?}
+    info
+    save     {filename?, overwrite?}          with a new filename, the map is served under it afterwards
+
+Each map is loaded once and kept by its own MindMapManager. Reads (search,
+display, info) run in worker threads under a shared lock, so many clients
+can query the same map at once; writes take the lock exclusively. Maps opened
+from binary files load nodes while they are read, so all their requests are
+exclusive.
+"""
+
+import asyncio
+import json
+import os
+from contextlib import asynccontextmanager
+
+from .manager import MindMapManager
+from .metrics import METRICS
+from .storage import Storage
+
+# Default socket file, created in the data directory
+SOCKET_NAME = '.mindmap.sock'
+# Longest request line accepted
+LINE_LIMIT = 1 << 20
+
+# Operations that only read a map
+READ_OPERATIONS = ('search', 'display', 'info')
+# Operations that change a map or write it to disk
+WRITE_OPERATIONS = ('create', 'add', 'delete', 'save')
+
+
+class ReadWriteLock:
+    """
+    Asyncio lock admitting many readers or one writer. A waiting writer stops
+    new readers from entering, so a steady stream of queries cannot starve it.
+    """
+    def __init__(self):
+        self._condition = asyncio.Condition()
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    @asynccontextmanager
+    async def read(self):
+        """Hold the lock shared for the duration of the block"""
+        async with self._condition:
+            await self._condition.wait_for(lambda: not self._writer and not self._waiting_writers)
+            self._readers += 1
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self._readers -= 1
+                if not self._readers:
+                    self._condition.notify_all()
+
+    @asynccontextmanager
+    async def write(self):
+        """Hold the lock exclusively for the duration of the block"""
+        async with self._condition:
+            self._waiting_writers += 1
+            try:
+                await self._condition.wait_for(lambda: not self._writer and not self._readers)
+            finally:
+                self._waiting_writers -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self._writer = False
+                self._condition.notify_all()
+
+
+class ResidentMap:
+    """
+    A map kept in memory by the server, with the manager that owns it
+    """
+    def __init__(self, manager):
+        self.manager = manager
+        self.lock = ReadWriteLock()
+
+    @property
+    def lazy(self):
+        """True if reading the map can load nodes from its file"""
+        return hasattr(self.manager.current_map, '_source')
+
+
+class MapServer:
+    """
+    Serves requests for the maps of one data directory
+    """
+    def __init__(self, data_dir="data", socket_path=None, compact=False, journaled=False, compression=None):
+        self.data_dir = data_dir
+        self.socket_path = socket_path or os.path.join(data_dir, SOCKET_NAME)
+        self.compact = compact
+        self.journaled = journaled
+        self.compression = compression
+        # Used to normalize file names into map keys
+        self.storage = Storage(data_dir, compression=compression)
+        # Map key (file name with extension) -> ResidentMap
+        self.maps = {}
+        # Map key -> event set when the map being loaded (or saved under that key) is ready,
+        # so concurrent first requests load it once without holding up other maps
+        self._loading = {}
+        self._server = None
+        self._stopped = None
+
+    def _new_manager(self):
+        """Manager owning a single resident map"""
+        return MindMapManager(self.data_dir, compact=self.compact, journaled=self.journaled,
+                              compression=self.compression)
+
+    def _key(self, name):
+        """Key of a map: its file name with extension"""
+        return os.path.basename(self.storage._get_full_path(name))
+
+    async def _get_map(self, name):
+        """Return the resident map for a file, loading it on first use"""
+        key = self._key(name)
+        while True:
+            resident = self.maps.get(key)
+            if resident is not None:
+                return resident
+            loading = self._loading.get(key)
+            if loading is None:
+                break
+            await loading.wait()
+
+        loaded = self._loading[key] = asyncio.Event()
+        try:
+            manager = self._new_manager()
+            success, message = await asyncio.get_running_loop().run_in_executor(None, manager.load_map, name)
+            if not success:
+                raise ValueError(message)
+            resident = self.maps[key] = ResidentMap(manager)
+            return resident
+        finally:
+            del self._loading[key]
+            loaded.set()
+
+    async def _create_map(self, name, args):
+        """Create a new resident map that will be saved under the given file name"""
+        key = self._key(name)
+        if key in self.maps or key in self._loading:
+            raise ValueError(f"Map '{key}' is already open")
+        if not args.get('title'):
+            raise ValueError("create needs a 'title'")
+        if self.storage.exists(name):
+            raise ValueError(f"'{key}' already exists; open it instead")
+        manager = self._new_manager()
+        manager.create_map(args['title'], args.get('root_title'))
+        # Saves go to the requested file rather than the title-derived name
+        manager.current_file = name
+        self.maps[key] = ResidentMap(manager)
+        return f"Created new mind map: '{args['title']}'"
+
+    def _run(self, manager, op, args):
+        """Execute a map operation synchronously and return its result"""
+        if op == 'add':
+            success, message = manager.add_node(args['parent'], args['title'])
+        elif op == 'delete':
+            success, message = manager.delete_node(args['title'])
+        elif op == 'save':
+            success, message = manager.save_map(args.get('filename'), bool(args.get('overwrite')))
+        elif op == 'display':
+            success, lines = manager.iter_display(args.get('node'), args.get('depth'))
+            if not success:
+                raise ValueError(lines)
+            return "\n".join(lines)
+        elif op == 'info':
+            return manager.get_map_info()
+        elif 'query' in args:
+            # Ranked prefix/fuzzy search
+            results = manager.search_nodes(args['query'], args.get('mode', 'fuzzy'), int(args.get('limit', 10)))
+            return [{'title': node.title, 'score': round(score, 4),
+                     'path': manager.current_map.get_path(node)} for node, score in results]
+        else:
+            node = manager.search_node(args['title'])
+            if node is None:
+                raise ValueError(f"Node '{args['title']}' not found")
+            return {'title': node.title, 'path': manager.current_map.get_path(node), 'level': node.get_level()}
+        if not success:
+            raise ValueError(message)
+        return message
+
+    async def handle_request(self, request):
+        """Execute one decoded request and return the result (raises ValueError on failure)"""
+        op = request.get('op')
+        args = request.get('args') or {}
+        if op == 'ping':
+            return "pong"
+        if op == 'list':
+            return sorted(self.maps)
+        if op == 'shutdown':
+            self._stopped.set()
+            return "Shutting down"
+        if op not in READ_OPERATIONS and op not in WRITE_OPERATIONS:
+            raise ValueError(f"Unknown operation: {op!r}")
+        if not request.get('map'):
+            raise ValueError(f"'{op}' needs a 'map'")
+        if op == 'create':
+            return await self._create_map(request['map'], args)
+
+        resident = await self._get_map(request['map'])
+        loop = asyncio.get_running_loop()
+        if op == 'save' and args.get('filename') and self._key(args['filename']) != self._key(request['map']):
+            return await self._save_as(resident, args)
+        # The first ranked search builds the title index, which is a write
+        builds_index = op == 'search' and 'query' in args and not resident.manager.current_map.has_search_index()
+        if op in READ_OPERATIONS and not resident.lazy and not builds_index:
+            async with resident.lock.read():
+                return await loop.run_in_executor(None, self._run, resident.manager, op, args)
+        async with resident.lock.write():
+            return await loop.run_in_executor(None, self._run, resident.manager, op, args)
+
+    async def _save_as(self, resident, args):
+        """
+        Save a map under another file name and serve it under that name from then
+        on; requests for the new name wait until the save is done
+        """
+        target = self._key(args['filename'])
+        if target in self.maps or target in self._loading:
+            raise ValueError(f"'{target}' is open as another map")
+        saved = self._loading[target] = asyncio.Event()
+        try:
+            async with resident.lock.write():
+                result = await asyncio.get_running_loop().run_in_executor(
+                    None, self._run, resident.manager, 'save', args)
+                # The manager now writes to the new file; the old name loads the old file afresh
+                for key in [key for key, other in self.maps.items() if other is resident]:
+                    del self.maps[key]
+                self.maps[target] = resident
+            return result
+        finally:
+            del self._loading[target]
+            saved.set()
+
+    async def _serve_client(self, reader, writer):
+        """Answer the requests of one connection until it closes"""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                response = {'id': None}
+                try:
+                    request = json.loads(line)
+                    response['id'] = request.get('id')
+                    with METRICS.timer(f"server.{request.get('op')}"):
+                        response['result'] = await self.handle_request(request)
+                    response['ok'] = True
+                except KeyError as e:
+                    response['ok'] = False
+                    response['error'] = f"Missing argument: {e}"
+                except Exception as e:
+                    response['ok'] = False
+                    response['error'] = str(e)
+                writer.write(json.dumps(response, ensure_ascii=False).encode('utf-8') + b'\n')
+                await writer.drain()
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+            # Client went away or sent an oversized line
+            pass
+        except asyncio.CancelledError:
+            # Server shutting down while the client is still connected
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self):
+        """Listen on the socket until a shutdown request (or cancellation)"""
+        self._stopped = asyncio.Event()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)  # Stale socket of a previous run
+        self._server = await asyncio.start_unix_server(self._serve_client, path=self.socket_path,
+                                                       limit=LINE_LIMIT)
+        print(f"Serving maps of '{self.data_dir}' on {self.socket_path}")
+        try:
+            async with self._server:
+                await self._stopped.wait()
+        finally:
+            self.close()
+
+    def close(self):
+        """Close the journals of every map and remove the socket file"""
+        unsaved = []
+        for key, resident in self.maps.items():
+            unsaved.extend(resident.manager.unsaved_maps())
+            resident.manager.close_workspace()
+        if unsaved:
+            print(f"Unsaved changes discarded in: {', '.join(unsaved)}")
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+
+def serve(data_dir="data", socket_path=None, compact=False, journaled=False, compression=None):
+    """Run a MapServer until it is shut down (Ctrl+C or a 'shutdown' request)"""
+    server = MapServer(data_dir, socket_path, compact, journaled, compression)
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        print("\nServer stopped")
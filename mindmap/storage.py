@@ -1,56 +1,408 @@
+import gzip
+import io
 import json
+import lzma
 import os
+import threading
+from contextlib import contextmanager
+from functools import partial
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows: saves are not locked there
+    fcntl = None
 from .models import MindMap
+from .jsonstream import read_map, read_version, write_map
+from . import binary
+from . import journal
+from .fulltext import FullTextIndex, FullTextIndexError
+from .metrics import METRICS
+
+# Bytes read to recognize a compressed file by its magic number
+MAGIC_BYTES = 6
+# Hidden directory of the data directory holding the lock files of its maps and catalog
+LOCK_DIR = '.locks'
+
+
+class JsonBackend:
+    """
+    Indented JSON files, streamed in both directions
+    """
+    extension = '.json'
+    # Codec name (--compress) and leading bytes of the files it writes (plain JSON has none)
+    compression = None
+    magic = None
+
+    def wrap(self, raw, mode):
+        """Binary stream the text goes through on its way to or from the raw file"""
+        return raw
+
+    def save(self, mindmap, path, fragments=None, version=None):
+        """
+        Write a map to a JSON file next to the target, then swap it in atomically.
+        Subtrees found in fragments are copied instead of serialized (see write_map).
+        """
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, 'wb') as raw:
+                stream = self.wrap(raw, 'wb')
+                f = io.TextIOWrapper(stream, encoding='utf-8')
+                write_map(mindmap, f, fragments, version)
+                # Flush the text layer without closing the file, then end the compressed stream
+                f.detach()
+                if stream is not raw:
+                    stream.close()
+                raw.flush()
+                os.fsync(raw.fileno())
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        METRICS.observe('traversal.save.nodes', mindmap.node_count)
+
+    def load(self, path, map_class):
+        """
+        Read a map from a JSON file, building nodes as they are parsed.
+        Returns the map and the version of the file.
+        """
+        header = {}
+        with open(path, 'rb') as raw, self._open_text(raw) as f:
+            mindmap = read_map(f, map_class, header)
+        METRICS.increment('storage.bytes_read', os.path.getsize(path))
+        METRICS.observe('traversal.load.nodes', mindmap.node_count)
+        return mindmap, header['version']
+
+    def read_version(self, path):
+        """Version of a JSON file, read from its first bytes"""
+        with open(path, 'rb') as raw, self._open_text(raw) as f:
+            return read_version(f)
+
+    def _open_text(self, raw):
+        """
+        Text stream over a JSON file opened in binary mode. Compressed files are
+        recognized by their first bytes, whatever their extension.
+        """
+        head = raw.read(MAGIC_BYTES)
+        raw.seek(0)
+        backend = next((backend for backend in JSON_BACKENDS
+                        if backend.magic and head.startswith(backend.magic)), self)
+        return io.TextIOWrapper(backend.wrap(raw, 'rb'), encoding='utf-8')
+
+
+class GzipJsonBackend(JsonBackend):
+    """
+    gzip-compressed JSON, compressed and decompressed as it is streamed
+    """
+    extension = '.json.gz'
+    compression = 'gzip'
+    magic = b'\x1f\x8b'
+
+    def wrap(self, raw, mode):
+        if mode == 'wb':
+            # mtime=0: the same map always compresses to the same bytes
+            return gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=GZIP_LEVEL, mtime=0)
+        return gzip.GzipFile(fileobj=raw, mode='rb')
+
+
+class XzJsonBackend(JsonBackend):
+    """
+    xz (LZMA) compressed JSON: smaller than gzip, slower to write
+    """
+    extension = '.json.xz'
+    compression = 'xz'
+    magic = b'\xfd7zXZ\x00'
+
+    def wrap(self, raw, mode):
+        if mode == 'wb':
+            return lzma.LZMAFile(raw, 'wb', preset=XZ_PRESET)
+        return lzma.LZMAFile(raw, 'rb')
+
+
+# Compression levels: past these, pretty-printed maps barely shrink but take much longer to write
+GZIP_LEVEL = 6
+XZ_PRESET = 6
+# JSON flavours, plain first; a JSON file is read by the one its magic bytes name
+JSON_BACKENDS = [JsonBackend(), GzipJsonBackend(), XzJsonBackend()]
+
+
+class BinaryBackend:
+    """
+    Memory-mapped binary files whose subtrees are loaded lazily
+    """
+    extension = binary.EXTENSION
+
+    def save(self, mindmap, path, fragments=None, version=0):
+        """Write a map to a binary file (the layout is global, so fragments do not apply)"""
+        binary.write_map_file(mindmap, path, version)
+        METRICS.observe('traversal.save.nodes', mindmap.node_count)
+
+    def load(self, path, map_class):
+        """Open a binary file as a LazyMindMap (the map class does not apply), with its version"""
+        mindmap = binary.load_map_file(path)
+        # Pages are only read when nodes are visited
+        METRICS.increment('storage.bytes_mapped', os.path.getsize(path))
+        return mindmap, mindmap._source.version
+
+    def read_version(self, path):
+        """Version of a binary file, read from its header"""
+        return binary.read_version(path)
+
 
 class Storage:
     """
     Manages the saving and loading of mind maps from files
     """
-    def __init__(self, data_dir="data"):
+    # Available file formats; the first one is the default
+    BACKENDS = JSON_BACKENDS + [BinaryBackend()]
+    # File in the data directory caching per-map metadata for listings
+    CATALOG_NAME = '.catalog.json'
+
+    def __init__(self, data_dir="data", map_class=MindMap, compression=None):
         # Directory where mind maps will be stored
         self.data_dir = data_dir
+        # Class used to rebuild loaded maps (MindMap or CompactMindMap)
+        self.map_class = map_class
+        # JSON flavour of new files saved without an extension ('gzip', 'xz' or None for plain)
+        self.default_backend = next((backend for backend in JSON_BACKENDS if backend.compression == compression),
+                                    None)
+        if self.default_backend is None:
+            raise ValueError(f"Unknown compression '{compression}'")
         # Create the directory if it doesn't exist
         os.makedirs(data_dir, exist_ok=True)
-        
+        # In-memory copy of the catalog and the mtime of the file it was read from
+        self._catalog = {}
+        self._catalog_mtime = None
+        # False to leave catalog updates to the caller (e.g. batch workers)
+        self.update_catalog = True
+        # False to skip content hashing on save (e.g. maps that are saved only once)
+        self.incremental = True
+        # Path -> (map title and content hash, file signature, JSON fragments) of the last save
+        self._saved = {}
+        # Path -> (file version, journal size) as this process last loaded or wrote the file
+        self._versions = {}
+        # Token index of the titles of every saved map, and whether saves update it
+        self.text_index = FullTextIndex(data_dir)
+        self.update_index = True
+
+    def _get_backend(self, filename):
+        """
+        Return the backend handling a filename, based on its extension
+        """
+        for backend in self.BACKENDS:
+            if filename.endswith(backend.extension):
+                return backend
+        return None
+
     def _get_full_path(self, filename):
         """
-        Generate the full file path for a given filename,
-        ensuring it ends with .json
+        Generate the full file path for a given filename, ensuring it ends with a
+        known extension. A name without one is a JSON map: its existing file,
+        plain or compressed, or else a new file of the default JSON flavour.
         """
-        if not filename.endswith('.json'):
-            filename += '.json'
+        if self._get_backend(filename) is None:
+            default = self.default_backend
+            for backend in [default] + [backend for backend in JSON_BACKENDS if backend is not default]:
+                path = os.path.join(self.data_dir, filename + backend.extension)
+                if os.path.exists(path):
+                    return path
+            filename += default.extension
         return os.path.join(self.data_dir, filename)
-        
-    def save(self, mindmap, filename):
+
+    def _get_journal_path(self, filename):
+        """
+        Path of the operation journal kept next to a map file
+        """
+        return self._get_full_path(filename) + journal.EXTENSION
+
+    def open_journal(self, filename):
+        """
+        Open (or create) the operation journal of a map file for appending.
+        Its writes hold the lock of the map file.
+        """
+        path = self._get_full_path(filename)
+        return journal.Journal(path + journal.EXTENSION, partial(self._lock, path),
+                               partial(self._journal_synced, path))
+
+    def _journal_synced(self, path, before, after):
         """
-        Save a MindMap instance to a JSON file
+        Follow the journal writes of this process: the expected journal size only
+        moves if nobody else wrote to the journal since
+        """
+        state = self._versions.get(path)
+        if state is not None and state[1] == before:
+            self._versions[path] = (state[0], after)
+
+    @contextmanager
+    def _lock(self, path):
+        """
+        Hold the advisory lock of a map file (a '<name>.lock' file in the LOCK_DIR
+        next to it) while writing it. Readers never take it: files are replaced
+        atomically, so a load never waits for a save. Lock files are kept, as
+        removing one would let a process waiting on it and a newcomer creating
+        it afresh both hold the lock.
+        """
+        if fcntl is None:
+            yield
+            return
+        lock_dir = os.path.join(os.path.dirname(path), LOCK_DIR)
+        os.makedirs(lock_dir, exist_ok=True)
+        with open(os.path.join(lock_dir, f"{os.path.basename(path)}.lock"), 'a') as f:
+            with METRICS.timer('storage.lock_wait'):
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _get_file_state(self, path):
+        """
+        (version, journal size) of a map file as it is on disk, (0, 0) if it does not exist
+        """
+        if not os.path.exists(path):
+            return (0, 0)
+        journal_path = path + journal.EXTENSION
+        journal_size = os.path.getsize(journal_path) if os.path.exists(journal_path) else 0
+        return (self._get_backend(path).read_version(path), journal_size)
+
+    def save(self, mindmap, filename, merge=None, overwrite=False):
+        """
+        Save a MindMap instance to a file, in the format given by its extension.
+        A full snapshot folds in the map's journal, which is then removed.
+        If another process saved the file since this one loaded or saved it,
+        merge (if given) is called with the map read from the file and returns
+        the map to write instead (None if the changes cannot be merged);
+        without merge, or when it gives up, the save fails. An existing file
+        this process never loaded or saved is only replaced with overwrite.
         """
         try:
             path = self._get_full_path(filename)
-            data = mindmap.to_dict()  # Convert the MindMap to a dictionary
-            
-            # Write the data to file in JSON format
-            with open(path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
-                
-            return True  # Successfully saved
+            name = os.path.basename(path)
+
+            # From the second save of a file on, content hashes tell whether the map
+            # changed since it was last saved (a map saved only once never pays for
+            # hashing). Caching subtree texts costs about as much as writing them, so
+            # the save that first hashes the map writes it whole, the next one caches
+            # the texts and later ones copy them. Maps read lazily from a binary file
+            # would have to be loaded to be hashed.
+            digest = None
+            fragments = None
+            previous = self._saved.get(path)
+            if self.incremental and hasattr(mindmap.root, 'content_hash') and not hasattr(mindmap, '_source'):
+                if previous is not None and os.path.exists(path):
+                    digest = (mindmap.title, mindmap.root.content_hash())
+                    if previous[0] == digest and previous[1] == self._get_file_signature(name):
+                        # Same content, and the file was not touched since: nothing to write
+                        METRICS.increment('storage.saves_skipped')
+                        return True
+                    if previous[2] is not None:
+                        fragments = previous[2]
+                    elif previous[0] is not None:
+                        fragments = {}
+
+            backend = self._get_backend(path)
+            with self._lock(path):
+                # Compare the file with the version this process knows, then write the next one
+                state = self._get_file_state(path)
+                expected = self._versions.get(path)
+                if expected is None and not overwrite and os.path.exists(path):
+                    # Nothing here was read from that file: writing would discard its content
+                    METRICS.increment('storage.save_conflicts')
+                    print(f"Save conflict: '{name}' already exists and was not loaded or saved here")
+                    return False
+                if expected is not None and state != expected:
+                    mindmap = self._merge(path, mindmap, merge, expected, state)
+                    if mindmap is None:
+                        return False
+                version = max(state[0], expected[0] if expected else 0) + 1
+
+                # Stream the map to file while walking the tree
+                with METRICS.timer(f"storage.save{backend.extension}"):
+                    backend.save(mindmap, path, fragments, version)
+                METRICS.increment('storage.bytes_written', os.path.getsize(path))
+
+                # The snapshot now contains every journaled operation
+                journal_path = self._get_journal_path(filename)
+                if os.path.exists(journal_path):
+                    os.remove(journal_path)
+                self._versions[path] = (version, 0)
+            if self.incremental:
+                self._saved[path] = (digest, self._get_file_signature(name), fragments)
         except Exception as e:
             # Print any error that occurred during saving
             print(f"Save error: {e}")
             return False
-            
-    def load(self, filename):
+
+        if self.update_catalog:
+            try:
+                # Record the map's metadata so listings don't need to open it
+                self.merge_catalog({name: self._make_catalog_entry(mindmap, self._get_file_signature(name))})
+            except Exception as e:
+                # The map itself is saved; the entry is rebuilt on the next listing
+                print(f"Catalog error: {e}")
+        if self.update_index:
+            # After the file lock is released: other processes can save meanwhile
+            self.index_map(name, mindmap)
+        return True  # Successfully saved
+
+    def _merge(self, path, mindmap, merge, expected, state):
+        """
+        Resolve a save over a file another process changed: return the map to
+        write (from merge), or None after reporting the conflict
+        """
+        name = os.path.basename(path)
+        METRICS.increment('storage.save_conflicts')
+        conflict = (f"Save conflict: '{name}' was changed by another process since it was loaded "
+                    f"(version {expected[0]}, now {state[0]})")
+        if merge is None:
+            print(conflict)
+            return None
+        merged = merge(self._read(path)[0])
+        if merged is None:
+            print(f"{conflict} and the changes made here no longer apply to it")
+            return None
+        METRICS.increment('storage.save_merges')
+        return merged
+
+    def index_map(self, filename, mindmap):
+        """
+        Bring the full-text index entry of a saved map up to date with its content,
+        rewriting only the top-level branches whose content hash changed
+        """
+        name = os.path.basename(self._get_full_path(filename))
+        try:
+            with METRICS.timer('storage.index_update'):
+                changed = self.text_index.update(name, mindmap, self._get_file_signature(name))
+            METRICS.observe('storage.index_nodes_changed', changed)
+        except FullTextIndexError as e:
+            # The map itself is saved; its entry is refreshed by the next find
+            print(f"Index error: {e}")
+
+    def exists(self, filename):
+        """Whether a map file with that name is in the data directory"""
+        return os.path.exists(self._get_full_path(filename))
+
+    def forget(self, filename):
+        """
+        Drop the hashes, fragments and version kept from the last save of a file (its map was closed)
         """
-        Load a MindMap instance from a JSON file
+        path = self._get_full_path(filename)
+        self._saved.pop(path, None)
+        self._versions.pop(path, None)
+
+    def load(self, filename, track=True):
+        """
+        Load a MindMap instance from a file, in the format given by its extension.
+        With track, the version read is remembered so that saving the map back
+        detects changes made by other processes meanwhile (maps that are only
+        looked at must not be tracked, or they would hide such changes).
         """
         try:
             path = self._get_full_path(filename)
-            
-            # Read and parse the JSON file
-            with open(path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                
-            return MindMap.from_dict(data)  # Reconstruct the MindMap
+            mindmap, state = self._read(path)
+            if track:
+                self._versions[path] = state
+            return mindmap
         except FileNotFoundError:
             # File does not exist
             print(f"File '{filename}' not found")
@@ -59,13 +411,205 @@ class Storage:
             # Handle other loading errors
             print(f"Loading error: {e}")
             return None
-            
+
+    def _read(self, path):
+        """
+        Read a map file and replay its journal. Returns the map and the (version,
+        journal size) it was read at; no lock is taken, as files are replaced whole.
+        """
+        # Parse the file incrementally (or map it lazily for binary files)
+        backend = self._get_backend(path)
+        with METRICS.timer(f"storage.load{backend.extension}"):
+            mindmap, version = backend.load(path, self.map_class)
+
+        # Replay operations journaled since the last snapshot
+        journal_path = path + journal.EXTENSION
+        journal_size = 0
+        try:
+            # Measured first: records appended meanwhile only make a later save merge
+            journal_size = os.path.getsize(journal_path)
+            with METRICS.timer('storage.journal_replay'):
+                journal.replay(journal_path, mindmap)
+            METRICS.increment('storage.bytes_read', journal_size)
+        except FileNotFoundError:
+            # No journal, or another process just folded it into a newer snapshot
+            pass
+        return mindmap, (version, journal_size)
+
+    def convert(self, filename, extension):
+        """
+        Convert a saved map to another format (e.g. '.json' -> '.mmb'),
+        returning the name of the new file or None on failure
+        """
+        mindmap = self.load(filename, track=False)
+        if mindmap is None:
+            return None
+
+        # Replace the source extension with the target one
+        name = os.path.basename(self._get_full_path(filename))
+        name = name[:-len(self._get_backend(name).extension)] + extension
+        if self.save(mindmap, name):
+            return name
+        return None
+
+    def _get_display_name(self, filename):
+        """
+        Name under which a file is listed and loaded (JSON maps without their
+        extension, other formats with it), or None if it is not a map file
+        """
+        if filename.startswith('.'):
+            return None  # Hidden files such as the catalog
+        backend = self._get_backend(filename)
+        if backend is self.BACKENDS[0]:
+            return filename[:-len(backend.extension)]  # Strip the .json extension
+        if backend is not None:
+            return filename
+        return None
+
     def list_files(self):
         """
-        List all mind map filenames (without .json extension) in the data directory
+        List all mind map filenames in the data directory
+        (JSON maps without their extension, other formats with it)
         """
         files = []
         for filename in os.listdir(self.data_dir):
-            if filename.endswith('.json'):
-                files.append(filename[:-5])  # Strip the .json extension
-        return files
\ No newline at end of file
+            name = self._get_display_name(filename)
+            if name is not None:
+                files.append(name)
+        return files
+
+    def find(self, terms, limit=None):
+        """
+        Return (display name, path) of the nodes of every saved map whose title
+        contains all the words of terms. Saves keep the index up to date, so only
+        maps written outside this application (or whose index update failed) are
+        opened, to be re-indexed first; removed maps are dropped from the index.
+        Raises FullTextIndexError if the index cannot be used.
+        """
+        indexed = self.text_index.signatures()
+        present = set()
+        for filename in sorted(os.listdir(self.data_dir)):
+            if self._get_display_name(filename) is None:
+                continue
+            present.add(filename)
+            signature = self._get_file_signature(filename)
+            if indexed.get(filename) != signature:
+                mindmap = self.load(filename, track=False)
+                if mindmap is not None:
+                    METRICS.increment('storage.index_refreshes')
+                    with METRICS.timer('storage.index_update'):
+                        changed = self.text_index.update(filename, mindmap, signature)
+                    METRICS.observe('storage.index_nodes_changed', changed)
+        removed = [filename for filename in indexed if filename not in present]
+        if removed:
+            self.text_index.remove(removed)
+        return [(self._get_display_name(filename), path) for filename, path in self.text_index.search(terms, limit)]
+
+    def _get_catalog_path(self):
+        """
+        Path of the metadata catalog in the data directory
+        """
+        return os.path.join(self.data_dir, self.CATALOG_NAME)
+
+    def _read_catalog(self):
+        """
+        Return the catalog (file name -> metadata), re-reading the file only
+        when another process changed it since it was last read or written
+        """
+        path = self._get_catalog_path()
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return self._catalog
+        if mtime != self._catalog_mtime:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self._catalog = json.load(f).get('maps', {})
+            except ValueError:
+                # A damaged catalog is rebuilt from the map files
+                self._catalog = {}
+            self._catalog_mtime = mtime
+        return self._catalog
+
+    def _write_catalog(self, catalog):
+        """
+        Replace the catalog file atomically with the given entries
+        """
+        path = self._get_catalog_path()
+        # One temporary file per process and thread, so parallel batch workers
+        # and background saves don't collide
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'maps': catalog}, f, ensure_ascii=False)
+        os.replace(temp_path, path)
+        self._catalog = catalog
+        self._catalog_mtime = os.stat(path).st_mtime_ns
+
+    def merge_catalog(self, entries, removed=()):
+        """
+        Add or replace catalog entries (file name -> metadata) and drop the
+        removed file names in one write, holding the catalog's lock so the
+        updates of concurrent processes are not lost
+        """
+        with self._lock(self._get_catalog_path()):
+            catalog = dict(self._read_catalog())
+            catalog.update(entries)
+            for filename in removed:
+                catalog.pop(filename, None)
+            self._write_catalog(catalog)
+
+    def _get_file_signature(self, filename):
+        """
+        Stat-based signature of a map file and its journal, used to detect stale entries
+        """
+        stat = os.stat(os.path.join(self.data_dir, filename))
+        journal_path = os.path.join(self.data_dir, filename) + journal.EXTENSION
+        journal_size = os.path.getsize(journal_path) if os.path.exists(journal_path) else 0
+        return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'journal_size': journal_size}
+
+    def _make_catalog_entry(self, mindmap, signature):
+        """
+        Build the catalog entry of a map from its counters and file signature
+        """
+        entry = {
+            'title': mindmap.title,
+            'root_title': mindmap.root.title,
+            'nodes': mindmap.node_count,
+            'max_depth': mindmap.max_depth,
+        }
+        entry.update(signature)
+        return entry
+
+    def list_entries(self):
+        """
+        Return the catalog metadata of every map in the data directory, with
+        'name' (as used by load) and 'file' added. Entries whose file or journal
+        changed since they were cached are refreshed by loading that map; all
+        others are answered without opening any map file.
+        """
+        catalog = self._read_catalog()
+        updates = {}
+        entries = []
+        present = set()
+        for filename in sorted(os.listdir(self.data_dir)):
+            name = self._get_display_name(filename)
+            if name is None:
+                continue
+            present.add(filename)
+            signature = self._get_file_signature(filename)
+            entry = catalog.get(filename)
+            if entry is None or any(entry.get(key) != value for key, value in signature.items()):
+                mindmap = self.load(filename, track=False)
+                if mindmap is None:
+                    # Unreadable map: list it without metadata and retry next time
+                    entries.append(dict(signature, name=name, file=filename, title=None,
+                                        root_title=None, nodes=None, max_depth=None))
+                    continue
+                entry = updates[filename] = self._make_catalog_entry(mindmap, signature)
+            entries.append(dict(entry, name=name, file=filename))
+
+        # Forget maps that were removed from the directory
+        removed = [filename for filename in catalog if filename not in present]
+        if updates or removed:
+            self.merge_catalog(updates, removed)
+        return entries
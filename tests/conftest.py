@@ -0,0 +1,50 @@
+import os
+import sys
+
+import pytest
+
+# Run from a checkout: make the mindmap package importable without installing it
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mindmap.compact import CompactMindMap
+from mindmap.models import MindMap
+
+
+@pytest.fixture(params=[MindMap, CompactMindMap], ids=['nodes', 'compact'])
+def map_class(request):
+    """Each map representation in turn"""
+    return request.param
+
+
+def check_invariants(mindmap):
+    """
+    Assert that the counters a map keeps incrementally match its tree: depths,
+    subtree sizes, node count, depth histogram and the title index
+    """
+    depth_counts = {}
+    # Post-order walk so subtree sizes can be summed from the children
+    order = []
+    stack = [mindmap.root]
+    while stack:
+        node = stack.pop()
+        order.append(node)
+        for child in node.children:
+            assert child.parent == node
+            stack.append(child)
+    for node in reversed(order):
+        expected_depth = 0 if node.parent is None else node.parent.depth + 1
+        assert node.depth == expected_depth, node.title
+        assert node.get_level() == expected_depth
+        assert node.subtree_size == 1 + sum(child.subtree_size for child in node.children), node.title
+        depth_counts[node.depth] = depth_counts.get(node.depth, 0) + 1
+        assert mindmap.search_node(node.title) == node, node.title
+        assert mindmap.search_node(node.title.upper()) == node
+    assert mindmap.node_count == len(order)
+    assert mindmap.max_depth == max(depth_counts)
+    return len(order)
+
+
+@pytest.fixture
+def check_map():
+    """The invariant checker, for tests that change maps"""
+    return check_invariants
@@ -0,0 +1,42 @@
+import json
+import os
+
+from mindmap.autosave import take_snapshot
+from mindmap.manager import AUTOSAVE_CHANGES, MindMapManager
+
+from test_models import build
+
+
+def as_dict(node):
+    """Titles of a (snapshot) subtree as nested dictionaries"""
+    return {'title': node.title, 'children': [as_dict(child) for child in node.children]}
+
+
+def test_snapshot_keeps_the_tree_as_it_was(map_class, check_map):
+    mindmap = build(map_class)
+    expected = as_dict(mindmap.root)
+    target, snapshot = take_snapshot(mindmap)
+    # Changes made while a save would be reading the snapshot
+    mindmap.search_node("n1").add_child("added")
+    mindmap.root.remove_child(mindmap.search_node("n2"))
+    mindmap.search_node("n3").move_to(mindmap.search_node("n4"))
+    assert as_dict(target.root) == expected
+    assert target.node_count == 85
+    if snapshot is not None:
+        snapshot.release()
+    check_map(mindmap)
+    assert mindmap.search_node("added").parent.title == "n1"
+
+
+def test_changes_are_saved_in_the_background(tmp_path):
+    manager = MindMapManager(str(tmp_path), autosave=True)
+    manager.create_map("Ideas")
+    assert manager.save_map("ideas")[0]
+    for number in range(AUTOSAVE_CHANGES):
+        manager.add_node("root", f"Idea {number}")
+    manager.autosaver.wait()
+    with open(os.path.join(str(tmp_path), "ideas.json"), encoding='utf-8') as f:
+        assert len(json.load(f)['children']) == AUTOSAVE_CHANGES
+    assert manager.unsaved_maps() == []
+    # Saving again has nothing left to write
+    assert manager.save_map()[0]
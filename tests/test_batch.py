@@ -0,0 +1,41 @@
+import os
+
+from mindmap.batch import run_batch
+from mindmap.models import MindMap
+from mindmap.storage import Storage
+
+
+def make_data_dir(tmp_path):
+    """Three valid maps, one unreadable file and one map deeper than the manager allows"""
+    storage = Storage(str(tmp_path))
+    for number in range(3):
+        mindmap = MindMap(f"Map {number}")
+        for child in range(number + 1):
+            mindmap.root.add_child(f"Node {number}.{child}")
+        assert storage.save(mindmap, f"map{number}")
+    deep = MindMap("Deep")
+    node = deep.root
+    for level in range(5):
+        node = node.add_child(f"Level {level}")
+    assert storage.save(deep, "deep")
+    with open(os.path.join(str(tmp_path), "broken.json"), 'w', encoding='utf-8') as f:
+        f.write('{"title": ')
+    return str(tmp_path)
+
+
+def test_validate_reports_every_file(tmp_path):
+    data_dir = make_data_dir(tmp_path)
+    report = run_batch(data_dir, 'validate', workers=2, chunk_size=1)
+    assert report['files'] == 5 and report['succeeded'] == 3
+    assert sorted(result['file'] for result in report['failed']) == ["broken", "deep"]
+    assert report['nodes'] == 2 + 3 + 4
+
+
+def test_convert_writes_the_target_format(tmp_path):
+    data_dir = make_data_dir(tmp_path)
+    report = run_batch(data_dir, 'convert', 'mmb', workers=2)
+    assert report['succeeded'] == 4
+    storage = Storage(data_dir)
+    assert storage.load("map2.mmb").to_dict() == storage.load("map2").to_dict()
+    nodes = {entry['name']: entry['nodes'] for entry in storage.list_entries()}
+    assert nodes["map2.mmb"] == 4 and nodes["deep.mmb"] == 6
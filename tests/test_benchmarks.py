@@ -0,0 +1,31 @@
+import pytest
+
+from benchmarks.generator import generate_map, sample_titles
+from benchmarks.suite import compare, parse_size
+
+
+@pytest.mark.parametrize('node_count, fanout, depth', [(1, 10, 2), (1000, 10, 2), (5000, 6, 3), (777, 3, 4)])
+def test_generated_maps_have_the_requested_shape(map_class, check_map, node_count, fanout, depth):
+    mindmap = generate_map(node_count, fanout, depth, map_class=map_class)
+    # check_map also finds every node by its title, so titles are unique
+    assert check_map(mindmap) == node_count
+    assert mindmap.max_depth <= depth
+
+
+def test_generator_is_deterministic(map_class):
+    first = generate_map(2000, seed=3, map_class=map_class)
+    assert first.to_dict() == generate_map(2000, seed=3, map_class=map_class).to_dict()
+    assert first.to_dict() != generate_map(2000, seed=4, map_class=map_class).to_dict()
+    assert sample_titles(first, 5, seed=1) == sample_titles(first, 5, seed=1)
+    assert {first.search_node(title).depth for title in sample_titles(first, 20, depth=2)} == {2}
+
+
+def test_sizes_and_baseline_comparison(capsys):
+    assert [parse_size(text) for text in ["1000", "100k", "1.5M"]] == [1000, 100000, 1500000]
+    baseline = {'results': [{'scenario': "add_node", 'nodes': 1000, 'per_op': 1e-6},
+                            {'scenario': "search", 'nodes': 1000, 'per_op': 1e-6}]}
+    results = {'results': [{'scenario': "add_node", 'nodes': 1000, 'per_op': 1.1e-6},
+                           {'scenario': "search", 'nodes': 1000, 'per_op': 2e-6},
+                           {'scenario': "new", 'nodes': 1000, 'per_op': 1e-6}]}
+    assert compare(results, baseline, 0.2) == [("search", 1000, 2.0)]
+    assert "SLOWER" in capsys.readouterr().out
@@ -0,0 +1,51 @@
+import os
+
+from mindmap.manager import MindMapManager
+from mindmap.models import MindMap
+from mindmap.storage import Storage
+
+
+def make_map(title, count):
+    mindmap = MindMap(title)
+    for number in range(count):
+        mindmap.root.add_child(f"{title} {number}")
+    return mindmap
+
+
+def test_listing_reads_the_catalog_only(tmp_path, monkeypatch):
+    storage = Storage(str(tmp_path))
+    assert storage.save(make_map("Ideas", 3), "ideas")
+    assert storage.save(make_map("Plans", 5), "plans.mmb")
+    listing = Storage(str(tmp_path))
+    # No map file is opened while the catalog is current
+    monkeypatch.setattr(listing, 'load', None)
+    entries = listing.list_entries()
+    assert [(entry['name'], entry['title'], entry['nodes']) for entry in entries] == \
+        [("ideas", "Ideas", 4), ("plans.mmb", "Plans", 6)]
+
+
+def test_maps_changed_elsewhere_are_refreshed(tmp_path):
+    storage = Storage(str(tmp_path))
+    assert storage.save(make_map("Ideas", 3), "ideas")
+    assert storage.save(make_map("Plans", 3), "plans")
+    # Another writer that leaves the catalog alone
+    other = Storage(str(tmp_path))
+    other.update_catalog = False
+    ideas = other.load("ideas")
+    for number in range(3, 7):
+        ideas.root.add_child(f"Ideas {number}")
+    assert other.save(ideas, "ideas")
+    os.remove(os.path.join(str(tmp_path), "plans.json"))
+    assert [(entry['name'], entry['nodes']) for entry in storage.list_entries()] == [("ideas", 8)]
+    assert list(storage._read_catalog()) == ["ideas.json"]
+
+
+def test_manager_sorts_and_filters_entries(tmp_path):
+    storage = Storage(str(tmp_path))
+    for title, count in [("Beta", 1), ("alpha", 9), ("Gamma plans", 4)]:
+        assert storage.save(make_map(title, count), title.replace(" ", "_"))
+    manager = MindMapManager(str(tmp_path))
+    assert [entry['title'] for entry in manager.list_map_entries()] == ["alpha", "Beta", "Gamma plans"]
+    assert [entry['title'] for entry in manager.list_map_entries("nodes", reverse=True)] == \
+        ["alpha", "Gamma plans", "Beta"]
+    assert [entry['title'] for entry in manager.list_map_entries(text="PLAN")] == ["Gamma plans"]
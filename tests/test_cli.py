@@ -0,0 +1,47 @@
+import io
+import os
+import shutil
+
+from mindmap.cli import MindMapCLI
+
+
+def test_script_runs_without_prompting(tmp_path, capsys):
+    cli = MindMapCLI(str(tmp_path))
+    script = io.StringIO(
+        '# Build a small map\n'
+        'create "Plans" "Plans"\n'
+        '\n'
+        'add root "First idea"\n'
+        'add "First idea" "Detail, with comma"\n'
+        'delete\n'
+        'unknown\n'
+        'save plans\n'
+    )
+    # delete without a title would prompt, and unknown is not a command
+    assert cli.run_script(script) == 2
+    output = capsys.readouterr().out
+    assert "Line 6: Error: missing argument" in output
+    assert "Line 7: Unknown command: 'unknown'" in output
+    assert (tmp_path / "plans.json").exists()
+    assert cli.manager.search_node("Detail, with comma").parent.title == "First idea"
+
+
+def test_exit_ends_the_script(tmp_path):
+    cli = MindMapCLI(str(tmp_path))
+    assert cli.run_script(io.StringIO('create Plans\nexit\nadd root "After exit"\n')) == 0
+    assert cli.manager.search_node("After exit") is None
+
+
+def test_display_pages_until_quit(tmp_path, capsys, monkeypatch):
+    cli = MindMapCLI(str(tmp_path))
+    cli.run_script(io.StringIO("create Plans\n" + "".join(f"add root 'Node {number}'\n" for number in range(50))))
+    capsys.readouterr()
+    cli.interactive = True
+    monkeypatch.setattr(shutil, 'get_terminal_size', lambda: os.terminal_size((80, 12)))
+    answers = iter(["", "q"])
+    monkeypatch.setattr(cli, '_prompt', lambda message: next(answers))
+    cli.display_map([])
+    lines = capsys.readouterr().out.strip().splitlines()
+    # Two pages of ten lines after the heading
+    assert lines[0] == "Map structure:"
+    assert lines[1:] == ["- Plans"] + [f"  - Node {number}" for number in range(19)]
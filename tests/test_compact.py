@@ -0,0 +1,50 @@
+import random
+
+from mindmap.compact import CompactMindMap
+from mindmap.models import MindMap
+
+
+def test_matches_the_object_map(check_map):
+    rng = random.Random(11)
+    maps = [MindMap("Same", "Root"), CompactMindMap("Same", "Root")]
+    titles = ["Root"]
+    for step in range(400):
+        parent_title = rng.choice(titles)
+        if rng.random() < 0.8 or parent_title == "Root":
+            title = f"node {step} é"
+            for mindmap in maps:
+                mindmap.search_node(parent_title).add_child(title)
+            titles.append(title)
+        else:
+            for mindmap in maps:
+                node = mindmap.search_node(parent_title)
+                node.parent.remove_child(node)
+            titles = [title for title in titles if maps[0].search_node(title) is not None]
+    assert maps[0].to_dict() == maps[1].to_dict()
+    assert check_map(maps[1]) == maps[0].node_count
+
+
+def test_removed_slots_are_reused():
+    mindmap = CompactMindMap("Slots")
+    branch = mindmap.root.add_child("Branch")
+    for number in range(100):
+        branch.add_child(f"leaf {number}")
+    slots = len(mindmap._parent)
+    mindmap.root.remove_child(branch)
+    branch = mindmap.root.add_child("Branch")
+    for number in range(100):
+        branch.add_child(f"new leaf {number}")
+    assert len(mindmap._parent) == slots
+    assert mindmap.search_node("new leaf 99").parent == branch
+
+
+def test_title_buffer_drops_removed_titles():
+    mindmap = CompactMindMap("Titles")
+    for number in range(100):
+        mindmap.root.add_child(f"a long title that takes some room {number}")
+    full = len(mindmap._titles)
+    for number in range(80):
+        mindmap.root.remove_child(mindmap.search_node(f"a long title that takes some room {number}"))
+    assert len(mindmap._titles) < full // 2
+    assert [child.title for child in mindmap.root.children] == \
+        [f"a long title that takes some room {number}" for number in range(80, 100)]
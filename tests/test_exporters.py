@@ -0,0 +1,92 @@
+import io
+
+import pytest
+
+from mindmap import exporters
+from mindmap.manager import MAX_LEVEL, MindMapManager
+from mindmap.models import MindMap
+
+
+def read(format_name, text, max_level=MAX_LEVEL):
+    """Import a map from text as the manager does"""
+    return exporters.EXPORTERS[format_name].read(io.StringIO(text), MindMap, max_level)
+
+
+@pytest.mark.parametrize('format_name', ['markdown', 'csv'])
+def test_export_import_round_trip(tmp_path, map_class, format_name, check_map):
+    manager = MindMapManager(str(tmp_path), compact=map_class is not MindMap)
+    manager.create_map("Plans", "Plans")
+    manager.add_nodes("Alpha\n  Alpha 1\n  Alpha 2\nBeta, with comma\n  \"Quoted\" é")
+    path = str(tmp_path / f"plans{exporters.EXPORTERS[format_name].extension}")
+    expected = manager.current_map.to_dict()
+    assert manager.export_map(format_name, path)[0]
+
+    success, message = manager.import_map(format_name, path)
+    assert success, message
+    imported = manager.current_map
+    assert imported.to_dict() == expected
+    assert [child.title for child in imported.root.children] == ["Alpha", "Beta, with comma"]
+    assert imported.search_node('"quoted" É').parent.title == "Beta, with comma"
+    check_map(imported)
+
+
+def test_markdown_outline():
+    mindmap = read('markdown', "# Title\n\n- Root\n  - A\n    - A1\n  * B\n")
+    assert mindmap.title == "Title"
+    assert mindmap.search_node("A1").parent.title == "A"
+    assert mindmap.node_count == 4
+
+
+def test_csv_rows_in_any_order():
+    mindmap = read('csv', "id,parent,title\n3,2,Leaf\n2,1,Branch\n1,,Root\n")
+    assert mindmap.search_node("Leaf").parent.title == "Branch"
+
+
+@pytest.mark.parametrize('text, error', [
+    ("- Root\n  - A\n  - a\n", "a node with title 'a' already exists"),
+    ("- Root\n  - Root\n", "a node with title 'Root' already exists"),
+    ("- Root\n  - A\n    - B\n      - C\n", "maximum depth of 3 levels"),
+    ("- Root\n    - A\n", None),
+    ("- Root\n- Other\n", "second top-level item"),
+    ("  - Root\n", None),
+    ("", "no items"),
+])
+def test_markdown_validation(text, error):
+    if error is None:
+        # Deeper indentation is one level down, however wide
+        assert read('markdown', text).node_count >= 1
+        return
+    with pytest.raises(ValueError, match=error):
+        read('markdown', text)
+
+
+@pytest.mark.parametrize('text, error', [
+    ("1,,Root\n2,1,A\n3,1,a\n", "Row 3: a node with title 'a' already exists"),
+    ("3,2,a\n2,1,A\n1,,Root\n", "Row 1: a node with title 'a' already exists"),
+    ("1,,Root\n2,1,A\n3,2,B\n4,3,C\n", "Row 4: maximum depth of 3 levels"),
+    ("4,3,C\n3,2,B\n2,1,A\n1,,Root\n", "Row 1: maximum depth of 3 levels"),
+    ("1,,Root\n2,1,\n", "Row 2: node title cannot be empty"),
+    ("1,,Root\n2,,Other\n", "Row 2: second root"),
+    ("1,,Root\n1,1,A\n", "Row 2: duplicate id"),
+    ("1,,Root\n2,9,A\n", "Unknown parent"),
+    ("2,1,A\n", "No root row"),
+    ("1,,Root,extra\n", "expected 3 columns"),
+])
+def test_csv_validation(text, error):
+    with pytest.raises(ValueError, match=error):
+        read('csv', text)
+
+
+def test_depth_limit_is_optional():
+    mindmap = read('markdown', "- Root\n  - A\n    - B\n      - C\n", max_level=None)
+    assert mindmap.max_depth == 3
+
+
+def test_failed_import_keeps_current_map(tmp_path):
+    manager = MindMapManager(str(tmp_path))
+    manager.create_map("Plans")
+    path = tmp_path / "bad.csv"
+    path.write_text("1,,Root\n2,1,A\n3,1,a\n", encoding='utf-8')
+    success, message = manager.import_map('csv', str(path))
+    assert not success and "already exists" in message
+    assert manager.current_map.title == "Plans"
@@ -0,0 +1,85 @@
+import os
+
+import pytest
+
+from mindmap.fulltext import FullTextIndex, FullTextIndexError
+from mindmap.manager import AUTOSAVE_CHANGES, MindMapManager
+from mindmap.metrics import METRICS
+from mindmap.models import MindMap
+from mindmap.storage import Storage
+
+
+def make_map(title, branches):
+    """Map with one top-level node per (branch, [child titles]) pair"""
+    mindmap = MindMap(title)
+    for branch, children in branches:
+        node = mindmap.root.add_child(branch)
+        for child in children:
+            node.add_child(child)
+    return mindmap
+
+
+def refreshes():
+    return METRICS.counters.get('storage.index_refreshes', 0)
+
+
+def test_saves_keep_the_index_current(tmp_path):
+    storage = Storage(str(tmp_path))
+    mindmap = make_map("Ideas", [("Projects", ["Alpha launch", "Beta plan"]), ("Notes", [])])
+    assert storage.save(mindmap, "ideas")
+    before = refreshes()
+    assert storage.find(["launch"]) == [("ideas", ["Ideas", "Projects", "Alpha launch"])]
+
+    mindmap.search_node("Notes").add_child("Launch review")
+    mindmap.root.remove_child(mindmap.search_node("Projects"))
+    assert storage.save(mindmap, "ideas")
+    assert storage.find(["LAUNCH"]) == [("ideas", ["Ideas", "Notes", "Launch review"])]
+    assert storage.find(["beta"]) == []
+    # Every answer came from the index: no map file was opened
+    assert refreshes() == before
+
+
+def test_update_rewrites_only_changed_branches(tmp_path):
+    index = FullTextIndex(str(tmp_path))
+    mindmap = make_map("Ideas", [("Projects", ["Alpha", "Beta"]), ("Notes", ["Gamma"])])
+    signature = {'size': 1, 'mtime_ns': 1, 'journal_size': 0}
+    assert index.update("ideas.json", mindmap, signature) == 6
+    assert index.update("ideas.json", mindmap, signature) == 0
+    mindmap.search_node("Notes").add_child("Delta")
+    assert index.update("ideas.json", mindmap, signature) == 1
+    assert index.search(["delta"]) == [("ideas.json", ["Ideas", "Notes", "Delta"])]
+
+
+def test_find_refreshes_maps_changed_elsewhere(tmp_path):
+    storage = Storage(str(tmp_path))
+    assert storage.save(make_map("Ideas", [("Projects", [])]), "ideas")
+    # Another process saving without updating the index
+    other = Storage(str(tmp_path))
+    other.update_index = False
+    other.save(make_map("Plans", [("Launch", [])]), "plans")
+    before = refreshes()
+    assert storage.find(["launch"]) == [("plans", ["Plans", "Launch"])]
+    assert refreshes() == before + 1
+
+    os.remove(os.path.join(str(tmp_path), "plans.json"))
+    assert storage.find(["launch"]) == []
+
+
+def test_database_errors_are_wrapped(tmp_path):
+    index = FullTextIndex(str(tmp_path))
+    with open(index.path, 'wb') as f:
+        f.write(b'not a database' * 100)
+    with pytest.raises(FullTextIndexError):
+        index.search(["anything"])
+
+
+def test_autosaved_journals_update_the_index(tmp_path):
+    manager = MindMapManager(str(tmp_path), journaled=True, autosave=True)
+    manager.create_map("Ideas")
+    assert manager.save_map("ideas")[0]
+    for number in range(AUTOSAVE_CHANGES):
+        manager.add_node("root", f"Idea {number}")
+    before = refreshes()
+    assert manager.storage.find(["idea", "7"]) == [("ideas", ["Ideas", "Idea 7"])]
+    assert refreshes() == before
+    manager.close_workspace()
@@ -0,0 +1,65 @@
+import pytest
+
+from mindmap.manager import MindMapManager
+
+
+@pytest.fixture(params=[False, True], ids=['nodes', 'compact'])
+def manager(request, tmp_path):
+    """Manager with a small three-level map open"""
+    manager = MindMapManager(str(tmp_path), compact=request.param)
+    manager.create_map("Plans", "Plans")
+    for branch in ("Alpha", "Beta", "Gamma"):
+        manager.add_node("root", branch)
+        for number in range(3):
+            manager.add_node(branch, f"{branch} {number}")
+    return manager
+
+
+def test_undo_redo_round_trip(manager, check_map):
+    original = manager.current_map.to_dict()
+    steps = [
+        lambda: manager.add_node("Beta", "Beta new"),
+        lambda: manager.delete_node("Alpha"),
+        lambda: manager.move_node("Gamma 1", "Beta"),
+        lambda: manager.delete_nodes(["Beta 0", "Gamma"]),
+        lambda: manager.add_node("root", "Alpha"),
+    ]
+    states = [original]
+    for step in steps:
+        success, message = step()
+        assert success, message
+        check_map(manager.current_map)
+        states.append(manager.current_map.to_dict())
+
+    for state in reversed(states[:-1]):
+        success, message = manager.undo()
+        assert success, message
+        check_map(manager.current_map)
+        assert manager.current_map.to_dict() == state
+
+    for state in states[1:]:
+        success, message = manager.redo()
+        assert success, message
+        check_map(manager.current_map)
+        assert manager.current_map.to_dict() == state
+    assert manager.redo() == (False, "Nothing to redo")
+
+
+def test_undo_of_delete_restores_titles(manager, check_map):
+    manager.delete_node("Alpha")
+    assert manager.search_node("Alpha 1") is None
+    assert manager.current_map.shadowed_node("ALPHA 1").title == "Alpha 1"
+    # The title of a deleted node can be reused, and undoing that gives it back
+    manager.add_node("Beta", "Alpha 1")
+    manager.undo()
+    manager.undo()
+    check_map(manager.current_map)
+    assert manager.search_node("Alpha 1").parent.title == "Alpha"
+
+
+def test_new_change_clears_redo(manager):
+    manager.add_node("Alpha", "Alpha new")
+    manager.undo()
+    manager.add_node("Beta", "Beta new")
+    assert manager.redo() == (False, "Nothing to redo")
+    assert manager.search_node("Alpha new") is None
@@ -0,0 +1,116 @@
+import os
+
+from mindmap.manager import MindMapManager
+
+
+def make_map(data_dir, journaled=False):
+    """Save a 'Plans' map with two branches and return its manager"""
+    manager = MindMapManager(data_dir, journaled=journaled)
+    manager.create_map("Plans", "Plans")
+    manager.add_node("root", "Alpha")
+    manager.add_node("root", "Beta")
+    success, message = manager.save_map("plans")
+    assert success, message
+    return manager
+
+
+def test_journal_replays_on_load(tmp_path, check_map):
+    data_dir = str(tmp_path)
+    manager = make_map(data_dir, journaled=True)
+    manager.add_node("Alpha", "Alpha 1")
+    manager.add_node("Beta", "Beta 1")
+    manager.move_node("Beta 1", "Alpha")
+    manager.delete_node("Beta")
+    success, message = manager.save_map()
+    assert success and "journal synced" in message
+    assert os.path.getsize(os.path.join(data_dir, "plans.json.journal")) > 0
+    expected = manager.current_map.to_dict()
+
+    # A fresh process reads the snapshot and replays the journal
+    reader = MindMapManager(data_dir, journaled=True)
+    success, message = reader.load_map("plans")
+    assert success, message
+    assert reader.current_map.to_dict() == expected
+    check_map(reader.current_map)
+
+
+def test_saves_append_instead_of_rewriting(tmp_path):
+    data_dir = str(tmp_path)
+    manager = make_map(data_dir, journaled=True)
+    snapshot = os.path.join(data_dir, "plans.json")
+    written = os.stat(snapshot).st_mtime_ns
+    for number in range(5):
+        manager.add_node("Alpha", f"Alpha {number}")
+        assert manager.save_map()[0]
+    assert os.stat(snapshot).st_mtime_ns == written
+
+
+def test_compacting_folds_journal_into_snapshot(tmp_path):
+    data_dir = str(tmp_path)
+    manager = make_map(data_dir, journaled=True)
+    manager.add_node("Alpha", "Alpha 1")
+    manager.save_map()
+    success, message = manager.compact_map()
+    assert success, message
+    assert not os.path.exists(os.path.join(data_dir, "plans.json.journal"))
+
+    reader = MindMapManager(data_dir)
+    reader.load_map("plans")
+    assert reader.search_node("Alpha 1").parent.title == "Alpha"
+
+
+def test_truncated_last_record_is_ignored(tmp_path):
+    data_dir = str(tmp_path)
+    manager = make_map(data_dir, journaled=True)
+    manager.add_node("Alpha", "Alpha 1")
+    manager.save_map()
+    # An append interrupted halfway through its line
+    with open(os.path.join(data_dir, "plans.json.journal"), 'ab') as f:
+        f.write(b'["a","Alpha","Alp')
+
+    reader = MindMapManager(data_dir, journaled=True)
+    success, message = reader.load_map("plans")
+    assert success, message
+    assert reader.search_node("Alpha 1").parent.title == "Alpha"
+
+
+def test_concurrent_saves_merge(tmp_path, check_map):
+    data_dir = str(tmp_path)
+    make_map(data_dir)
+    first = MindMapManager(data_dir)
+    second = MindMapManager(data_dir)
+    first.load_map("plans")
+    second.load_map("plans")
+
+    first.add_node("Alpha", "From first")
+    assert first.save_map()[0]
+    # The second save finds a newer file and replays its own change on top of it
+    second.add_node("Beta", "From second")
+    success, message = second.save_map()
+    assert success and "merged" in message
+
+    reader = MindMapManager(data_dir)
+    reader.load_map("plans")
+    assert reader.search_node("From first").parent.title == "Alpha"
+    assert reader.search_node("From second").parent.title == "Beta"
+    check_map(reader.current_map)
+
+
+def test_save_conflict_when_changes_no_longer_apply(tmp_path):
+    data_dir = str(tmp_path)
+    make_map(data_dir)
+    first = MindMapManager(data_dir)
+    second = MindMapManager(data_dir)
+    first.load_map("plans")
+    second.load_map("plans")
+
+    first.delete_node("Beta")
+    assert first.save_map()[0]
+    second.add_node("Beta", "Under Beta")
+    success, message = second.save_map()
+    assert not success
+
+    # The file keeps the first process's version
+    reader = MindMapManager(data_dir)
+    reader.load_map("plans")
+    assert reader.search_node("Beta") is None
@@ -0,0 +1,120 @@
+from mindmap.manager import MindMapManager
+from mindmap.metrics import METRICS
+
+
+def test_outline_adds_every_node(tmp_path, check_map):
+    manager = MindMapManager(str(tmp_path))
+    manager.create_map("Plans")
+    success, message = manager.add_nodes("Alpha\n  Alpha 1\n  Alpha 2\nBeta\n  Beta 1\n")
+    assert success, message
+    assert manager.search_node("Beta 1").parent.title == "Beta"
+    assert check_map(manager.current_map) == 6
+
+
+def test_pairs_may_use_nodes_of_the_same_batch(tmp_path):
+    manager = MindMapManager(str(tmp_path))
+    manager.create_map("Plans")
+    success, message = manager.add_nodes([("root", "Alpha"), ("alpha", "Alpha 1")])
+    assert success, message
+    assert manager.search_node("Alpha 1").parent.title == "Alpha"
+
+
+def test_invalid_batch_adds_nothing(tmp_path):
+    manager = MindMapManager(str(tmp_path))
+    manager.create_map("Plans")
+    manager.add_node("root", "Alpha")
+    for items, error in [
+        ([("root", "Beta"), ("root", "alpha")], "Item 2: a node with title 'alpha' already exists"),
+        ([("root", "Beta"), ("Missing", "Gamma")], "Item 2: parent node 'Missing' not found"),
+        ("Beta\n  Beta 1\n    Beta 2\n", "Item 3: maximum depth"),
+        ([("root", "Beta"), ("Beta", "")], "Item 2: node title cannot be empty"),
+    ]:
+        success, message = manager.add_nodes(items)
+        assert not success and error in message
+        assert manager.current_map.node_count == 2
+
+
+def saved_map(manager, title, count):
+    """Create a map with count nodes under the root and save it under its title"""
+    manager.create_map(title)
+    for number in range(count):
+        manager.add_node("root", f"{title} {number}")
+    success, message = manager.save_map()
+    assert success, message
+
+
+def test_open_maps_keep_their_changes(tmp_path):
+    manager = MindMapManager(str(tmp_path))
+    saved_map(manager, "Alpha", 2)
+    manager.add_node("root", "Alpha unsaved")
+    saved_map(manager, "Beta", 2)
+    success, message = manager.load_map("Alpha")
+    assert success and message == "Switched to map: Alpha"
+    assert manager.search_node("Alpha unsaved") is not None
+    assert manager.unsaved_maps() == ["Alpha.json"]
+    # Each map keeps its own history
+    assert manager.undo() == (True, "Undid add 'Alpha unsaved'")
+    assert [entry[0] for entry in manager.list_open_maps()] == ["Alpha.json", "Beta.json"]
+
+
+def test_least_recently_used_maps_are_saved_and_closed(tmp_path):
+    manager = MindMapManager(str(tmp_path), workspace_limit=10)
+    saved_map(manager, "Alpha", 3)
+    manager.add_node("root", "Alpha unsaved")
+    saved_map(manager, "Beta", 3)
+    manager.create_map("Draft")
+    manager.add_node("root", "Draft 1")
+    # Gamma pushes the total over the limit: Alpha is written and closed, the never saved Draft stays
+    saved_map(manager, "Gamma", 3)
+    assert [entry[0] for entry in manager.list_open_maps()] == ["Gamma.json", "unsaved:Draft", "Beta.json"]
+    success, message = manager.load_map("Alpha")
+    assert success and message.startswith("Loaded map: Alpha")
+    assert manager.search_node("Alpha unsaved") is not None
+
+
+def test_display_walks_the_tree_in_order(tmp_path):
+    manager = MindMapManager(str(tmp_path))
+    manager.create_map("Plans")
+    manager.add_nodes("Alpha\n  Alpha 1\n  Alpha 2\nBeta\n  Beta 1\n")
+    assert manager.display_map() == "- Plans\n  - Alpha\n    - Alpha 1\n    - Alpha 2\n  - Beta\n    - Beta 1"
+    assert manager.display_map("beta") == "- Beta\n  - Beta 1"
+    assert manager.display_map(max_depth=1) == \
+        "- Plans\n  - Alpha  [+2 children, 2 nodes]\n  - Beta  [+1 children, 1 nodes]"
+    assert manager.display_map("Missing") == "Node 'Missing' not found"
+
+
+def test_display_stops_walking_when_the_reader_stops(tmp_path):
+    manager = MindMapManager(str(tmp_path))
+    manager.create_map("Plans")
+    manager.add_nodes([("root", f"Node {number}") for number in range(1000)])
+    METRICS.reset()
+    success, lines = manager.iter_display()
+    assert [next(lines) for _ in range(3)] == ["- Plans", "  - Node 0", "  - Node 1"]
+    lines.close()
+    assert METRICS.snapshot()['histograms']['traversal.display_map.nodes']['max'] == 3
+
+
+def test_delete_many_is_all_or_nothing(tmp_path, check_map):
+    manager = MindMapManager(str(tmp_path))
+    manager.create_map("Plans")
+    manager.add_nodes("Alpha\n  Alpha 1\nBeta\n  Beta 1\nGamma\n")
+    success, message = manager.delete_nodes(["Alpha", "Missing"])
+    assert not success and "Missing" in message
+    assert manager.current_map.node_count == 6
+    # Alpha 1 goes with Alpha
+    success, message = manager.delete_nodes(["Alpha 1", "Alpha", "beta 1"])
+    assert success, message
+    assert [child.title for child in manager.current_map.root.children] == ["Beta", "Gamma"]
+    assert check_map(manager.current_map) == 3
+
+
+def test_move_checks_the_depth_limit(tmp_path, check_map):
+    manager = MindMapManager(str(tmp_path))
+    manager.create_map("Plans")
+    manager.add_nodes("Alpha\n  Alpha 1\nBeta\n")
+    assert manager.move_node("Alpha", "Beta")[1].startswith("Cannot move node: maximum depth")
+    assert manager.move_node("Alpha", "Alpha 1") == (False, "Cannot move 'Alpha' under its own subtree")
+    assert manager.move_node("Alpha 1", "Beta") == (True, "Moved 'Alpha 1' under 'Beta'")
+    assert manager.move_node("Alpha", "Beta") == (True, "Moved 'Alpha' under 'Beta'")
+    check_map(manager.current_map)
+    assert manager.current_map.max_depth == 2
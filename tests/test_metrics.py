@@ -0,0 +1,49 @@
+import io
+import json
+import threading
+
+import pytest
+
+from mindmap.cli import MindMapCLI
+from mindmap.metrics import METRICS, Histogram, Metrics
+
+
+def test_histogram_percentiles_are_bucket_bounds():
+    histogram = Histogram()
+    for value in [0, 1, 3, 5, 100, 1000]:
+        histogram.observe(value)
+    summary = histogram.to_dict()
+    assert (summary['count'], summary['min'], summary['max'], summary['total']) == (6, 0, 1000, 1109)
+    # 3 of 6 values are at most 3; the maximum caps the last bucket
+    assert summary['p50'] == 3
+    assert summary['p95'] == 1000
+    assert Histogram().to_dict()['p50'] is None
+
+
+def test_timer_records_blocks_that_raise():
+    metrics = Metrics()
+    with pytest.raises(ValueError):
+        with metrics.timer('failing'):
+            raise ValueError("boom")
+    assert metrics.snapshot()['histograms']['failing']['count'] == 1
+
+
+def test_counters_from_many_threads():
+    metrics = Metrics()
+    threads = [threading.Thread(target=lambda: [metrics.increment('hits') for _ in range(1000)]) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert metrics.snapshot()['counters'] == {'hits': 8000}
+
+
+def test_commands_are_timed_and_written_on_exit(tmp_path, capsys):
+    METRICS.reset()
+    metrics_path = tmp_path / "metrics.json"
+    cli = MindMapCLI(str(tmp_path / "data"), metrics_path=str(metrics_path))
+    cli.run_script(io.StringIO('create Plans\nadd root Idea\nadd root Other --profile\nsave\n'))
+    assert "Profile of 'add'" in capsys.readouterr().out
+    histograms = json.loads(metrics_path.read_text())['histograms']
+    assert histograms['command.add']['count'] == 2
+    assert histograms['storage.save.json']['count'] == 1
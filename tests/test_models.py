@@ -0,0 +1,157 @@
+import random
+
+import pytest
+
+from mindmap.models import HUB_CHILDREN, INDEXED_CHILDREN, HubChildren, MindMap
+
+
+def build(map_class, fanout=4, depth=3):
+    """Small map with unique titles 'n<number>' below a 'Root' root"""
+    mindmap = map_class("Test", "Root")
+    level = [mindmap.root]
+    number = 0
+    for _ in range(depth):
+        next_level = []
+        for parent in level:
+            for _ in range(fanout):
+                number += 1
+                next_level.append(parent.add_child(f"n{number}"))
+        level = next_level
+    return mindmap
+
+
+def test_search_ignores_case(map_class, check_map):
+    mindmap = build(map_class)
+    assert check_map(mindmap) == 1 + 4 + 16 + 64
+    assert mindmap.search_node("N5") == mindmap.search_node("n5")
+    assert mindmap.search_node("ROOT") == mindmap.root
+    assert mindmap.search_node("missing") is None
+
+
+def test_add_keeps_counters(map_class, check_map):
+    mindmap = build(map_class)
+    assert mindmap.node_count == 85
+    assert mindmap.max_depth == 3
+    assert mindmap.root.subtree_size == 85
+    assert mindmap.search_node("n1").subtree_size == 21
+    assert mindmap.search_node("n84").get_level() == 3
+
+
+def test_search_within_subtree(map_class):
+    mindmap = build(map_class)
+    first, second = mindmap.search_node("n1"), mindmap.search_node("n2")
+    assert mindmap.search_node("n5", first).title == "n5"
+    assert mindmap.search_node("n5", second) is None
+
+
+def test_delete_unindexes_subtree(map_class, check_map):
+    mindmap = build(map_class)
+    node = mindmap.search_node("n1")
+    size = node.subtree_size
+    mindmap.root.remove_child(node)
+    check_map(mindmap)
+    assert mindmap.node_count == 85 - size
+    # The deleted subtree's titles are free again
+    assert mindmap.search_node("n1") is None
+    assert mindmap.search_node("n5") is None
+    mindmap.root.add_child("n5")
+    check_map(mindmap)
+
+
+def test_loaded_map_is_indexed(map_class, check_map):
+    mindmap = map_class.from_dict(build(map_class).to_dict())
+    assert check_map(mindmap) == 85
+    assert mindmap.search_node("N84").parent.title == "n20"
+
+
+def test_removing_the_deepest_nodes_lowers_max_depth(map_class, check_map):
+    mindmap = build(map_class, fanout=2, depth=3)
+    for title in ("n1", "n2"):
+        node = mindmap.search_node(title)
+        for child in list(node.children):
+            for leaf in list(child.children):
+                child.remove_child(leaf)
+    check_map(mindmap)
+    assert mindmap.max_depth == 2
+
+
+def test_content_hash_tracks_changes(map_class):
+    first = build(map_class)
+    second = build(map_class)
+    assert first.root.content_hash() == second.root.content_hash()
+    second.search_node("n30").add_child("extra")
+    assert first.root.content_hash() != second.root.content_hash()
+    # n30 lies in the n1 branch; the others keep their hash
+    assert first.search_node("n1").content_hash() != second.search_node("n1").content_hash()
+    assert first.search_node("n4").content_hash() == second.search_node("n4").content_hash()
+    second.search_node("n30").remove_child(second.search_node("extra"))
+    assert first.root.content_hash() == second.root.content_hash()
+
+
+def test_move_updates_depths_and_sizes(map_class, check_map):
+    mindmap = build(map_class)
+    node = mindmap.search_node("n2")
+    node.move_to(mindmap.search_node("n1"))
+    check_map(mindmap)
+    assert mindmap.search_node("n2").depth == 2
+    assert mindmap.max_depth == 4
+    # And back up to the root, ahead of n3
+    mindmap.search_node("n2").move_to(mindmap.root, mindmap.search_node("n3"))
+    check_map(mindmap)
+    assert mindmap.max_depth == 3
+    assert [child.title for child in mindmap.root.children] == ["n1", "n2", "n3", "n4"]
+
+
+def test_random_changes_keep_invariants(map_class, check_map):
+    rng = random.Random(7)
+    mindmap = build(map_class, fanout=3, depth=3)
+    titles = [f"n{number}" for number in range(1, 40)]
+    created = 0
+    for step in range(300):
+        action = rng.random()
+        node = mindmap.search_node(rng.choice(titles))
+        if node is None or action < 0.5:
+            parent = mindmap.search_node(rng.choice(titles)) or mindmap.root
+            created += 1
+            title = f"new{created}"
+            parent.add_child(title)
+            titles.append(title)
+        elif action < 0.75:
+            node.parent.remove_child(node)
+        else:
+            target = mindmap.search_node(rng.choice(titles)) or mindmap.root
+            ancestor = target
+            while ancestor is not None and ancestor != node:
+                ancestor = ancestor.parent
+            if ancestor is None and target != node.parent:
+                node.move_to(target)
+        if step % 25 == 0:
+            check_map(mindmap)
+    check_map(mindmap)
+
+
+# Enough children for the position index to be used, and for the parent to become a hub
+@pytest.mark.parametrize('count', [INDEXED_CHILDREN * 8, HUB_CHILDREN * 3])
+def test_wide_node_removes_and_reinserts_in_order(count):
+    mindmap = MindMap("Wide", "Root")
+    children = [mindmap.root.add_child(f"c{number}") for number in range(count)]
+    assert isinstance(mindmap.root.children, HubChildren) == (count >= HUB_CHILDREN)
+    rng = random.Random(3)
+    removed = rng.sample(children, len(children) // 3)
+    places = []
+    for child in removed:
+        places.append((child, mindmap.detach(child)))
+    for child, place in reversed(places):
+        mindmap.attach(child, place)
+    assert [child.title for child in mindmap.root.children] == [child.title for child in children]
+    assert list(reversed(mindmap.root.children)) == children[::-1]
+    # Many insertions next to the same child
+    moved = count // 4
+    for child in children[:moved]:
+        child.move_to(mindmap.root, children[-1])
+    assert list(mindmap.root.children) == children[moved:-1] + children[:moved] + children[-1:]
+    children = list(mindmap.root.children)
+    for child in children[::5]:
+        mindmap.root.remove_child(child)
+    assert [child.title for child in mindmap.root.children] == \
+        [child.title for number, child in enumerate(children) if number % 5]
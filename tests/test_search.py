@@ -0,0 +1,41 @@
+import random
+
+from mindmap.search import BURST_SIZE, TitleTrie, search_fuzzy, search_prefix
+
+
+def test_trie_matches_a_sorted_scan():
+    rng = random.Random(2)
+    # Enough keys sharing prefixes for leaves to burst several levels down
+    keys = {"".join(rng.choice("abc") for _ in range(rng.randint(0, 8))) for _ in range(BURST_SIZE * 20)}
+    trie = TitleTrie(keys)
+    for key in list(keys)[::3]:
+        trie.remove(key)
+        keys.discard(key)
+    for number in range(200):
+        key = f"ab{number}"
+        trie.add(key)
+        keys.add(key)
+    for prefix in ["", "a", "ab", "abc", "cab", "ab1", "zz"]:
+        assert list(trie.prefix(prefix)) == sorted(key for key in keys if key.startswith(prefix))
+
+
+def test_prefix_search_follows_changes(map_class):
+    mindmap = map_class("Search", "Root")
+    projects = mindmap.root.add_child("Projects")
+    for title in ["Launch plan", "launch party", "Lunch", "Budget"]:
+        projects.add_child(title)
+    assert [node.title for node, _ in search_prefix(mindmap, "LAUNCH")] == ["launch party", "Launch plan"]
+    # The index is kept up to date once built
+    mindmap.root.remove_child(projects)
+    mindmap.root.add_child("Launch review")
+    assert [node.title for node, _ in search_prefix(mindmap, "launch")] == ["Launch review"]
+
+
+def test_fuzzy_search_ranks_close_titles_first(map_class):
+    mindmap = map_class("Search", "Root")
+    for title in ["Marketing budget", "Budget review", "Travel plans", "Market research"]:
+        mindmap.root.add_child(title)
+    results = search_fuzzy(mindmap, "budgt", limit=2)
+    assert {node.title for node, _ in results} == {"Marketing budget", "Budget review"}
+    assert results[0][1] >= results[1][1]
+    assert search_fuzzy(mindmap, "zzzz") == []
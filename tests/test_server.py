@@ -0,0 +1,89 @@
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+
+from mindmap.client import Client, build_request, run_commands
+from mindmap.server import MapServer
+
+
+def run(server, *requests):
+    """Answer requests one after the other and return the results"""
+    async def answer():
+        return [await server.handle_request(request) for request in requests]
+    return asyncio.run(answer())
+
+
+def test_first_ranked_search_builds_the_index(tmp_path):
+    server = MapServer(str(tmp_path))
+    run(server,
+        {'op': 'create', 'map': 'ideas', 'args': {'title': "Ideas"}},
+        {'op': 'add', 'map': 'ideas', 'args': {'parent': "root", 'title': "Launch plan"}})
+    mindmap = server.maps['ideas.json'].manager.current_map
+    assert not mindmap.has_search_index()
+    first, second = run(server, *[{'op': 'search', 'map': 'ideas', 'args': {'query': "launch", 'mode': "prefix"}}] * 2)
+    assert mindmap.has_search_index()
+    assert first == second and first[0]['title'] == "Launch plan"
+
+
+def test_create_refuses_an_existing_file(tmp_path):
+    server = MapServer(str(tmp_path))
+    run(server,
+        {'op': 'create', 'map': 'ideas', 'args': {'title': "Ideas"}},
+        {'op': 'save', 'map': 'ideas'})
+    other = MapServer(str(tmp_path))
+    with pytest.raises(ValueError, match="already exists"):
+        run(other, {'op': 'create', 'map': 'ideas', 'args': {'title': "Other"}})
+    # The existing map is opened as it was saved
+    assert run(other, {'op': 'search', 'map': 'ideas', 'args': {'title': "root"}})[0]['title'] == "Ideas"
+
+
+def test_clients_share_maps_over_the_socket(tmp_path, capsys):
+    socket_path = str(tmp_path / "s.sock")
+    server = MapServer(str(tmp_path), socket_path)
+    thread = threading.Thread(target=lambda: asyncio.run(server.serve()))
+    thread.start()
+    try:
+        for _ in range(200):
+            if os.path.exists(socket_path):
+                break
+            time.sleep(0.01)
+        assert run_commands(socket_path, ['create "Ideas"'], 'ideas') == 0
+
+        def add_many(number):
+            client = Client(socket_path)
+            try:
+                for item in range(20):
+                    response = client.request(build_request(['add', 'root', f"client {number} item {item}"], 'ideas'))
+                    assert response['ok'], response
+            finally:
+                client.close()
+
+        clients = [threading.Thread(target=add_many, args=(number,)) for number in range(4)]
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+        assert run_commands(socket_path, ['info', 'search --prefix client', 'save'], 'ideas') == 0
+        assert "Nodes: 81" in capsys.readouterr().out
+    finally:
+        run_commands(socket_path, ['shutdown'])
+        thread.join(5)
+    assert not thread.is_alive()
+    assert not os.path.exists(socket_path)
+    assert (tmp_path / "ideas.json").exists()
+
+
+def test_requests_are_parsed_like_cli_commands():
+    assert build_request(['add', 'root', 'New'], 'ideas') == \
+        {'op': 'add', 'map': 'ideas', 'args': {'parent': 'root', 'title': 'New'}}
+    assert build_request(['search', '--fuzzy', '--top', '3', 'lanch', 'plan'], 'ideas')['args'] == \
+        {'mode': 'fuzzy', 'limit': 3, 'query': 'lanch plan'}
+    assert build_request(['display', 'Node', 'title', '--depth', '2'], 'ideas')['args'] == \
+        {'depth': 2, 'node': 'Node title'}
+    assert build_request(['save', 'copy', '--overwrite'], 'ideas')['args'] == \
+        {'filename': 'copy', 'overwrite': True}
+    with pytest.raises(ValueError):
+        build_request(['add', 'only parent'], 'ideas')
@@ -0,0 +1,159 @@
+import gzip
+import io
+import json
+import os
+import random
+import sys
+
+import pytest
+
+from benchmarks.generator import generate_map
+from mindmap import binary
+from mindmap.jsonstream import read_map, write_map
+from mindmap.storage import Storage
+
+
+@pytest.fixture
+def storage(tmp_path, map_class):
+    storage = Storage(str(tmp_path), map_class)
+    storage.update_catalog = False
+    return storage
+
+
+@pytest.mark.parametrize('filename', ['map', 'map.json.gz', 'map.json.xz', 'map.mmb'])
+def test_round_trip(storage, map_class, filename, check_map):
+    mindmap = generate_map(2000, fanout=6, depth=3, map_class=map_class)
+    # Titles that need escaping in JSON and more than one UTF-8 byte
+    mindmap.root.add_child('quote " backslash \\ tab \t é ✓ 🌳')
+    assert storage.save(mindmap, filename)
+    loaded = storage.load(filename)
+    assert loaded is not None
+    assert loaded.title == mindmap.title
+    assert loaded.to_dict() == mindmap.to_dict()
+    assert check_map(loaded) == mindmap.node_count
+
+
+def test_compressed_files_are_recognized_by_content(tmp_path):
+    storage = Storage(str(tmp_path))
+    mindmap = generate_map(100)
+    assert storage.save(mindmap, 'map.json.gz')
+    with open(os.path.join(str(tmp_path), 'map.json.gz'), 'rb') as f:
+        data = f.read()
+    # A gzip file under a plain .json name still loads
+    with open(os.path.join(str(tmp_path), 'renamed.json'), 'wb') as f:
+        f.write(data)
+    assert gzip.decompress(data).startswith(b'{')
+    assert storage.load('renamed').to_dict() == mindmap.to_dict()
+
+
+def test_streamed_text_is_the_map_as_json(map_class):
+    mindmap = generate_map(300, fanout=5, depth=3, map_class=map_class)
+    f = io.StringIO()
+    write_map(mindmap, f)
+    assert json.loads(f.getvalue()) == mindmap.to_dict()
+
+
+def test_deep_maps_do_not_recurse(map_class):
+    depth = sys.getrecursionlimit() + 100
+    mindmap = map_class("Deep")
+    node = mindmap.root
+    for number in range(depth):
+        node = node.add_child(f"level {number}")
+    f = io.StringIO()
+    write_map(mindmap, f)
+    f.seek(0)
+    assert read_map(f, map_class).max_depth == depth
+
+
+@pytest.mark.parametrize('text', ['{"title": "x", "children": 3}', '{"title": "x", "children": [{}]}', '{"title"'])
+def test_malformed_files_fail_to_load(tmp_path, text):
+    with open(os.path.join(str(tmp_path), 'broken.json'), 'w', encoding='utf-8') as f:
+        f.write(text)
+    assert Storage(str(tmp_path)).load('broken') is None
+
+
+def test_binary_map_loads_lazily(storage, map_class):
+    mindmap = generate_map(3000, fanout=8, depth=3, map_class=map_class)
+    assert storage.save(mindmap, 'lazy.mmb')
+    loaded = storage.load('lazy.mmb')
+    assert loaded.node_count == mindmap.node_count
+    # Lookups answer from the file's hash table before the tree is walked
+    title = mindmap.root.children[-1].children[0].title
+    assert loaded.search_node(title).title == title
+    # Only the children of the nodes on its path were created
+    assert len(loaded._loaded_nodes) < mindmap.node_count // 10
+    assert loaded.to_dict() == mindmap.to_dict()
+
+
+def test_binary_map_can_be_changed_and_saved(storage, check_map):
+    assert storage.save(generate_map(500, fanout=5, depth=3), 'lazy.mmb')
+    loaded = storage.load('lazy.mmb')
+    branch = loaded.root.children[0]
+    branch.add_child("added ✓")
+    loaded.root.remove_child(loaded.root.children[1])
+    expected = loaded.to_dict()
+    check_map(loaded)
+    assert storage.save(loaded, 'lazy.mmb')
+    assert storage.load('lazy.mmb').to_dict() == expected
+
+
+def test_binary_save_leaves_no_temporary_files(tmp_path):
+    mindmap = generate_map(100)
+    path = os.path.join(str(tmp_path), 'map.mmb')
+    binary.write_map_file(mindmap, path, 1)
+    binary.write_map_file(mindmap, path, 2)
+    assert os.listdir(str(tmp_path)) == ['map.mmb']
+    assert binary.read_version(path) == 2
+
+
+def test_incremental_saves_match_full_saves(tmp_path):
+    storage = Storage(str(tmp_path))
+    full = Storage(str(tmp_path))
+    full.incremental = False
+    rng = random.Random(5)
+    mindmap = generate_map(3000, fanout=6, depth=3)
+    nodes = [mindmap.root]
+    for step in range(8):
+        for _ in range(3):
+            nodes.append(rng.choice(nodes).add_child(f"change {step} {len(nodes)} ✓"))
+        assert storage.save(mindmap, 'incremental')
+        assert full.save(mindmap, 'full')
+        loaded = storage.load('incremental')
+        assert loaded.to_dict() == full.load('full').to_dict() == mindmap.to_dict()
+
+
+def test_unchanged_map_is_not_rewritten(tmp_path):
+    storage = Storage(str(tmp_path))
+    mindmap = generate_map(500)
+    path = os.path.join(str(tmp_path), 'map.json')
+    storage.save(mindmap, 'map')
+    storage.save(mindmap, 'map')
+    written = os.stat(path).st_mtime_ns
+    storage.save(mindmap, 'map')
+    assert os.stat(path).st_mtime_ns == written
+
+
+def test_saves_check_file_versions(tmp_path):
+    first = Storage(str(tmp_path))
+    second = Storage(str(tmp_path))
+    mindmap = generate_map(100)
+    assert first.save(mindmap, 'map')
+    other = second.load('map')
+    other.root.add_child('from second')
+    assert second.save(other, 'map')
+    # first last saved an older version and gives no merge: the save is refused
+    mindmap.root.add_child('from first')
+    assert not first.save(mindmap, 'map')
+    assert first.load('map').search_node('from second') is not None
+
+
+def test_save_never_replaces_unknown_files(tmp_path):
+    first = Storage(str(tmp_path))
+    assert first.save(generate_map(100), 'map')
+    # A new map saved under the name of a file this storage never read
+    second = Storage(str(tmp_path))
+    replacement = generate_map(10)
+    assert not second.save(replacement, 'map')
+    assert second.load('map', track=False).node_count == 100
+    assert second.save(replacement, 'map', overwrite=True)
+    assert first.load('map').node_count == 10